@@ -1,23 +1,23 @@
+import os
+import sys
 import streamlit as st
 import pandas as pd
-import numpy as np
 import matplotlib.pyplot as plt
-from statsmodels.tsa.holtwinters import ExponentialSmoothing
 import warnings
 warnings.filterwarnings('ignore')
 
-# ---------- Load data ----------
-@st.cache_data
-def load_data():
-    try:
-        df = pd.read_csv('../data/canada_medical_insurance_forecast_detailed.csv')
-        df['date'] = pd.to_datetime(df['date'])
-        return df
-    except FileNotFoundError:
-        st.error("❌ Place 'canada_medical_insurance_forecast_detailed (1).csv' in same folder")
-        st.stop()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ml_models.forecast import claims_summary, segment_index, forecast_member_series, forecast_member_intervals
 
-df = load_data()
+# ---------- Load data ----------
+# One read-only claims frame, segment index and summary per process, shared by
+# every session (ml_models/forecast.py); nothing is copied or recomputed per rerun
+try:
+    summary = claims_summary()
+except FileNotFoundError:
+    st.error("❌ Place 'canada_medical_insurance_forecast_detailed (1).csv' in same folder")
+    st.stop()
+options = summary['options']
 
 # ---------- Streamlit App ----------
 st.title("🏥 Canadian Medical Insurance Premium Forecaster")
@@ -29,15 +29,15 @@ col1, col2 = st.columns(2)
 
 with col1:
     age = st.slider("👤 Age", 18, 80, 35)
-    sex = st.selectbox("Gender", df['sex'].drop_duplicates().tolist())
+    sex = st.selectbox("Gender", options['sex'])
     employer_size = st.selectbox("👔 Employer Size", 
-                               sorted(df['employer_size'].drop_duplicates().tolist()))
+                               sorted(options['employer_size']))
 
 with col2:
-    province = st.selectbox("🏛️ Province", sorted(df['province'].drop_duplicates().tolist()))
-    plan_type = st.selectbox("📄 Plan Type", df['plan_type'].drop_duplicates().tolist())
+    province = st.selectbox("🏛️ Province", sorted(options['province']))
+    plan_type = st.selectbox("📄 Plan Type", options['plan_type'])
     chronic = st.selectbox("🏥 Chronic Condition?", 
-                          ["None"] + sorted(df['chronic_condition'].drop_duplicates().dropna().tolist()))
+                          ["None"] + sorted(options['chronic_condition']))
 
 # ---------- Advanced Inputs ----------
 with st.expander("🔧 Advanced Options"):
@@ -46,6 +46,8 @@ with st.expander("🔧 Advanced Options"):
         bmi_estimate = st.slider("📏 BMI Estimate", 18.0, 45.0, 25.0)
     with col2:
         risk_score = st.slider("Risk Score (0-5)", 0.0, 5.0, 1.5, 0.1)
+    interval_level = st.select_slider("🎯 Forecast Interval", options=[0.80, 0.90, 0.95], value=0.95,
+                                      format_func=lambda level: f"{level:.0%}")
 
 # ---------- Generate Forecast ----------
 if st.button("🚀 Generate My 3-Year Premium Forecast", type="primary"):
@@ -53,45 +55,24 @@ if st.button("🚀 Generate My 3-Year Premium Forecast", type="primary"):
     # Create matching criteria
     age_group = "18-34" if age <= 34 else "35-49" if age <= 49 else "50-64"
     
-    # Filter similar profiles (multi-column matching)
-    similar_df = df[
-        (df['age_group'] == age_group) & 
-        (df['sex'] == sex) & 
-        (df['province'] == province) &
-        (df['employer_size'] == employer_size) &
-        (df['plan_type'] == plan_type)
-    ].copy()
+    # Similar-profile lookup (exact segment, else age group + sex + province),
+    # precomputed at data load -- see ml_models/segments.py
+    match = segment_index().lookup(age_group, sex, province, employer_size, plan_type)
     
-    if similar_df.empty:
-        # Broaden search if no exact match
-        similar_df = df[
-            (df['age_group'] == age_group) & 
-            (df['sex'] == sex) & 
-            (df['province'] == province)
-        ].copy()
-    
-    if similar_df.empty:
+    if match is None:
         st.error(f"❌ No matching profiles found")
         st.rerun()
     else:
-        # Select member with most data
-        member_counts = similar_df['member_id'].value_counts()
-        selected_member = member_counts.index[0]
-        member_data = similar_df[similar_df['member_id'] == selected_member]
+        # Member with most data in the segment
+        selected_member = match['member_id']
         
         st.success(f"✅ **Perfect match found!** Using Member ID: `{selected_member}`")
         
         # ---------- Current Premium ----------
-        member_monthly = (
-            member_data
-            .set_index('date')
-            .resample('M')['monthly_premium_cad']
-            .mean()
-            .dropna()
-        )
+        member_monthly = match['monthly']
         
         current_premium = member_monthly.iloc[-1]
-        avg_risk_score = member_data['risk_score'].mean()
+        avg_risk_score = match['avg_risk_score']
         
         col1, col2, col3 = st.columns(3)
         col1.metric("💰 Current Monthly Premium", f"${current_premium:.0f}")
@@ -99,29 +80,12 @@ if st.button("🚀 Generate My 3-Year Premium Forecast", type="primary"):
         col3.metric("🏥 Employer Size", employer_size)
         
         # ---------- Forecasting ----------
-        if len(member_monthly) >= 12:
-            model = ExponentialSmoothing(
-                member_monthly,
-                trend='add',
-                seasonal='add',
-                seasonal_periods=min(12, len(member_monthly))
-            ).fit()
-            forecast_steps = 36
-            forecast_series = model.forecast(forecast_steps)
-        else:
-            # Trend forecast for limited data
-            base_premium = member_monthly.iloc[-1]
-            # Adjust growth based on risk_score and chronic conditions
-            growth_rate = 0.002 + (risk_score * 0.001)  # Higher risk = higher growth
-            months = np.arange(36)
-            forecast_series = base_premium * (1 + growth_rate) ** months
-        
-        # Dates
-        forecast_dates = pd.date_range(
-            start=member_monthly.index[-1] + pd.DateOffset(months=1),
-            periods=36, freq='M'
-        )
-        forecast_series.index = forecast_dates
+        # Fitted Holt–Winters state is cached per member (ml_models/forecast_cache.py)
+        forecast_series = forecast_member_series(selected_member, member_monthly, risk_score)
+        # Quantiles of simulated error paths from the same fitted state
+        tail = (1 - interval_level) / 2
+        intervals = forecast_member_intervals(selected_member, member_monthly, risk_score,
+                                              quantiles=(tail, 1 - tail))
         
         # ---------- Visualization ----------
         st.subheader("📈 Your 3-Year Premium Forecast")
@@ -132,6 +96,8 @@ if st.button("🚀 Generate My 3-Year Premium Forecast", type="primary"):
         
         # Plot forecast
         forecast_series.plot(ax=ax, label="3-Year Forecast", linewidth=4, color='#ff4444', linestyle='--')
+        ax.fill_between(intervals.index, intervals.iloc[:, 0], intervals.iloc[:, -1],
+                        color='#ff4444', alpha=0.15, label=f"{interval_level:.0%} Interval")
         
         # Current line
         ax.axhline(y=current_premium, color='#2ca02c', linestyle=':', linewidth=3, 
@@ -175,15 +141,15 @@ if st.button("🚀 Generate My 3-Year Premium Forecast", type="primary"):
 with st.sidebar:
     st.header("📊 Dataset Summary")
     col1, col2 = st.columns(2)
-    col1.metric("Claims", f"{len(df):,}")
-    col2.metric("Members", f"{df['member_id'].nunique():,}")
+    col1.metric("Claims", f"{summary['rows']:,}")
+    col2.metric("Members", f"{summary['members']:,}")
     
-    col1.metric("Avg Premium", f"${df['monthly_premium_cad'].mean():.0f}")
-    col2.metric("Avg Risk Score", f"{df['risk_score'].mean():.1f}")
+    col1.metric("Avg Premium", f"${summary['avg_premium']:.0f}")
+    col2.metric("Avg Risk Score", f"{summary['avg_risk_score']:.1f}")
     
     st.subheader("🔍 Available Filters")
     st.dataframe(
-        df[['province', 'employer_size', 'plan_type']].nunique().to_frame('Count'),
+        pd.Series(summary['distinct']).to_frame('Count'),
         use_container_width=True
     )
     
@@ -1,35 +1,63 @@
+import os
+import sys
 import streamlit as st
-import streamlit.components.v1 as components
 import pandas as pd
-import numpy as np
-import shap
-import xgboost as xgb
-from sklearn.preprocessing import LabelEncoder
-import matplotlib.pyplot as plt
 
-# ---------- Helper for SHAP force plot ----------
-def st_shap(plot, height=None):
-    shap_html = f"<head>{shap.getjs()}</head><body>{plot.html()}</body>"
-    components.html(shap_html, height=height)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Trained offline by `python -m ml_models.registry train`; loaded, not refit.
+# One artifact per process, shared by every session without copying (and
+# following promotions); predictions and explanations are cached per
+# (model version, profile) and the global plots are rendered once per version.
+import ml_models
 
-# ---------- Model and Data Setup ----------
-@st.cache_data
-def load_model():
-    df = pd.read_csv("../data/medical_insurance.csv")
-    label_cols = ['sex', 'smoker', 'region']
-    for col in label_cols:
-        df[col] = LabelEncoder().fit_transform(df[col])
-    
-    X = df.drop("charges", axis=1)
-    y = df["charges"]
-    
-    model = xgb.XGBRegressor(random_state=42, n_estimators=100)
-    model.fit(X, y)
-    explainer = shap.Explainer(model, X)
-    
-    return model, explainer, X.columns.tolist(), X
+# ---------- Explanation charts ----------
+# Drawn by the browser (Vega-Lite) from the compact explanation payload
+# (ml_models/rendering.py): no matplotlib figure or shap JavaScript per click
+DIRECTION_COLORS = {"domain": ["increases", "decreases"], "range": ["#ff0051", "#008bfb"]}
+
+
+def contribution_frame(explanation, layout):
+    """
+    One bar per feature with the premium range it spans: a "waterfall" from
+    the base value up to the prediction (largest contribution last), or a
+    "force" row where increases and decreases meet at the prediction.
+    """
+    rows = []
+    if layout == "waterfall":
+        running = explanation['base_value']
+        for item in reversed(explanation['contributions']):
+            rows.append((item, running, running + item['impact']))
+            running += item['impact']
+    else:
+        left = right = explanation['base_value'] + sum(item['impact'] for item in explanation['contributions'])
+        for item in explanation['contributions']:
+            if item['impact'] > 0:
+                rows.append((item, left - item['impact'], left))
+                left -= item['impact']
+            else:
+                rows.append((item, right, right - item['impact']))
+                right -= item['impact']
+    return pd.DataFrame([{
+        'label': f"{item['feature']} = {item['value']}",
+        'start': start,
+        'end': end,
+        'impact': item['impact'],
+        'direction': "increases" if item['impact'] > 0 else "decreases",
+    } for item, start, end in rows])
+
+
+def contribution_chart(explanation, layout):
+    frame = contribution_frame(explanation, layout)
+    encoding = {
+        'x': {'field': 'start', 'type': 'quantitative', 'title': 'Annual premium', 'scale': {'zero': False}},
+        'x2': {'field': 'end'},
+        'color': {'field': 'direction', 'type': 'nominal', 'scale': DIRECTION_COLORS, 'legend': None},
+        'tooltip': [{'field': 'label', 'title': 'Feature'}, {'field': 'impact', 'format': '+,.0f', 'title': 'Impact'}],
+    }
+    if layout == "waterfall":
+        encoding['y'] = {'field': 'label', 'type': 'nominal', 'sort': frame['label'].tolist()[::-1], 'title': None}
+    st.vega_lite_chart(frame, {'mark': 'bar', 'encoding': encoding}, use_container_width=True)
 
-model, explainer, feature_names, X_train = load_model()
 
 # ---------- Streamlit UI ----------
 st.title("🏥 Medical Insurance Premium Predictor")
@@ -50,27 +78,23 @@ with col2:
     smoker = st.selectbox("Do you smoke?", ["yes", "no"])
     region = st.selectbox("Region", ["southwest", "southeast", "northwest", "northeast"])
 
-# ---------- Encode inputs ----------
-label_dict = {
-    'sex': ['female', 'male'], 
-    'smoker': ['no', 'yes'], 
-    'region': ['southwest', 'southeast', 'northwest', 'northeast']
-}
-
-user_input = {
+# ---------- Profile ----------
+# Category values are encoded with the codes stored in the model artifact
+profile = {
     'age': age,
-    'sex': label_dict['sex'].index(sex),
+    'sex': sex,
     'bmi': bmi,
     'children': children,
-    'smoker': label_dict['smoker'].index(smoker),
-    'region': label_dict['region'].index(region)
+    'smoker': smoker,
+    'region': region
 }
 
-user_df = pd.DataFrame([user_input])
-
 # ---------- Generate Prediction ----------
 if st.button("💰 Predict My Premium", type="primary"):
-    pred = model.predict(user_df)[0]
+    # Prediction, base value, contributions and global plots from one model version
+    artifact = ml_models.load_model()
+    explanation = ml_models.explanation_payload(profile, artifact=artifact)
+    pred = explanation['prediction']
     
     # ---------- MAIN RESULT ----------
     st.header(f"**Predicted Annual Premium: ${pred:,.0f}**")
@@ -94,11 +118,8 @@ if st.button("💰 Predict My Premium", type="primary"):
     """)
     
     # ---------- SHAP Analysis ----------
-    shap_values = explainer(user_df)
-    feature_impact = sorted(
-        zip(feature_names, shap_values.values[0]), 
-        key=lambda x: abs(x[1]), reverse=True
-    )
+    # Every feature's contribution, largest first
+    feature_impact = [(item['feature'], item['impact']) for item in explanation['contributions']]
     
     # ---------- TEXT EXPLANATION #2: PERSONALIZED IMPACTS ----------
     st.markdown("**💡 How YOUR specific profile affects the price:**")
@@ -136,26 +157,18 @@ if st.button("💰 Predict My Premium", type="primary"):
         🟢 **Blue bars** = factors DECREASING your premium  
         📍 **Final bar** = your actual predicted premium
         """)
-        fig_w, _ = plt.subplots(figsize=(9, 4))
-        shap.plots._waterfall.waterfall_legacy(
-            explainer.expected_value, shap_values.values[0], user_df.iloc[0],
-            max_display=6, show=False
-        )
-        st.pyplot(fig_w)
+        contribution_chart(explanation, "waterfall")
     
     # Force Plot
     with col2:
         st.markdown("""
         **📈 Force Plot**  
-        *Interactive view of feature "push/pull" effects*  
-        ➡️ **Right** = pushing price UP  
-        ⬅️ **Left** = pushing price DOWN  
-        🎯 **Middle** = average premium across all customers
+        *Interactive view of feature "push/pull" effects (hover for details)*  
+        🔴 **Red** = pushing price UP  
+        🔵 **Blue** = pushing price DOWN  
+        🎯 **Where they meet** = your predicted premium
         """)
-        force_plot = shap.force_plot(
-            explainer.expected_value, shap_values.values[0], user_df.iloc[0]
-        )
-        st_shap(force_plot, height=350)
+        contribution_chart(explanation, "force")
     
     # ---------- GLOBAL EXPLANATIONS ----------
     st.markdown("---")
@@ -169,9 +182,8 @@ if st.button("💰 Predict My Premium", type="primary"):
         🔴 **Red** = high values increase premium  
         🔵 **Blue** = low values decrease premium
         """)
-        fig_s, _ = plt.subplots(figsize=(10, 6))
-        shap.summary_plot(explainer(X_train).values, X_train, plot_type="bar", show=False)
-        st.pyplot(fig_s)
+        # Same for every profile: rendered once per model version, not per click
+        st.image(ml_models.global_plot("summary", artifact=artifact))
     
     with col2:
         st.markdown("""
@@ -181,9 +193,16 @@ if st.button("💰 Predict My Premium", type="primary"):
         🎨 **Color** = smoking status (red=smoker)  
         📈 **Pattern**: Smokers see MUCH bigger BMI penalty
         """)
-        fig_d, _ = plt.subplots(figsize=(10, 6))
-        shap.dependence_plot("bmi", explainer(X_train).values, X_train, show=False)
-        st.pyplot(fig_d)
+        st.image(ml_models.global_plot("dependence", artifact=artifact))
+
+    if explanation['mode'] != ml_models.GLOBAL_SHAP_MODE:
+        # The two SHAP algorithms start from slightly different average premiums
+        # (escaped "$" so Streamlit does not render the amounts as LaTeX)
+        st.caption(
+            f"Global plots use interventional SHAP over all customers (average premium "
+            f"\\${artifact.expected_value:,.0f}); your breakdown above uses {explanation['mode'].replace('_', '-')} "
+            f"SHAP (average premium \\${explanation['base_value']:,.0f}), so individual impacts can differ slightly."
+        )
     
     st.markdown("---")
     st.success("""
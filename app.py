@@ -5,33 +5,61 @@ Flask backend for the Medical Insurance app.
 Responsibilities:
 - User signup & login (SQLite via SQLAlchemy)
 - Premium prediction endpoint (/api/predict) using XGBoost model
+- Batch prediction endpoint (/api/predict/batch) for CSV / JSON Lines uploads
+- What-if sweep endpoint (/api/predict/sweep) for sensitivity charts
 - SHAP-based explainability for predictions
+- Global SHAP explanations (/api/explain/global) from the precomputed matrix
+- Explanation payloads for the client to draw (/api/explain) and cached
+  server-rendered explanation images (/api/explain/plot, /api/explain/global/plot)
 - Premium forecast endpoint (/api/forecast) using Holt–Winters model
+- Quotes persisted write-behind in batches (see quote_writer.py)
+- Quote history (/api/quotes, keyset-paginated) and per-user / per-day
+  quote stats maintained incrementally by the writer (admin token only:
+  they list other users' emails and quotes)
+- Per-stage latency, request/error counts and cache gauges (/metrics)
+- Model status, background incremental retraining and rollback (/api/model)
+- Liveness / readiness checks (/api/health/live, /api/health/ready);
+  serve.py runs the app under gunicorn with the model preloaded, the dev
+  server warms it on a background thread (ML libraries load lazily, so
+  auth and liveness are served right away)
 """
 
+import base64
+import csv
+import io
+import json
 import os
-from datetime import datetime
+import threading
+import time
+from datetime import date, datetime
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import and_, event, inspect, or_
+from werkzeug.exceptions import BadRequest
 
-from ml_models import (
-    predict_premium_from_input,
-    explain_premium_from_input,
-    forecast_premium_from_input,
-)
+# ML backends resolve on first use (see ml_models/__init__.py), so auth and
+# health requests are served before numpy / pandas / xgboost are imported
+import ml_models
+from ml_models import metrics
+from quote_writer import QuoteWriter, set_sqlite_pragmas
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(BASE_DIR, "models", "backend.db")
+DB_PATH = os.environ.get("BACKEND_DB_PATH", os.path.join(BASE_DIR, "models", "backend.db"))
 
-os.makedirs(os.path.join(BASE_DIR, "models"), exist_ok=True)
+os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
 app = Flask(__name__)
 CORS(app)
 
 app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{DB_PATH}"
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+# Wait for the write lock instead of failing when the quote writer holds it
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"connect_args": {"timeout": 30}}
+
+# sync | batched | relaxed -- see quote_writer.py
+QUOTE_DURABILITY = os.environ.get("QUOTE_DURABILITY", "batched")
 
 db = SQLAlchemy(app)
 
@@ -51,6 +79,10 @@ class User(db.Model):
 
 class Quote(db.Model):
     __tablename__ = "quotes"
+    __table_args__ = (
+        # One user's history, newest first, resumed from a (created_at, id) cursor
+        db.Index("ix_quotes_user_email_created_at", "user_email", "created_at", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_email = db.Column(db.String(120), nullable=True)
@@ -61,9 +93,11 @@ class Quote(db.Model):
     smoker = db.Column(db.String(10), nullable=False)
     region = db.Column(db.String(50), nullable=False)
     predicted_amount = db.Column(db.Float, nullable=False)
+    model_version = db.Column(db.String(64), nullable=True)  # premium model that priced the quote
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    def __init__(self, user_email=None, age=None, sex=None, bmi=None, children=None, smoker=None, region=None, predicted_amount=None):
+    def __init__(self, user_email=None, age=None, sex=None, bmi=None, children=None, smoker=None, region=None,
+                 predicted_amount=None, model_version=None):
         self.user_email = user_email
         self.age = age
         self.sex = sex
@@ -72,10 +106,114 @@ class Quote(db.Model):
         self.smoker = smoker
         self.region = region
         self.predicted_amount = predicted_amount
+        self.model_version = model_version
+
+
+class QuoteUserStats(db.Model):
+    """Running quote count / amount stats per user, updated with every quote batch."""
+    __tablename__ = "quote_stats_user"
+
+    user_email = db.Column(db.String(120), primary_key=True)
+    quote_count = db.Column(db.Integer, nullable=False)
+    amount_sum = db.Column(db.Float, nullable=False)
+    amount_min = db.Column(db.Float, nullable=False)
+    amount_max = db.Column(db.Float, nullable=False)
+    last_quote_at = db.Column(db.DateTime)
+
 
+class QuoteDailyStats(db.Model):
+    """Running quote count / amount stats per UTC day, updated with every quote batch."""
+    __tablename__ = "quote_stats_daily"
+
+    day = db.Column(db.Date, primary_key=True)
+    quote_count = db.Column(db.Integer, nullable=False)
+    amount_sum = db.Column(db.Float, nullable=False)
+    amount_min = db.Column(db.Float, nullable=False)
+    amount_max = db.Column(db.Float, nullable=False)
+    last_quote_at = db.Column(db.DateTime)
+
+
+quote_writer = QuoteWriter(
+    app, db, Quote, durability=QUOTE_DURABILITY,
+    user_stats=QuoteUserStats, daily_stats=QuoteDailyStats,
+)
 
 with app.app_context():
+    event.listen(db.engine, "connect", set_sqlite_pragmas(QUOTE_DURABILITY))
+    backfill_stats = not inspect(db.engine).has_table(QuoteDailyStats.__tablename__)
     db.create_all()
+    # create_all() skips indexes and new columns of tables that already exist
+    for index in Quote.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+    if "model_version" not in {column["name"] for column in inspect(db.engine).get_columns(Quote.__tablename__)}:
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql("ALTER TABLE quotes ADD COLUMN model_version VARCHAR(64)")
+    if backfill_stats:
+        quote_writer.rebuild_stats()
+
+
+# ---------- METRICS ----------
+
+def _endpoint():
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+def stage(name, endpoint=None):
+    """Time one stage of the current request into medins_stage_seconds."""
+    return metrics.timed("medins_stage_seconds", endpoint=endpoint or _endpoint(), stage=name)
+
+
+def record_error(message, endpoint=None):
+    metrics.inc("medins_errors_total", endpoint=endpoint or _endpoint())
+    app.logger.exception(message)
+
+
+@app.before_request
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def _record_request(response):
+    endpoint = _endpoint()
+    if "request_started" in g:
+        metrics.observe("medins_request_seconds", time.perf_counter() - g.request_started, endpoint=endpoint)
+    metrics.inc("medins_requests_total", endpoint=endpoint, status=str(response.status_code))
+    return response
+
+
+CACHE_COUNTERS = ("hits", "misses", "evictions", "invalidations")
+QUOTE_WRITER_COUNTERS = ("rows_written", "batches_written", "sync_fallbacks", "errors", "retries", "rows_dropped")
+
+
+def _cache_samples(cache, stats, counters=CACHE_COUNTERS):
+    yield "medins_cache_size", {"cache": cache}, stats["size"]
+    for field in counters:
+        yield f"medins_cache_{field}_total", {"cache": cache}, stats[field]
+
+
+def _collect_gauges():
+    # A scrape reports what is loaded; it must not load the ML backends itself.
+    # Cumulative stats are named *_total and exported as counters (see metrics.render).
+    if ml_models.loaded("premium"):
+        version = ml_models.loaded_model_version()
+        if version is not None:
+            yield "medins_model_info", {"version": version}, 1
+        for name, stats in ml_models.cache_stats().items():
+            yield from _cache_samples(name, stats)
+    if ml_models.loaded("rendering"):
+        yield from _cache_samples("explain_image", ml_models.image_cache_stats())
+    if ml_models.loaded("forecast_cache"):
+        from ml_models.forecast_cache import forecast_cache
+
+        yield from _cache_samples("forecast", forecast_cache.stats(), counters=("hits", "misses"))
+    writer = quote_writer.stats()
+    yield "medins_quote_writer_queued", {}, writer["queued"]
+    for field in QUOTE_WRITER_COUNTERS:
+        yield f"medins_quote_writer_{field}_total", {}, writer[field]
+
+
+metrics.register_collector(_collect_gauges)
 
 
 # ---------- AUTH ENDPOINTS ----------
@@ -133,6 +271,32 @@ def login():
 
 # ---------- PREDICTION + XAI ENDPOINT ----------
 
+def risk_label_for(predicted_amount):
+    if predicted_amount > 30000:
+        return "Very High"
+    if predicted_amount > 20000:
+        return "High"
+    if predicted_amount > 10000:
+        return "Medium"
+    return "Low"
+
+
+def quote_input(data):
+    """
+    Quote-form JSON -> model profile, with the form's defaults for missing
+    fields and categories normalized the way the model and caches see them,
+    so responses and stored quotes match what was priced.
+    """
+    return {
+        "age": int(data.get("age", 30)),
+        "sex": str(data.get("sex", "male")).strip().lower(),
+        "bmi": float(data.get("bmi", 25.0)),
+        "children": int(data.get("children", 0)),
+        "smoker": str(data.get("smoker", "no")).strip().lower(),
+        "region": str(data.get("region", "southwest")).strip().lower(),
+    }
+
+
 @app.route("/api/predict", methods=["POST"])
 def api_predict():
     """
@@ -149,50 +313,34 @@ def api_predict():
       "userEmail": "someone@example.com"  (optional)
     }
     """
-    data = request.get_json() or {}
-
     try:
-        ui_input = {
-            "age": int(data.get("age", 30)),
-            "sex": data.get("sex", "male"),
-            "bmi": float(data.get("bmi", 25.0)),
-            "children": int(data.get("children", 0)),
-            "smoker": data.get("smoker", "no"),
-            "region": data.get("region", "southwest"),
-        }
-
-        predicted_amount = predict_premium_from_input(ui_input)
-        explanation = explain_premium_from_input(ui_input, max_features=5)
-
-        user_email = data.get("userEmail")
-        quote = Quote(
-            user_email=user_email,
-            age=ui_input["age"],
-            sex=ui_input["sex"],
-            bmi=ui_input["bmi"],
-            children=ui_input["children"],
-            smoker=ui_input["smoker"],
-            region=ui_input["region"],
-            predicted_amount=predicted_amount,
-        )
-        db.session.add(quote)
-        db.session.commit()
-
-        label = "Low"
-        if predicted_amount > 30000:
-            label = "Very High"
-        elif predicted_amount > 20000:
-            label = "High"
-        elif predicted_amount > 10000:
-            label = "Medium"
+        with stage("parse"):
+            data = request.get_json() or {}
+            ui_input = quote_input(data)
+
+        # One model version for the prediction, its explanation and the stored quote, even across a hot swap
+        artifact = ml_models.load_model()
+        with stage("inference"):
+            predicted_amount = ml_models.predict_premium_from_input(ui_input, artifact)
+        with stage("shap"):
+            explanation = ml_models.explain_premium_from_input(ui_input, max_features=5, artifact=artifact)
+
+        with stage("persist"):
+            quote_writer.submit(dict(
+                ui_input,
+                user_email=data.get("userEmail"),
+                predicted_amount=predicted_amount,
+                model_version=artifact.version,
+            ))
 
         response = {
             "prediction": {
                 "predicted_amount": predicted_amount,
-                "risk_label": label,
+                "risk_label": risk_label_for(predicted_amount),
                 "monthly_estimate": round(predicted_amount / 12.0, 2),
             },
             "model_input": ui_input,
+            "model_version": artifact.version,
             "explainability": explanation,
             "transparency": {
                 "model_type": "XGBoost regressor on Kaggle medical_insurance.csv",
@@ -200,10 +348,427 @@ def api_predict():
             },
         }
 
-        return jsonify(response), 200
+        with stage("serialize"):
+            return jsonify(response), 200
+
+    except BadRequest as e:  # malformed JSON body: a client error, not a server one
+        return jsonify({"error": e.description}), 400
+    except (KeyError, TypeError, ValueError) as e:  # invalid field values, e.g. {"age": null}, unknown sex
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        record_error("Prediction error")
+        return jsonify({"error": str(e)}), 500
+
+
+# ---------- WHAT-IF SWEEP ENDPOINT ----------
+
+@app.route("/api/predict/sweep", methods=["POST"])
+def api_predict_sweep():
+    """
+    Premium curve (or surface) for the quote form's sliders, in one call.
+
+    Expected JSON:
+    {
+      "profile": {"age": 28, "sex": "male", "bmi": 24.5, "children": 0, "smoker": "no", "region": "southwest"},
+      "sweep": [
+        {"field": "bmi", "start": 18, "stop": 45, "step": 0.5},
+        {"field": "smoker"}                                (optional second axis)
+      ],
+      "explain": false                                     (true: SHAP values per grid point)
+    }
+
+    Returns {"axes": [{"field", "values"}], "predictions": [...] or [[...]]}.
+    The whole grid is scored with one model call; no Quote rows are written.
+    """
+    try:
+        with stage("parse"):
+            data = request.get_json() or {}
+            ui_input = quote_input(data.get("profile") or {})
+            axes = data.get("sweep")
+            if isinstance(axes, dict):
+                axes = [axes]
+            if not isinstance(axes, list) or not all(isinstance(axis, dict) for axis in axes):
+                raise ValueError("sweep must be a list of {field, start, stop, step} or {field, values} objects.")
+        with stage("inference"):
+            result = ml_models.sweep_premium(ui_input, axes, explain=bool(data.get("explain", False)))
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    except BadRequest as e:  # malformed JSON body: a client error, not a server one
+        return jsonify({"error": e.description}), 400
+    except Exception as e:
+        record_error("Sweep error")
+        return jsonify({"error": str(e)}), 500
+
+    with stage("serialize"):
+        return jsonify(result), 200
+
+
+# ---------- BATCH PREDICTION ENDPOINT ----------
+
+BATCH_FIELDS = ("age", "sex", "bmi", "children", "smoker", "region")
+BATCH_DEFAULT_CHUNK_SIZE = 1000
+BATCH_MAX_CHUNK_SIZE = 10000
+
+
+def _iter_batch_rows(stream, fmt):
+    """Yield CSV row dicts / raw JSON lines from an upload without reading it all."""
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    if fmt == "csv":
+        yield from csv.DictReader(text)
+    else:
+        for line in text:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def _batch_profile(row):
+    if isinstance(row, str):
+        row = json.loads(row)
+    missing = [field for field in BATCH_FIELDS if row.get(field) in (None, "")]
+    if missing:
+        raise ValueError(f"Missing fields: {', '.join(missing)}")
+    profile = {
+        "age": int(row["age"]),
+        "sex": str(row["sex"]).strip().lower(),
+        "bmi": float(row["bmi"]),
+        "children": int(row["children"]),
+        "smoker": str(row["smoker"]).strip().lower(),
+        "region": str(row["region"]).strip().lower(),
+    }
+    ml_models.validate_profile(profile)
+    return profile
+
+
+BATCH_ENDPOINT = "/api/predict/batch"
+
+
+def _score_batch_chunk(chunk, top_k, user_email):
+    """Score one chunk with a single model (and SHAP) call and queue its quotes in one go."""
+    profiles = [profile for _, profile in chunk]
+    artifact = ml_models.load_model()  # one model version for the whole chunk, even across a hot swap
+    with stage("inference", BATCH_ENDPOINT):
+        predictions = ml_models.predict_premium_batch(profiles, artifact)
+    explanations = None
+    if top_k > 0:
+        with stage("shap", BATCH_ENDPOINT):
+            explanations = ml_models.explain_premium_batch(profiles, max_features=top_k, artifact=artifact)
+
+    with stage("persist", BATCH_ENDPOINT):
+        quote_writer.submit_many([
+            dict(profile, user_email=user_email, predicted_amount=amount, model_version=artifact.version)
+            for profile, amount in zip(profiles, predictions)
+        ])
+
+    results = []
+    for i, ((row_number, _), amount) in enumerate(zip(chunk, predictions)):
+        result = {
+            "row": row_number,
+            "predicted_amount": amount,
+            "risk_label": risk_label_for(amount),
+            "monthly_estimate": round(amount / 12.0, 2),
+        }
+        if explanations is not None:
+            result["explainability"] = explanations[i]
+        results.append(result)
+    return results
+
+
+@app.route(BATCH_ENDPOINT, methods=["POST"])
+def api_predict_batch():
+    """
+    Re-price a whole book of members in one call.
+
+    Body: CSV (Content-Type: text/csv) or JSON Lines (anything else) with the
+    age/sex/bmi/children/smoker/region schema, one member per row.
+
+    Query params:
+      explain=<k>       include the top-k SHAP contributions per row (default 0)
+      chunk_size=<n>    rows scored per vectorized model call (default 1000)
+      userEmail=<email> stored on every Quote row (optional)
+
+    Streams back JSON Lines, one result per input row, tagged with its 1-based
+    "row" number. Rows that fail validation produce {"row": n, "error": "..."}
+    as soon as they are read and are not scored.
+    """
+    fmt = "csv" if (request.mimetype or "").endswith("csv") else "jsonl"
+    try:
+        top_k = max(0, int(request.args.get("explain", 0)))
+        chunk_size = int(request.args.get("chunk_size", BATCH_DEFAULT_CHUNK_SIZE))
+    except ValueError:
+        return jsonify({"error": "explain and chunk_size must be integers."}), 400
+    chunk_size = min(max(1, chunk_size), BATCH_MAX_CHUNK_SIZE)
+    user_email = request.args.get("userEmail")
+    stream = request.stream
+
+    def generate():
+        chunk = []
+        row_number = 0
+        try:
+            for row_number, row in enumerate(_iter_batch_rows(stream, fmt), start=1):
+                try:
+                    chunk.append((row_number, _batch_profile(row)))
+                except (ValueError, TypeError, AttributeError) as e:
+                    yield json.dumps({"row": row_number, "error": str(e)}) + "\n"
+                    continue
+                if len(chunk) >= chunk_size:
+                    yield _serialize_batch(_score_batch_chunk(chunk, top_k, user_email))
+                    chunk = []
+            if chunk:
+                yield _serialize_batch(_score_batch_chunk(chunk, top_k, user_email))
+        except Exception as e:
+            record_error("Batch prediction error", BATCH_ENDPOINT)
+            yield json.dumps({"row": row_number, "error": str(e), "aborted": True}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+def _serialize_batch(results):
+    with stage("serialize", BATCH_ENDPOINT):
+        return "".join(json.dumps(result) + "\n" for result in results)
+
+
+# ---------- QUOTE HISTORY + STATS ENDPOINTS ----------
+
+QUOTES_DEFAULT_LIMIT = 50
+QUOTES_MAX_LIMIT = 500
+
+
+def _encode_cursor(quote):
+    raw = f"{quote.created_at.isoformat()}|{quote.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor):
+    try:
+        created_at, quote_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(quote_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor.") from e
+
+
+def _stats_dict(stats):
+    return {
+        "quote_count": stats.quote_count,
+        "mean_amount": round(stats.amount_sum / stats.quote_count, 2),
+        "min_amount": stats.amount_min,
+        "max_amount": stats.amount_max,
+        "last_quote_at": stats.last_quote_at.isoformat() if stats.last_quote_at else None,
+    }
+
+
+@app.route("/api/quotes", methods=["GET"])
+def api_quotes():
+    """
+    One user's quote history, newest first.
+
+    GET /api/quotes?userEmail=a@b.com[&limit=50][&cursor=<next_cursor>]
+    Header X-Admin-Token: $MODEL_ADMIN_TOKEN
 
+    Keyset pagination over the (user_email, created_at, id) index: each page
+    returns "next_cursor" (null on the last page), and fetching the next page
+    costs the same however deep it is. Quotes appear once the write-behind
+    writer has flushed them (within ~0.2 s).
+    """
+    error = _admin_error()
+    if error:
+        return error
+    user_email = request.args.get("userEmail")
+    if not user_email:
+        return jsonify({"error": "userEmail is required."}), 400
+    try:
+        limit = min(max(1, int(request.args.get("limit", QUOTES_DEFAULT_LIMIT))), QUOTES_MAX_LIMIT)
+        cursor = request.args.get("cursor")
+        after = _decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    query = Quote.query.filter(Quote.user_email == user_email)
+    if after is not None:
+        created_at, quote_id = after
+        query = query.filter(or_(
+            Quote.created_at < created_at,
+            and_(Quote.created_at == created_at, Quote.id < quote_id),
+        ))
+    rows = query.order_by(Quote.created_at.desc(), Quote.id.desc()).limit(limit + 1).all()
+    page = rows[:limit]
+
+    return jsonify({
+        "quotes": [
+            {
+                "id": q.id,
+                "created_at": q.created_at.isoformat(),
+                "predicted_amount": q.predicted_amount,
+                "model_version": q.model_version,
+                "model_input": {
+                    "age": q.age, "sex": q.sex, "bmi": q.bmi,
+                    "children": q.children, "smoker": q.smoker, "region": q.region,
+                },
+            }
+            for q in page
+        ],
+        "next_cursor": _encode_cursor(page[-1]) if len(rows) > limit else None,
+    }), 200
+
+
+@app.route("/api/quotes/stats", methods=["GET"])
+def api_quote_stats():
+    """Precomputed quote stats for one user: GET /api/quotes/stats?userEmail=a@b.com (X-Admin-Token)"""
+    error = _admin_error()
+    if error:
+        return error
+    user_email = request.args.get("userEmail")
+    if not user_email:
+        return jsonify({"error": "userEmail is required."}), 400
+    stats = db.session.get(QuoteUserStats, user_email)
+    if stats is None:
+        return jsonify({"user_email": user_email, "quote_count": 0}), 200
+    return jsonify(dict(_stats_dict(stats), user_email=user_email)), 200
+
+
+@app.route("/api/quotes/stats/daily", methods=["GET"])
+def api_quote_stats_daily():
+    """
+    Precomputed daily quote volume (UTC days), oldest first.
+
+    GET /api/quotes/stats/daily[?start=2025-01-01][&end=2025-01-31]   (default: last 30 days)
+    Header X-Admin-Token: $MODEL_ADMIN_TOKEN
+    """
+    error = _admin_error()
+    if error:
+        return error
+    try:
+        end = date.fromisoformat(request.args["end"]) if "end" in request.args else datetime.utcnow().date()
+        start = (date.fromisoformat(request.args["start"]) if "start" in request.args
+                 else date.fromordinal(end.toordinal() - 29))
+    except ValueError:
+        return jsonify({"error": "start and end must be YYYY-MM-DD dates."}), 400
+
+    rows = (
+        QuoteDailyStats.query
+        .filter(QuoteDailyStats.day >= start, QuoteDailyStats.day <= end)
+        .order_by(QuoteDailyStats.day)
+        .all()
+    )
+    return jsonify({
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "days": [dict(_stats_dict(row), day=row.day.isoformat()) for row in rows],
+    }), 200
+
+
+# ---------- GLOBAL EXPLANATION ENDPOINT ----------
+
+@app.route("/api/explain/global", methods=["GET"])
+def api_explain_global():
+    """
+    Model-wide SHAP explanations, served from the per-version precomputed matrix.
+
+    GET /api/explain/global                              -> mean |SHAP| per feature
+    GET /api/explain/global?feature=bmi&color_by=smoker  -> dependence plot data
+
+    "mode" names the SHAP algorithm; its base_value differs slightly from
+    /api/explain's unless that is asked for the same mode.
+    """
+    feature = request.args.get("feature")
+    try:
+        with stage("shap"):
+            if feature is None:
+                payload = ml_models.global_shap_summary()
+            else:
+                payload = ml_models.global_shap_dependence(feature, request.args.get("color_by"))
+        with stage("serialize"):
+            return jsonify(payload), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        record_error("Global explanation error")
+        return jsonify({"error": str(e)}), 500
+
+
+# ---------- EXPLANATION RENDERING ENDPOINTS ----------
+
+def image_response(image, fmt, model_version):
+    response = Response(image, mimetype=ml_models.IMAGE_FORMATS[fmt])
+    response.headers["X-Model-Version"] = model_version
+    return response
+
+
+@app.route("/api/explain", methods=["POST"])
+def api_explain():
+    """
+    Everything the client needs to draw a waterfall or force plot itself.
+
+    Same JSON body as /api/predict; returns
+    {"model_version", "mode", "base_value", "prediction",
+     "contributions": [{"feature", "value", "impact"}, ...]}  (largest |impact| first)
+    """
+    try:
+        with stage("parse"):
+            ui_input = quote_input(request.get_json() or {})
+        with stage("shap"):
+            payload = ml_models.explanation_payload(ui_input)
+        with stage("serialize"):
+            return jsonify(payload), 200
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    except BadRequest as e:  # malformed JSON body: a client error, not a server one
+        return jsonify({"error": e.description}), 400
+    except Exception as e:
+        record_error("Explanation error")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/explain/plot", methods=["POST"])
+def api_explain_plot():
+    """
+    Server-rendered waterfall of /api/explain's payload, for clients that cannot draw.
+
+    POST /api/explain/plot?format=svg|png   (same JSON body as /api/predict)
+    Images are cached per (model version, normalized profile, format).
+    """
+    fmt = request.args.get("format", "svg")
+    try:
+        with stage("parse"):
+            ui_input = quote_input(request.get_json() or {})
+        # The image and its X-Model-Version header come from the same model version
+        artifact = ml_models.load_model()
+        with stage("render"):
+            image = ml_models.render_waterfall(ui_input, fmt, artifact=artifact)
+        return image_response(image, fmt, artifact.version)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    except BadRequest as e:  # malformed JSON body: a client error, not a server one
+        return jsonify({"error": e.description}), 400
+    except Exception as e:
+        record_error("Explanation plot error")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/explain/global/plot", methods=["GET"])
+def api_explain_global_plot():
+    """
+    Model-wide plots, rendered once per model version.
+
+    GET /api/explain/global/plot?kind=summary|dependence&format=png|svg
+
+    The URL stays the same across model versions, so caches must revalidate:
+    the ETag names the version and an unchanged one gets a bodiless 304.
+    """
+    kind = request.args.get("kind", "summary")
+    fmt = request.args.get("format", "png")
+    try:
+        artifact = ml_models.load_model()
+        with stage("render"):
+            image = ml_models.global_plot(kind, fmt, artifact)
+        response = image_response(image, fmt, artifact.version)
+        response.set_etag(f"{artifact.version}-{kind}.{fmt}")
+        response.headers["Cache-Control"] = "public, no-cache"
+        return response.make_conditional(request)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        print("Prediction error:", e)
+        record_error("Global explanation plot error")
         return jsonify({"error": str(e)}), 500
 
 
@@ -221,39 +786,178 @@ def api_forecast():
       "province": "Ontario",
       "employer_size": "Individual",
       "plan_type": "Extended Health",
-      "risk_score": 1.5
+      "risk_score": 1.5,
+      "interval_quantiles": [0.025, 0.975],   (optional)
+      "interval_repetitions": 2000            (optional, simulated paths)
     }
     """
-    data = request.get_json() or {}
-
     try:
-        ui_input = {
-            "age": int(data.get("age", 35)),
-            "sex": data.get("sex", "Female"),
-            "province": data.get("province", "Ontario"),
-            "employer_size": data.get("employer_size", "Individual"),
-            "plan_type": data.get("plan_type", "Extended Health"),
-            "risk_score": float(data.get("risk_score", 1.5)),
-        }
-
-        result = forecast_premium_from_input(ui_input)
+        with stage("parse"):
+            data = request.get_json() or {}
+            ui_input = {
+                "age": int(data.get("age", 35)),
+                "sex": data.get("sex", "Female"),
+                "province": data.get("province", "Ontario"),
+                "employer_size": data.get("employer_size", "Individual"),
+                "plan_type": data.get("plan_type", "Extended Health"),
+                "risk_score": float(data.get("risk_score", 1.5)),
+            }
+
+            interval = {}
+            if "interval_quantiles" in data:
+                interval["quantiles"] = [float(q) for q in data["interval_quantiles"]]
+            if "interval_repetitions" in data:
+                interval["repetitions"] = int(data["interval_repetitions"])
+
+        with stage("forecast"):
+            result = ml_models.forecast_premium_from_input(ui_input, **interval)
 
         if "error" in result:
             return jsonify(result), 400
 
-        return jsonify(result), 200
+        with stage("serialize"):
+            return jsonify(result), 200
 
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    except BadRequest as e:  # malformed JSON body: a client error, not a server one
+        return jsonify({"error": e.description}), 400
     except Exception as e:
-        print("Forecast error:", e)
+        record_error("Forecast error")
         return jsonify({"error": str(e)}), 500
 
 
-# ---------- HEALTH CHECK ----------
+# ---------- MODEL MANAGEMENT ENDPOINTS ----------
+
+# Quote history / stats, retrain and rollback are disabled unless a token is configured
+MODEL_ADMIN_TOKEN = os.environ.get("MODEL_ADMIN_TOKEN")
+RETRAIN_DATA_DIR = os.path.realpath(os.path.join(BASE_DIR, "data"))
+
+
+def _admin_error():
+    if not MODEL_ADMIN_TOKEN:
+        return jsonify({"error": "Model administration is disabled (set MODEL_ADMIN_TOKEN)."}), 403
+    if request.headers.get("X-Admin-Token") != MODEL_ADMIN_TOKEN:
+        return jsonify({"error": "Invalid admin token."}), 401
+    return None
+
+
+@app.route("/api/model", methods=["GET"])
+def api_model_status():
+    """Served and previous model versions plus the state of the last retrain."""
+    ml_models.load_model()
+    return jsonify(ml_models.model_manager.status()), 200
+
+
+@app.route("/api/model/retrain", methods=["POST"])
+def api_model_retrain():
+    """
+    Continue boosting the served model on new labelled rows, in the background.
+
+    Header X-Admin-Token: $MODEL_ADMIN_TOKEN
+    JSON: {"data": "new_quotes.csv", "rounds": 20, "tolerance": 0.0}
+    (data is a CSV under data/ with the medical_insurance.csv columns)
+
+    Returns 202 at once; poll GET /api/model for the outcome. Requests keep
+    being served by the current model until the candidate has validated and
+    warmed up, then switch to it atomically.
+    """
+    error = _admin_error()
+    if error:
+        return error
+    data = request.get_json() or {}
+    path = os.path.realpath(os.path.join(RETRAIN_DATA_DIR, str(data.get("data", ""))))
+    if not path.startswith(RETRAIN_DATA_DIR + os.sep) or not os.path.isfile(path):
+        return jsonify({"error": "data must name a CSV file under data/."}), 400
+    try:
+        job = ml_models.model_manager.retrain(
+            path, rounds=int(data.get("rounds", 20)), tolerance=float(data.get("tolerance", 0.0)),
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 409
+    return jsonify(job), 202
+
+
+@app.route("/api/model/rollback", methods=["POST"])
+def api_model_rollback():
+    """Serve the previous model version again (kept loaded, so this is instant)."""
+    error = _admin_error()
+    if error:
+        return error
+    try:
+        version = ml_models.model_manager.rollback()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+    return jsonify({"version": version}), 200
+
+
+# ---------- WARM-UP + HEALTH CHECKS ----------
+
+WARMUP_PROFILE = {"age": 30, "sex": "male", "bmi": 25.0, "children": 0, "smoker": "no", "region": "southwest"}
+
+_readiness = {"ready": False, "model_version": None, "forecast_data": False}
+
+
+def warm_up():
+    """
+    Load the model artifact, explanation engine and claims index and push one
+    profile through them, so nothing is loaded lazily on a live request.
+    serve.py calls this in the master before forking workers.
+    """
+    artifact = ml_models.load_model()
+    artifact.X_train
+    artifact.global_shap_values
+    ml_models.predict_premium_batch([WARMUP_PROFILE])
+    ml_models.explain_premium_batch([WARMUP_PROFILE], max_features=5)
+    ml_models.prerender_global_plots(artifact)
+
+    try:
+        ml_models.load_claims()
+        ml_models.segment_index()
+        _readiness["forecast_data"] = True
+    except FileNotFoundError as e:
+        app.logger.warning("Forecast data not loaded: %s", e)
+
+    _readiness.update(ready=True, model_version=artifact.version)
+
+
+def warm_up_in_background():
+    """warm_up() on a daemon thread: requests are served meanwhile, /api/health/ready says 503."""
+    def run():
+        try:
+            warm_up()
+        except Exception:
+            app.logger.exception("Warm-up failed")
+
+    threading.Thread(target=run, name="warm-up", daemon=True).start()
+
 
 @app.route("/api/health", methods=["GET"])
+@app.route("/api/health/live", methods=["GET"])
 def health():
+    """Liveness: the process is up and serving requests."""
     return jsonify({"status": "ok"}), 200
 
 
+@app.route("/api/health/ready", methods=["GET"])
+def readiness():
+    """Readiness: 200 only once warm_up() has loaded and exercised the model."""
+    if not _readiness["ready"]:
+        return jsonify(dict(_readiness, status="starting")), 503
+    return jsonify(dict(_readiness, model_version=ml_models.loaded_model_version(), status="ready")), 200
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Prometheus scrape target (text exposition format)."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
+    # Development server; see serve.py for the multi-worker production entry point.
+    # debug=True runs the app in a reloader child; only that process serves, so only it warms up.
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        warm_up_in_background()
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,7 @@
+"""
+Benchmarks for the Flask API and ML backends.
+
+- run.py:      offline latency suite with stored baselines
+- startup.py:  where the API's startup time goes
+- loadtest.py: load generator for a running API (throughput, percentiles, knee)
+"""
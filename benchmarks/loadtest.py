@@ -0,0 +1,303 @@
+# benchmarks/loadtest.py
+"""
+Load generator for a running Flask API (python app.py / python serve.py).
+
+Request bodies are sampled from the data the models were built on:
+/api/predict bodies are rows of data/medical_insurance.csv (optionally with
+a userEmail from a small pool, so quotes are persisted and the per-user
+stats rows contend in SQLite), /api/forecast bodies are claims rows, so the
+province / plan / employer-size mix follows the claims dataset.
+
+The run is a series of steps, one per (rate, concurrency) pair. A step with
+a rate is open loop: requests are scheduled at Poisson arrivals and their
+latency is measured from the scheduled time, so queueing behind a slow
+server counts (no coordinated omission). Rate 0 is closed loop: each of the
+`concurrency` clients sends its next request as soon as the last returns.
+
+Every step reports throughput, latency percentiles and error rate, overall
+and per endpoint. The knee is the first step that misses its offered rate,
+lets p95 grow past --knee-factor times the first step's, or errors on more
+than --max-error-rate of requests; the step before it is the sustainable
+load.
+
+Point the app at a scratch database (BACKEND_DB_PATH) before loading it:
+predict requests with a userEmail are stored as quotes.
+
+    python -m benchmarks.loadtest --rates 5,10,20,40 --concurrency 16 --duration 20
+    python -m benchmarks.loadtest --concurrency 1,2,4,8,16 --mix predict=1 --json /tmp/load.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from ml_models.snapshots import DATASETS, load_table
+
+ENDPOINTS = {"predict": "/api/predict", "forecast": "/api/forecast"}
+
+
+# ---------- Request bodies ----------
+
+def sample_bodies(n, mix, user_fraction=0.5, users=200, seed=0):
+    """n (endpoint, JSON body) pairs, endpoints drawn per `mix` ({"predict": 0.8, ...})."""
+    rng = np.random.default_rng(seed)
+    names = list(mix)
+    weights = np.asarray([mix[name] for name in names], dtype=float)
+    endpoints = rng.choice(names, size=n, p=weights / weights.sum())
+
+    bodies = []
+    if "predict" in names:
+        insurance, _ = load_table(DATASETS["insurance"], "insurance")
+        rows = insurance.iloc[rng.integers(0, len(insurance), n)]
+        emails = rng.integers(0, users, n)
+        with_email = rng.random(n) < user_fraction
+        predict = [
+            dict({"age": int(r.age), "sex": str(r.sex), "bmi": float(r.bmi), "children": int(r.children),
+                  "smoker": str(r.smoker), "region": str(r.region)},
+                 **({"userEmail": f"loadtest-{emails[i]}@example.com"} if with_email[i] else {}))
+            for i, r in enumerate(rows.itertuples())
+        ]
+    if "forecast" in names:
+        claims, _ = load_table(DATASETS["claims"], "claims")
+        rows = claims.iloc[rng.integers(0, len(claims), n)]
+        forecast = [
+            {"age": int(r.age), "sex": str(r.sex), "province": str(r.province),
+             "employer_size": str(r.employer_size), "plan_type": str(r.plan_type),
+             "risk_score": float(r.risk_score)}
+            for r in rows.itertuples()
+        ]
+    for i, endpoint in enumerate(endpoints):
+        body = predict[i] if endpoint == "predict" else forecast[i]
+        bodies.append((endpoint, json.dumps(body).encode()))
+    return bodies
+
+
+# ---------- Client ----------
+
+class _Client:
+    """One keep-alive connection per worker thread; reconnects when the server closes it."""
+
+    def __init__(self, url, timeout):
+        parts = urlsplit(url)
+        self.host, self.port, self.timeout = parts.hostname, parts.port or 80, timeout
+        self.conn = None
+
+    def post(self, path, body):
+        """HTTP status, or the exception's class name for connection errors."""
+        # A reused connection may have been closed by the server while idle; retry once on a new one
+        for attempt in range(2):
+            reused = self.conn is not None
+            try:
+                if self.conn is None:
+                    self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+                self.conn.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+                response = self.conn.getresponse()
+                response.read()
+                if response.will_close:
+                    self.conn.close()
+                    self.conn = None
+                return response.status
+            except (OSError, http.client.HTTPException) as e:
+                if self.conn is not None:
+                    self.conn.close()
+                self.conn = None
+                if not reused or isinstance(e, TimeoutError):
+                    return type(e).__name__
+
+
+def run_step(url, bodies, rate, concurrency, duration, timeout=30.0, seed=0):
+    """
+    Drive the API for `duration` seconds. Returns one record per request:
+    (endpoint, status, latency seconds) with latency from the scheduled
+    send time (open loop) or the actual send time (closed loop, rate 0).
+    """
+    if rate > 0:
+        gaps = np.random.default_rng(seed).exponential(1.0 / rate, size=int(rate * duration * 1.5) + 1)
+        offsets = np.cumsum(gaps)
+        offsets = offsets[offsets < duration]
+    else:
+        offsets = None
+
+    records = []
+    lock = threading.Lock()
+    next_index = [0]
+    started = time.perf_counter() + 0.05
+
+    def worker():
+        client = _Client(url, timeout)
+        while True:
+            with lock:
+                i = next_index[0]
+                next_index[0] += 1
+            if offsets is not None:
+                if i >= len(offsets):
+                    break
+                scheduled = started + offsets[i]
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                if time.perf_counter() < started:
+                    time.sleep(started - time.perf_counter())
+                scheduled = time.perf_counter()
+                if scheduled - started >= duration:
+                    break
+            endpoint, body = bodies[i % len(bodies)]
+            status = client.post(ENDPOINTS[endpoint], body)
+            done = time.perf_counter()
+            with lock:
+                records.append((endpoint, status, done - scheduled, done))
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # A server that keeps up finishes about when the schedule ends; one that does not, later
+    elapsed = max([record[3] for record in records], default=started) - started
+    return [record[:3] for record in records], max(elapsed, duration)
+
+
+# ---------- Report ----------
+
+def _summarize(records, elapsed):
+    latencies = np.asarray([latency for _, _, latency in records]) * 1000
+    errors = sum(1 for _, status, _ in records if status != 200)
+    if not len(latencies):
+        return {"requests": 0, "throughput_per_s": 0.0, "error_rate": 0.0,
+                "p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "requests": len(records),
+        "throughput_per_s": round(len(records) / elapsed, 2),
+        "error_rate": round(errors / len(records), 4),
+        "p50_ms": round(float(p50), 1),
+        "p95_ms": round(float(p95), 1),
+        "p99_ms": round(float(p99), 1),
+        "max_ms": round(float(latencies.max()), 1),
+    }
+
+
+def summarize_step(rate, concurrency, records, elapsed, duration):
+    statuses = {}
+    for _, status, _ in records:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return dict(
+        _summarize(records, elapsed),
+        target_per_s=rate or None,
+        # Every scheduled request yields a record, so this is the Poisson schedule's actual rate
+        offered_per_s=round(len(records) / duration, 2) if rate else None,
+        concurrency=concurrency,
+        statuses=statuses,
+        endpoints={
+            name: _summarize([r for r in records if r[0] == name], elapsed)
+            for name in sorted({r[0] for r in records})
+        },
+    )
+
+
+def find_knee(steps, knee_factor=3.0, max_error_rate=0.01, min_efficiency=0.9):
+    """(index of the first step past the knee or None, reason)."""
+    if not steps or steps[0]["p95_ms"] is None:
+        return None, None
+    base_p95 = steps[0]["p95_ms"]
+    for i, step in enumerate(steps):
+        if step["requests"] == 0:
+            return i, "no responses"
+        if step["error_rate"] > max_error_rate:
+            return i, f"error rate {step['error_rate']:.1%}"
+        if step["offered_per_s"] and step["throughput_per_s"] < step["offered_per_s"] * min_efficiency:
+            return i, f"served {step['throughput_per_s']:.1f}/s of {step['offered_per_s']:g}/s offered"
+        if i > 0 and step["p95_ms"] > base_p95 * knee_factor:
+            return i, f"p95 {step['p95_ms']:.0f} ms > {knee_factor:g}x {base_p95:.0f} ms"
+    return None, None
+
+
+def print_report(steps, knee, reason):
+    print(f"\n{'rate/s':>7} {'conc':>5} {'reqs':>6} {'ok/s':>7} {'err %':>6} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}  per endpoint p95 ms")
+    for i, step in enumerate(steps):
+        offered = f"{step['target_per_s']:g}" if step["target_per_s"] else "max"
+        per_endpoint = ", ".join(
+            f"{name} {stats['p95_ms']:.0f}" for name, stats in step["endpoints"].items() if stats["p95_ms"] is not None
+        )
+        p = {key: f"{step[key]:.1f}" if step[key] is not None else "-" for key in ("p50_ms", "p95_ms", "p99_ms", "max_ms")}
+        marker = "  <- knee" if i == knee else ""
+        print(f"{offered:>7} {step['concurrency']:>5} {step['requests']:>6} "
+              f"{step['throughput_per_s'] * (1 - step['error_rate']):>7.1f} {step['error_rate'] * 100:>6.1f} "
+              f"{p['p50_ms']:>8} {p['p95_ms']:>8} {p['p99_ms']:>8} {p['max_ms']:>8}  {per_endpoint}{marker}")
+
+    if knee is None:
+        print("\nNo knee: latency and errors held up at every step.")
+    elif knee == 0:
+        print(f"\nKnee at the first step ({reason}); start lower.")
+    else:
+        last = steps[knee - 1]
+        print(f"\nSustainable: {last['throughput_per_s']:.1f} req/s "
+              f"(step {knee}, p95 {last['p95_ms']:.0f} ms). Knee at step {knee + 1}: {reason}.")
+
+
+def _parse_list(text, cast):
+    return [cast(value) for value in text.split(",") if value.strip()]
+
+
+def _parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint '{name}' in --mix; expected {sorted(ENDPOINTS)}.")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.loadtest", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default=os.environ.get("LOADTEST_URL", "http://127.0.0.1:5000"))
+    parser.add_argument("--rates", default="0", help="comma-separated target req/s per step (0 = closed loop)")
+    parser.add_argument("--concurrency", default="8", help="comma-separated client threads per step")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per step")
+    parser.add_argument("--mix", default="predict=0.8,forecast=0.2", help="endpoint weights")
+    parser.add_argument("--user-fraction", type=float, default=0.5, help="share of predict bodies with a userEmail")
+    parser.add_argument("--knee-factor", type=float, default=3.0, help="p95 growth over the first step that marks the knee")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout in seconds")
+    parser.add_argument("--stop-at-knee", action="store_true", help="skip the steps after the knee")
+    parser.add_argument("--json", help="also write the step summaries to this file")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    bodies = sample_bodies(5000, _parse_mix(args.mix), user_fraction=args.user_fraction, seed=args.seed)
+    plan = [(rate, concurrency) for rate in _parse_list(args.rates, float)
+            for concurrency in _parse_list(args.concurrency, int)]
+
+    steps = []
+    for number, (rate, concurrency) in enumerate(plan, start=1):
+        label = f"{rate:g} req/s" if rate > 0 else "closed loop"
+        print(f"step {number}/{len(plan)}: {label}, {concurrency} clients, {args.duration:g}s ...", flush=True)
+        records, elapsed = run_step(args.url, bodies, rate, concurrency, args.duration,
+                                    timeout=args.timeout, seed=args.seed + number)
+        steps.append(summarize_step(rate, concurrency, records, elapsed, args.duration))
+        knee, _ = find_knee(steps, args.knee_factor, args.max_error_rate)
+        if args.stop_at_knee and knee is not None:
+            break
+
+    knee, reason = find_knee(steps, args.knee_factor, args.max_error_rate)
+    print_report(steps, knee, reason)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"url": args.url, "mix": _parse_mix(args.mix), "duration": args.duration,
+                       "steps": steps, "knee_step": knee, "knee_reason": reason}, f, indent=2)
+        print(f"Step summaries written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+# benchmarks/run.py
+"""
+Offline benchmark suite for the prediction, explanation and forecasting paths.
+
+Everything runs against data/medical_insurance.csv and a synthetic claims
+file (benchmarks/synthetic_claims.py) inside a scratch directory: a fresh
+model registry, data snapshot store, forecast cache and SQLite database, so
+nothing under models/ is touched; the directory is removed when the run
+ends. The single-profile result caches are disabled unless
+--with-cache is given, so the numbers measure the model work itself.
+
+Each benchmark reports p50/p95/p99/mean latency, throughput and the peak
+Python heap allocation (tracemalloc) of a separate, shorter pass. Results
+are compared against a stored baseline and the run fails when p50 or p95 of
+any benchmark regresses by more than --threshold.
+
+    python -m benchmarks.run                      # compare with benchmarks/baselines/local.json
+    python -m benchmarks.run --save-baseline      # (re)write the baseline
+    python -m benchmarks.run --only predict_one,api_predict --threshold 0.3
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INSURANCE_PATH = os.path.join(BASE_DIR, "data", "medical_insurance.csv")
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+GATED_METRICS = ("p50_ms", "p95_ms")
+
+
+# ---------- Environment ----------
+
+def prepare_environment(workdir, members, with_cache):
+    """Point every backend at scratch copies. Must run before ml_models / app are imported."""
+    from benchmarks.synthetic_claims import make_claims
+
+    claims_path = os.path.join(workdir, "claims.csv")
+    make_claims(members).to_csv(claims_path, index=False)
+    os.environ.update({
+        "PREMIUM_MODEL_REGISTRY": os.path.join(workdir, "registry"),
+        "DATA_SNAPSHOT_DIR": os.path.join(workdir, "snapshots"),
+        "FORECAST_CACHE_DIR": os.path.join(workdir, "forecast_cache"),
+        "CLAIMS_DATA_PATH": claims_path,
+        "BACKEND_DB_PATH": os.path.join(workdir, "backend.db"),
+    })
+    os.environ.pop("PREMIUM_MODEL_VERSION", None)  # a pinned version does not exist in the scratch registry
+    if not with_cache:
+        os.environ["PREMIUM_CACHE_SIZE"] = "0"
+    return claims_path
+
+
+def sample_inputs(claims_path, n, seed=0):
+    insurance = pd.read_csv(INSURANCE_PATH).sample(n=n, replace=True, random_state=seed)
+    premium_inputs = [
+        {"age": int(r.age), "sex": r.sex, "bmi": float(r.bmi), "children": int(r.children),
+         "smoker": r.smoker, "region": r.region}
+        for r in insurance.itertuples()
+    ]
+    claims = pd.read_csv(claims_path).sample(n=n, replace=True, random_state=seed)
+    forecast_inputs = [
+        {"age": int(r.age), "sex": r.sex, "province": r.province, "employer_size": r.employer_size,
+         "plan_type": r.plan_type, "risk_score": float(r.risk_score)}
+        for r in claims.itertuples()
+    ]
+    return premium_inputs, forecast_inputs
+
+
+# ---------- Benchmarks ----------
+
+def build_benchmarks(premium_inputs, forecast_inputs):
+    """name -> (iterations, zero-arg setup returning a call(i) function)."""
+    import ml_models
+
+    def api_client():
+        import app
+        return app.app.test_client()
+
+    batch_body = "\n".join(json.dumps(p) for p in premium_inputs[:100])
+
+    def predict_one():
+        return lambda i: ml_models.predict_premium_from_input(premium_inputs[i % len(premium_inputs)])
+
+    def explain_one():
+        return lambda i: ml_models.explain_premium_from_input(premium_inputs[i % len(premium_inputs)], max_features=5)
+
+    def predict_batch_1000():
+        batch = (premium_inputs * (1000 // len(premium_inputs) + 1))[:1000]
+        return lambda i: ml_models.predict_premium_batch(batch)
+
+    def warm_forecasts():
+        # Steady state: every sampled member's Holt–Winters state is fitted once up front
+        for ui_input in forecast_inputs:
+            ml_models.forecast_premium_from_input(ui_input)
+
+    def forecast_one():
+        warm_forecasts()
+        return lambda i: ml_models.forecast_premium_from_input(forecast_inputs[i % len(forecast_inputs)])
+
+    def forecast_fit_one():
+        from ml_models.forecast import load_claims
+        from ml_models.forecast_cache import fit_state, iter_member_series
+        series = [s for _, s in iter_member_series(load_claims()) if len(s) >= 24][:50]
+        return lambda i: fit_state(series[i % len(series)])
+
+    def api_predict():
+        client = api_client()
+        return lambda i: client.post("/api/predict", json=premium_inputs[i % len(premium_inputs)])
+
+    def api_forecast():
+        warm_forecasts()
+        client = api_client()
+        return lambda i: client.post("/api/forecast", json=forecast_inputs[i % len(forecast_inputs)])
+
+    def api_predict_batch_100():
+        client = api_client()
+        return lambda i: client.post("/api/predict/batch?explain=3", data=batch_body,
+                                     content_type="application/x-ndjson").get_data()
+
+    def api_explain_global():
+        client = api_client()
+        return lambda i: client.get("/api/explain/global")
+
+    return {
+        "predict_one": (300, predict_one),
+        "explain_one": (300, explain_one),
+        "predict_batch_1000": (30, predict_batch_1000),
+        "forecast_one": (300, forecast_one),
+        "forecast_fit_one": (50, forecast_fit_one),
+        "api_predict": (200, api_predict),
+        "api_forecast": (200, api_forecast),
+        "api_predict_batch_100": (20, api_predict_batch_100),
+        "api_explain_global": (100, api_explain_global),
+    }
+
+
+def _summarize(samples, peak_bytes):
+    samples_ms = np.asarray(samples) * 1000
+    p50, p95, p99 = np.percentile(samples_ms, [50, 95, 99])
+    return {
+        "iterations": len(samples),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "mean_ms": round(float(samples_ms.mean()), 3),
+        "throughput_per_s": round(float(1000 / samples_ms.mean()), 1),
+        "peak_mem_kib": round(peak_bytes / 1024, 1),
+    }
+
+
+def run_benchmark(setup, iterations, warmup=5):
+    call = setup()
+    for i in range(warmup):
+        call(i)
+
+    samples = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        call(i)
+        samples.append(time.perf_counter() - started)
+
+    # Separate pass: tracemalloc slows allocation-heavy code down
+    tracemalloc.start()
+    for i in range(min(iterations, 20)):
+        call(i)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return _summarize(samples, peak)
+
+
+COLD_START_SNIPPET = """
+import time
+started = time.perf_counter()
+from ml_models.registry import load_artifact
+artifact = load_artifact()
+artifact.model.predict(artifact.X_train.iloc[:1])
+print(time.perf_counter() - started)
+"""
+
+
+def run_cold_start(runs=5):
+    """
+    Medstream's load_model(): import + artifact load + first prediction, in
+    fresh processes. Peak memory is the children's max RSS (Linux: KiB).
+    """
+    import resource
+
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", COLD_START_SNIPPET], cwd=BASE_DIR, env=os.environ,
+            capture_output=True, text=True, check=True,
+        )
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return _summarize(samples, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024)
+
+
+# ---------- Baselines ----------
+
+def compare(results, baseline, threshold):
+    """List of (benchmark, metric, baseline, current) that regressed beyond threshold."""
+    regressions = []
+    for name, metrics in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            continue
+        for metric in GATED_METRICS:
+            if metrics[metric] > previous[metric] * (1 + threshold):
+                regressions.append((name, metric, previous[metric], metrics[metric]))
+    return regressions
+
+
+def print_results(results, baseline):
+    previous = baseline.get("results", {}) if baseline else {}
+    print(f"\n{'benchmark':<24} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'ops/s':>9} {'peak KiB':>10} {'p50 vs base':>12}")
+    for name, m in results.items():
+        delta = "-"
+        if name in previous and previous[name]["p50_ms"]:
+            delta = f"{m['p50_ms'] / previous[name]['p50_ms'] - 1:+.1%}"
+        print(f"{name:<24} {m['iterations']:>5} {m['p50_ms']:>9.2f} {m['p95_ms']:>9.2f} {m['p99_ms']:>9.2f} "
+              f"{m['throughput_per_s']:>9.1f} {m['peak_mem_kib']:>10.1f} {delta:>12}")
+
+
+# ---------- CLI ----------
+
+def run_all(args, workdir):
+    """Train a scratch model in `workdir` and run the selected benchmarks. Returns name -> metrics."""
+    claims_path = prepare_environment(workdir, args.members, args.with_cache)
+    from ml_models.registry import train_artifact
+    train_artifact()
+
+    premium_inputs, forecast_inputs = sample_inputs(claims_path, 500)
+    benchmarks = build_benchmarks(premium_inputs, forecast_inputs)
+    selected = set(args.only.split(",")) if args.only else None
+
+    results = {}
+    if selected is None or "cold_start" in selected:
+        print("cold_start ...", flush=True)
+        results["cold_start"] = run_cold_start()
+    for name, (iterations, setup) in benchmarks.items():
+        if selected is not None and name not in selected:
+            continue
+        print(f"{name} ...", flush=True)
+        results[name] = run_benchmark(setup, max(1, int(iterations * args.scale)))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--baseline", default=os.path.join(BASELINE_DIR, "local.json"))
+    parser.add_argument("--save-baseline", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed p50/p95 slowdown (0.25 = +25%%)")
+    parser.add_argument("--only", help="comma-separated benchmark names (cold_start included)")
+    parser.add_argument("--members", type=int, default=2000, help="synthetic claims members")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply iteration counts")
+    parser.add_argument("--with-cache", action="store_true", help="keep the prediction/explanation caches on")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="medins-bench-")
+    try:
+        results = run_all(args, workdir)
+    finally:
+        if "app" in sys.modules:
+            sys.modules["app"].quote_writer.stop()  # flush before its database is deleted
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "results": results,
+            }, f, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one.")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\nRegressions beyond +{args.threshold:.0%}:")
+        for name, metric, before, after in regressions:
+            print(f"  {name} {metric}: {before:.2f} -> {after:.2f} ms")
+        return 1
+    print(f"\nNo regressions beyond +{args.threshold:.0%}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+# benchmarks/startup.py
+"""
+Where the Flask API's startup time goes.
+
+Starts fresh interpreters that import app and then send the first request of
+each kind through the test client: liveness and login (which should never
+load the ML stack), then the first prediction and the first forecast (which
+load it lazily). Reports when each step finished, how long it took, and how
+much of that was module imports, broken down by top-level package (from
+`python -X importtime`).
+
+The served model registry and claims data are used read-only; the SQLite
+database and the forecast cache point at a scratch directory, so the first
+forecast includes fitting a member's Holt–Winters state.
+
+    python -m benchmarks.startup                  # best of 3 runs + one import-time run
+    python -m benchmarks.startup --repeats 5 --top 8
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STEPS = ["import app", "/api/health/live", "/auth/login", "/api/predict", "/api/forecast"]
+
+STARTUP_SNIPPET = """
+import json, sys, time
+started = time.perf_counter()
+marks = []
+
+def mark(step):
+    marks.append((step, time.perf_counter() - started))
+    print(f"@@step {step}", file=sys.stderr, flush=True)
+
+import app
+mark("import app")
+client = app.app.test_client()
+client.get("/api/health/live")
+mark("/api/health/live")
+client.post("/auth/login", json={"email": "startup@example.com", "password": "not-a-user"})
+mark("/auth/login")
+client.post("/api/predict", json={"age": 30, "sex": "male", "bmi": 25.0, "children": 0,
+                                  "smoker": "no", "region": "southwest"})
+mark("/api/predict")
+client.post("/api/forecast", json={"age": 30, "sex": "Male", "province": "Ontario",
+                                   "employer_size": "Small (1-49)", "plan_type": "Comprehensive"})
+mark("/api/forecast")
+print(json.dumps(marks))
+"""
+
+
+def _child_env(workdir):
+    env = dict(os.environ)
+    env.update({
+        "BACKEND_DB_PATH": os.path.join(workdir, "backend.db"),
+        "FORECAST_CACHE_DIR": os.path.join(workdir, "forecast_cache"),
+        "PYTHONPATH": BASE_DIR + os.pathsep + env.get("PYTHONPATH", ""),
+    })
+    return env
+
+
+def run_timings(workdir, repeats):
+    """Best (by total) of `repeats` runs: {step: seconds since script start}, plus interpreter start + exit."""
+    best = None
+    for _ in range(repeats):
+        # Fresh database each run, so the first run's tables do not make later runs faster
+        db_path = os.path.join(workdir, "backend.db")
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        started = time.perf_counter()
+        out = subprocess.run(
+            [sys.executable, "-c", STARTUP_SNIPPET], cwd=BASE_DIR, env=_child_env(workdir),
+            capture_output=True, text=True, check=True,
+        )
+        wall = time.perf_counter() - started
+        marks = dict(json.loads(out.stdout.strip().splitlines()[-1]))
+        run = {"marks": marks, "interpreter": wall - marks[STEPS[-1]]}  # outside the snippet's clock
+        if best is None or marks[STEPS[-1]] < best["marks"][STEPS[-1]]:
+            best = run
+    return best
+
+
+def run_import_profile(workdir):
+    """{step: {top-level package: self import seconds}} from one `-X importtime` run."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STARTUP_SNIPPET], cwd=BASE_DIR,
+        env=_child_env(workdir), capture_output=True, text=True, check=True,
+    )
+    profile = {step: defaultdict(float) for step in STEPS}
+    steps = iter(STEPS)
+    current = next(steps)
+    for line in out.stderr.splitlines():
+        if line.startswith("@@step"):
+            current = next(steps, current)
+        elif line.startswith("import time:"):
+            # "import time: <self us> | <cumulative us> | <indented module name>"
+            fields = line[len("import time:"):].split("|")
+            if len(fields) == 3 and fields[0].strip().isdigit():
+                profile[current][fields[2].strip().split(".")[0]] += int(fields[0]) / 1e6
+    return profile
+
+
+def print_report(timings, profile, top):
+    print(f"interpreter start + exit (not below): {timings['interpreter'] * 1000:.0f} ms\n")
+    print(f"{'step':<18} {'done at ms':>10} {'took ms':>8} {'imports ms':>10}  top imported packages")
+    previous = 0.0
+    for step in STEPS:
+        done = timings["marks"][step]
+        packages = sorted(profile[step].items(), key=lambda item: -item[1])
+        imports = sum(profile[step].values())
+        listed = ", ".join(f"{name} {seconds * 1000:.0f}" for name, seconds in packages[:top] if seconds >= 0.001)
+        print(f"{step:<18} {done * 1000:>10.0f} {(done - previous) * 1000:>8.0f} {imports * 1000:>10.0f}  {listed}")
+        previous = done
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeats", type=int, default=3, help="timing runs (best is shown)")
+    parser.add_argument("--top", type=int, default=6, help="packages listed per step")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="medins-startup-")
+    timings = run_timings(workdir, args.repeats)
+    profile = run_import_profile(workdir)
+    print_report(timings, profile, args.top)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+# benchmarks/synthetic_claims.py
+"""
+Synthetic stand-in for canada_medical_insurance_forecast_detailed.csv.
+
+Same columns and value vocabulary as the real claims file, with per-member
+monthly premium series (trend + yearly seasonality + noise) of varying
+length, so the forecaster hits both its Holt–Winters and low-history paths.
+Deterministic for a given seed.
+
+    python -m benchmarks.synthetic_claims --members 2000 --out /tmp/claims.csv
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+PROVINCES = ["Ontario", "Quebec", "British Columbia", "Alberta", "Manitoba",
+             "Saskatchewan", "Nova Scotia", "New Brunswick"]
+PLAN_TYPES = ["Extended Health", "Dental", "Vision", "Comprehensive"]
+EMPLOYER_SIZES = ["Individual", "Small (1-49)", "Medium (50-499)", "Large (500+)"]
+CHRONIC_CONDITIONS = ["Diabetes", "Hypertension", "Asthma", "COPD", None]
+FIRST_NAMES = ["Justin", "Nancy", "Olivia", "John", "Maria", "Wei", "Aisha", "Liam"]
+LAST_NAMES = ["Miller", "Harris", "Baker", "Morgan", "Singh", "Tremblay", "Roy", "Chen"]
+
+
+def make_claims(n_members=2000, seed=0):
+    rng = np.random.default_rng(seed)
+
+    # Per-member attributes
+    age = rng.integers(18, 65, n_members)
+    sex = rng.choice(["Male", "Female"], n_members)
+    province = rng.choice(PROVINCES, n_members)
+    employer_size = rng.choice(EMPLOYER_SIZES, n_members)
+    plan_type = rng.choice(PLAN_TYPES, n_members)
+    chronic = rng.choice(np.array(CHRONIC_CONDITIONS, dtype=object), n_members)
+    risk = np.round(rng.gamma(2, 0.7, n_members).clip(0, 5), 2)
+    base = 60 + age * 2.5 + risk * 30 + rng.normal(0, 15, n_members)
+    months = rng.integers(6, 37, n_members)
+    start_month = rng.integers(0, 12, n_members)
+    claims_per_month = rng.integers(1, 3, n_members)
+
+    # One row per claim
+    member = np.repeat(np.arange(n_members), months * claims_per_month)
+    k = np.concatenate([np.repeat(np.arange(m), c) for m, c in zip(months, claims_per_month)])
+    month_index = start_month[member] + k
+    date = pd.to_datetime("2022-01-01") + pd.to_timedelta(
+        month_index * 30.44 + rng.integers(0, 27, len(member)), unit="D"
+    )
+    premium = np.round(
+        base[member] * (1 + 0.003 * k) + 8 * np.sin(2 * np.pi * month_index / 12)
+        + rng.normal(0, 3, len(member)), 2
+    )
+    claim = np.round(rng.gamma(1.5, premium / 1.5), 2)
+    age_group = np.where(age <= 34, "18-34", np.where(age <= 49, "35-49", "50-64"))
+
+    df = pd.DataFrame({
+        "claim_id": [f"C{i:08d}" for i in range(1, len(member) + 1)],
+        "date": date.strftime("%Y-%m-%d"),
+        "year": date.year,
+        "month": date.month,
+        "quarter": date.quarter,
+        "member_id": [f"M{i:06d}" for i in member],
+        "first_name": np.asarray(FIRST_NAMES)[member % len(FIRST_NAMES)],
+        "last_name": np.asarray(LAST_NAMES)[(member // len(FIRST_NAMES)) % len(LAST_NAMES)],
+        "age": age[member],
+        "sex": sex[member],
+        "province": province[member],
+        "employer_size": employer_size[member],
+        "plan_type": plan_type[member],
+        "chronic_condition": chronic[member],
+        "risk_score": risk[member],
+        "monthly_premium_cad": premium,
+        "claim_amount_cad": claim,
+        "is_high_cost_claim": (claim > 3 * premium).astype(int),
+        "is_forecast": (k >= months[member] - 3).astype(int),
+        "forecast_lower_bound_cad": np.round(premium * 0.9, 2),
+        "forecast_upper_bound_cad": np.round(premium * 1.1, 2),
+        "loss_ratio": np.round(claim / premium, 3),
+        "age_group": age_group[member],
+    })
+    return df.sort_values(["date", "claim_id"]).reset_index(drop=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.synthetic_claims", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--members", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args(argv)
+
+    df = make_claims(args.members, args.seed)
+    df.to_csv(args.out, index=False)
+    print(f"Wrote {len(df):,} claims for {args.members:,} members to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
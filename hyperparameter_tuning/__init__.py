@@ -0,0 +1 @@
+"""Hyperparameter search for the claim-amount model (see search.py; main.ipynb is the original exploration)."""
@@ -0,0 +1,449 @@
+# hyperparameter_tuning/search.py
+"""
+Parallel, resumable hyperparameter search for the claim-amount model.
+
+Same problem as main.ipynb: predict claim_amount_cad from the historical
+(is_forecast == 0) rows of the Canadian claims dataset with a
+Pipeline(ColumnTransformer(OneHotEncoder) -> XGBRegressor / RandomForest),
+scored by RepeatedKFold MSE over a random sample of each search space.
+
+Differences from the notebook:
+- the one-hot preprocessing is fitted once per CV fold and the transformed
+  fold matrices are cached on disk (memory-mapped by the workers) instead of
+  being refitted for every candidate x fold
+- XGBoost candidates use early stopping on a slice of each fold's training
+  data, so n_estimators is an upper bound rather than a fixed cost
+- candidates run across a process pool and every finished trial is appended
+  to <study>/trials.jsonl, so a killed search resumes where it stopped
+- every trial's final model (early-stopped XGBoost keeps its median best
+  round count) is profiled serially, one thread, after the parallel CV:
+  single-row and 1000-row predict latency, TreeSHAP cost per row and
+  serialized size, appended to <study>/costs.jsonl
+- the accuracy / latency Pareto front is reported (and written to
+  <study>/pareto.json), and with --latency-budget-ms the most accurate
+  candidate within the budget is selected instead of the most accurate one
+- the selected candidate is refitted on the full training split and saved
+  as a deployable sklearn Pipeline (<study>/best_pipeline.joblib + best.json)
+
+Latencies are of the model on the one-hot matrix (no pipeline overhead).
+
+    python -m hyperparameter_tuning.search --data data/canada_medical_insurance_forecast_detailed.csv \\
+        --study xgb-rf --models xgb rf --n-iter 15 [--workers N] \\
+        [--latency-budget-ms 1.5 --latency-metric single_row_ms]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import ParameterSampler, RepeatedKFold, train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder
+from xgboost import XGBRegressor
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_PATH = os.path.join(BASE_DIR, "data", "canada_medical_insurance_forecast_detailed.csv")
+RUNS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "runs")
+
+TARGET_COL = "claim_amount_cad"
+COLS_TO_DROP = [
+    "claim_amount_cad",
+    "claim_id",
+    "member_id",
+    "first_name",
+    "last_name",
+    "date",
+    "forecast_lower_bound_cad",
+    "forecast_upper_bound_cad",
+    "loss_ratio",
+    "is_forecast",
+]
+CATEGORICAL_COLS = ["sex", "province", "employer_size", "plan_type", "chronic_condition", "age_group"]
+
+PARAM_SPACES = {
+    "rf": {
+        "n_estimators": [200, 400],
+        "max_depth": [10, 20, None],
+        "min_samples_split": [2, 5],
+        "min_samples_leaf": [1, 2],
+    },
+    "xgb": {
+        "n_estimators": [200, 400, 600],
+        "learning_rate": [0.03, 0.05, 0.1],
+        "max_depth": [3, 5, 7],
+        "subsample": [0.8, 1.0],
+        "colsample_bytree": [0.8, 1.0],
+    },
+}
+
+RANDOM_STATE = 100
+CV_RANDOM_STATE = 1000
+EARLY_STOPPING_ROUNDS = 50
+EARLY_STOPPING_FRACTION = 0.1
+LATENCY_METRICS = ("single_row_ms", "batch_1000_ms", "shap_ms_per_row")
+
+
+# ---------- Data ----------
+
+def load_dataset(data_path=DATA_PATH):
+    data = pd.read_csv(data_path)
+    hist = data[data["is_forecast"] == 0].copy()
+    X = hist.drop(COLS_TO_DROP, axis=1)
+    X[CATEGORICAL_COLS] = X[CATEGORICAL_COLS].astype(object)
+    y = hist[TARGET_COL]
+    return X, y
+
+
+def make_preprocess(X):
+    numeric_cols = [col for col in X.columns if col not in CATEGORICAL_COLS]
+    return ColumnTransformer(
+        transformers=[
+            ("cat", OneHotEncoder(handle_unknown="ignore"), CATEGORICAL_COLS),
+            ("num", "passthrough", numeric_cols),
+        ],
+        sparse_threshold=0.0,
+    )
+
+
+def make_model(model_name, params, n_jobs=1):
+    if model_name == "xgb":
+        return XGBRegressor(objective="reg:squarederror", random_state=RANDOM_STATE, n_jobs=n_jobs, **params)
+    if model_name == "rf":
+        return RandomForestRegressor(random_state=RANDOM_STATE, n_jobs=n_jobs, **params)
+    raise ValueError(f"Unknown model '{model_name}'; expected one of {sorted(PARAM_SPACES)}.")
+
+
+# ---------- Study setup ----------
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_folds(X_train, y_train, folds_dir, n_splits, n_repeats):
+    """Fit the one-hot preprocessing once per fold and dump the transformed matrices."""
+    cv = RepeatedKFold(n_splits=n_splits, n_repeats=n_repeats, random_state=CV_RANDOM_STATE)
+    os.makedirs(folds_dir, exist_ok=True)
+    paths = []
+    for i, (train_idx, val_idx) in enumerate(cv.split(X_train)):
+        path = os.path.join(folds_dir, f"fold_{i:02d}.joblib")
+        paths.append(path)
+        if os.path.exists(path):
+            continue
+        preprocess = make_preprocess(X_train)
+        fold = {
+            "X_train": preprocess.fit_transform(X_train.iloc[train_idx]).astype(np.float32),
+            "y_train": y_train.iloc[train_idx].to_numpy(dtype=np.float32),
+            "X_val": preprocess.transform(X_train.iloc[val_idx]).astype(np.float32),
+            "y_val": y_train.iloc[val_idx].to_numpy(dtype=np.float32),
+        }
+        joblib.dump(fold, f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+    return paths
+
+
+def sample_candidates(models, n_iter):
+    """Deterministic candidate list, so a resumed study sees the same ids."""
+    candidates = []
+    for model_name in models:
+        sampler = ParameterSampler(PARAM_SPACES[model_name], n_iter=n_iter, random_state=CV_RANDOM_STATE)
+        for i, params in enumerate(sampler):
+            candidates.append({"trial_id": f"{model_name}-{i:03d}", "model": model_name, "params": params})
+    return candidates
+
+
+def _prepare_study(study_dir, config, overwrite):
+    os.makedirs(study_dir, exist_ok=True)
+    config_path = os.path.join(study_dir, "study.json")
+    if os.path.exists(config_path) and not overwrite:
+        with open(config_path) as f:
+            previous = json.load(f)
+        if previous != config:
+            raise SystemExit(f"{study_dir} was started with {previous}; pass --overwrite to restart with {config}.")
+        return
+    for name in ("trials.jsonl", "costs.jsonl", "pareto.json", "best.json", "best_pipeline.joblib"):
+        if os.path.exists(os.path.join(study_dir, name)):
+            os.remove(os.path.join(study_dir, name))
+    folds_dir = os.path.join(study_dir, "folds")
+    if os.path.isdir(folds_dir):
+        for name in os.listdir(folds_dir):
+            os.remove(os.path.join(folds_dir, name))
+    with open(config_path, "w") as f:
+        json.dump(config, f, indent=2)
+
+
+def load_trials(study_dir, name="trials.jsonl"):
+    try:
+        with open(os.path.join(study_dir, name)) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+# ---------- Trials (run in worker processes) ----------
+
+def evaluate_candidate(candidate, fold_paths):
+    """Cross-validate one candidate on the cached fold matrices."""
+    started = time.perf_counter()
+    fold_mse = []
+    best_iterations = []
+    for path in fold_paths:
+        fold = joblib.load(path, mmap_mode="r")
+        model = make_model(candidate["model"], candidate["params"])
+        if candidate["model"] == "xgb":
+            # Early-stop on the tail of the fold's own training rows; the
+            # validation rows stay unseen for scoring.
+            n_fit = int(len(fold["y_train"]) * (1 - EARLY_STOPPING_FRACTION))
+            model.set_params(early_stopping_rounds=EARLY_STOPPING_ROUNDS)
+            model.fit(
+                fold["X_train"][:n_fit], fold["y_train"][:n_fit],
+                eval_set=[(fold["X_train"][n_fit:], fold["y_train"][n_fit:])],
+                verbose=False,
+            )
+            best_iterations.append(int(model.best_iteration))
+        else:
+            model.fit(fold["X_train"], fold["y_train"])
+        fold_mse.append(float(mean_squared_error(fold["y_val"], model.predict(fold["X_val"]))))
+
+    return dict(
+        candidate,
+        status="complete",
+        cv_mse=statistics.fmean(fold_mse),
+        cv_rmse=statistics.fmean(fold_mse) ** 0.5,
+        fold_mse=fold_mse,
+        best_iterations=best_iterations,
+        seconds=round(time.perf_counter() - started, 3),
+        finished_at=datetime.now().isoformat(timespec="seconds"),
+    )
+
+
+# ---------- Serving cost ----------
+
+def final_params(trial):
+    """Params a trial is refitted and served with (early-stopped XGBoost: median best round count)."""
+    params = dict(trial["params"])
+    if trial["model"] == "xgb" and trial["best_iterations"]:
+        params["n_estimators"] = int(statistics.median(trial["best_iterations"])) + 1
+    return params
+
+
+def _median_ms(call, repeat, max_seconds=2.0):
+    call()
+    samples = []
+    deadline = time.perf_counter() + max_seconds
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - started)
+        if time.perf_counter() > deadline:
+            break
+    return statistics.median(samples) * 1000
+
+
+def _model_bytes(model):
+    if isinstance(model, XGBRegressor):
+        return len(model.get_booster().save_raw("ubj"))
+    return len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def measure_serving_cost(trial, fold_path, shap_rows=10):
+    """Fit the trial's final model on one cached fold (single thread) and time what serving it costs."""
+    import shap
+
+    fold = joblib.load(fold_path, mmap_mode="r")
+    model = make_model(trial["model"], final_params(trial))
+    model.fit(fold["X_train"], fold["y_train"])
+
+    X_val = np.ascontiguousarray(fold["X_val"])
+    row = X_val[:1]
+    batch = X_val[np.arange(1000) % len(X_val)]
+    explain_rows = X_val[:shap_rows]
+    explainer = shap.TreeExplainer(model)
+    return {
+        "trial_id": trial["trial_id"],
+        "single_row_ms": round(_median_ms(lambda: model.predict(row), 200), 4),
+        "batch_1000_ms": round(_median_ms(lambda: model.predict(batch), 20), 3),
+        "shap_ms_per_row": round(_median_ms(lambda: explainer.shap_values(explain_rows), 5) / len(explain_rows), 3),
+        "model_bytes": _model_bytes(model),
+    }
+
+
+def pareto_front(rows, latency_metric):
+    """Rows no other row beats on both CV RMSE and `latency_metric` (fastest first)."""
+    front = []
+    for row in sorted(rows, key=lambda r: (r[latency_metric], r["cv_rmse"])):
+        if not front or row["cv_rmse"] < front[-1]["cv_rmse"]:
+            front.append(row)
+    return front
+
+
+def select_trial(rows, latency_metric, latency_budget_ms=None):
+    """Most accurate row, or the most accurate one whose `latency_metric` is within the budget."""
+    eligible = rows if latency_budget_ms is None else [r for r in rows if r[latency_metric] <= latency_budget_ms]
+    if not eligible:
+        fastest = min(rows, key=lambda r: r[latency_metric])
+        raise SystemExit(f"No candidate has {latency_metric} <= {latency_budget_ms} ms; "
+                         f"the fastest is {fastest['trial_id']} at {fastest[latency_metric]} ms.")
+    return min(eligible, key=lambda r: r["cv_mse"])
+
+
+def print_costs(rows, front, selected, latency_metric):
+    on_front = {row["trial_id"] for row in front}
+    print(f"\n{'trial':<10} {'CV RMSE':>9} {'1 row ms':>9} {'1k rows ms':>11} {'SHAP ms/row':>12} {'size KiB':>9}  "
+          f"(* Pareto on {latency_metric}, > selected)")
+    for row in sorted(rows, key=lambda r: r["cv_rmse"]):
+        mark = (">" if row["trial_id"] == selected["trial_id"] else " ") + ("*" if row["trial_id"] in on_front else " ")
+        print(f"{row['trial_id']:<10} {row['cv_rmse']:>9.2f} {row['single_row_ms']:>9.3f} {row['batch_1000_ms']:>11.2f} "
+              f"{row['shap_ms_per_row']:>12.2f} {row['model_bytes'] / 1024:>9.0f}  {mark}")
+
+
+# ---------- Final model ----------
+
+def refit_best(study_dir, X_train, y_train, X_test, y_test, best, selection=None):
+    """Refit the selected trial as a full Pipeline, evaluate it on the test split and save it."""
+    params = final_params(best)
+
+    pipeline = Pipeline([
+        ("preprocess", make_preprocess(X_train)),
+        ("model", make_model(best["model"], params, n_jobs=-1)),
+    ])
+    pipeline.fit(X_train, y_train)
+    y_pred = pipeline.predict(X_test)
+    mse = mean_squared_error(y_test, y_pred)
+
+    summary = {
+        "trial_id": best["trial_id"],
+        "model": best["model"],
+        "params": params,
+        "cv_rmse": best["cv_rmse"],
+        "serving_cost": {key: best[key] for key in LATENCY_METRICS + ("model_bytes",) if key in best},
+        "selection": selection,
+        "test_rmse": mse ** 0.5,
+        "test_mae": mean_absolute_error(y_test, y_pred),
+        "test_r2": r2_score(y_test, y_pred),
+        "trained_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    joblib.dump(pipeline, os.path.join(study_dir, "best_pipeline.joblib"))
+    with open(os.path.join(study_dir, "best.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+# ---------- Search ----------
+
+def run_search(data_path=DATA_PATH, study="default", models=("xgb", "rf"), n_iter=15,
+               n_splits=3, n_repeats=2, workers=None, overwrite=False,
+               latency_metric="single_row_ms", latency_budget_ms=None, shap_rows=10):
+    study_dir = os.path.join(RUNS_DIR, study)
+    config = {
+        "data_sha256": _file_sha256(data_path),
+        "models": list(models),
+        "n_iter": n_iter,
+        "n_splits": n_splits,
+        "n_repeats": n_repeats,
+        "test_size": 0.2,
+        "random_state": RANDOM_STATE,
+    }
+    _prepare_study(study_dir, config, overwrite)
+
+    started = time.perf_counter()
+    X, y = load_dataset(data_path)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=RANDOM_STATE)
+    fold_paths = cache_folds(X_train, y_train, os.path.join(study_dir, "folds"), n_splits, n_repeats)
+    print(f"{len(fold_paths)} preprocessed folds ready in {time.perf_counter() - started:.1f}s")
+
+    done = {trial["trial_id"] for trial in load_trials(study_dir)}
+    pending = [c for c in sample_candidates(models, n_iter) if c["trial_id"] not in done]
+    print(f"{len(done)} trials already complete, {len(pending)} to run")
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool, \
+            open(os.path.join(study_dir, "trials.jsonl"), "a") as results:
+        futures = [pool.submit(evaluate_candidate, candidate, fold_paths) for candidate in pending]
+        for i, future in enumerate(as_completed(futures), start=1):
+            trial = future.result()
+            results.write(json.dumps(trial) + "\n")
+            results.flush()
+            print(f"  [{i}/{len(pending)}] {trial['trial_id']} CV RMSE {trial['cv_rmse']:.2f} "
+                  f"({trial['seconds']:.1f}s) {trial['params']}", flush=True)
+    if pending:
+        print(f"Ran {len(pending)} trials in {time.perf_counter() - started:.1f}s")
+
+    # Serially, so timings are not skewed by other trials competing for the CPU
+    trials = load_trials(study_dir)
+    profiled = {cost["trial_id"] for cost in load_trials(study_dir, "costs.jsonl")}
+    unprofiled = [trial for trial in trials if trial["trial_id"] not in profiled]
+    if unprofiled:
+        print(f"Profiling serving cost of {len(unprofiled)} candidates")
+        with open(os.path.join(study_dir, "costs.jsonl"), "a") as results:
+            for trial in unprofiled:
+                cost = measure_serving_cost(trial, fold_paths[0], shap_rows=shap_rows)
+                results.write(json.dumps(cost) + "\n")
+                results.flush()
+    costs = {cost["trial_id"]: cost for cost in load_trials(study_dir, "costs.jsonl")}
+    rows = [dict(trial, **costs[trial["trial_id"]]) for trial in trials]
+
+    front = pareto_front(rows, latency_metric)
+    best = select_trial(rows, latency_metric, latency_budget_ms)
+    selection = {"latency_metric": latency_metric, "latency_budget_ms": latency_budget_ms}
+    print_costs(rows, front, best, latency_metric)
+    with open(os.path.join(study_dir, "pareto.json"), "w") as f:
+        fields = ("trial_id", "model", "params", "cv_rmse") + LATENCY_METRICS + ("model_bytes",)
+        json.dump({
+            **selection,
+            "selected": best["trial_id"],
+            "front": [dict({key: row[key] for key in fields}, params=final_params(row)) for row in front],
+        }, f, indent=2)
+
+    summary = refit_best(study_dir, X_train, y_train, X_test, y_test, best, selection)
+    print("\n============================")
+    print("Optimized Model:", summary["model"], summary["trial_id"])
+    print("Best Params:", summary["params"])
+    print("Best CV RMSE:", summary["cv_rmse"])
+    print("Serving cost:", summary["serving_cost"])
+    print("Test RMSE:", summary["test_rmse"])
+    print("Test MAE :", summary["test_mae"])
+    print("Test R²  :", summary["test_r2"])
+    print("Saved:", os.path.join(study_dir, "best_pipeline.joblib"))
+    print("============================\n")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m hyperparameter_tuning.search", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--study", default="default", help=f"results go to {os.path.relpath(RUNS_DIR, BASE_DIR)}/<study>")
+    parser.add_argument("--models", nargs="+", default=["xgb", "rf"], choices=sorted(PARAM_SPACES))
+    parser.add_argument("--n-iter", type=int, default=15, help="candidates sampled per model")
+    parser.add_argument("--n-splits", type=int, default=3)
+    parser.add_argument("--n-repeats", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument("--overwrite", action="store_true", help="discard previous results for this study")
+    parser.add_argument("--latency-metric", default="single_row_ms", choices=LATENCY_METRICS,
+                        help="latency used for the Pareto front and the budget")
+    parser.add_argument("--latency-budget-ms", type=float, default=None,
+                        help="select the most accurate candidate within this latency (default: most accurate)")
+    parser.add_argument("--shap-rows", type=int, default=10, help="rows explained when timing TreeSHAP")
+    args = parser.parse_args(argv)
+
+    run_search(args.data, args.study, args.models, args.n_iter, args.n_splits, args.n_repeats,
+               args.workers, args.overwrite, args.latency_metric, args.latency_budget_ms, args.shap_rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+ML backends used by the Flask API (app.py).
+
+- premium:   XGBoost premium model + SHAP explanations (see ML Model/Medstream.py)
+- rendering: explanation payloads for clients to draw, cached explanation images
+- forecast:  Holt–Winters premium forecaster (see ML Model/FAPP.py)
+
+Importing the package is cheap: the names below resolve on first access, so
+numpy, pandas and statsmodels load with the first feature that needs them
+(xgboost, shap and matplotlib are imported inside the functions that use
+them). Auth and health endpoints never pay for them;
+`python -m benchmarks.startup` shows where startup time goes.
+"""
+
+import importlib
+import sys
+
+_EXPORTS = {
+    "predict_premium_from_input": "premium",
+    "explain_premium_from_input": "premium",
+    "predict_premium_batch": "premium",
+    "explain_premium_batch": "premium",
+    "sweep_premium": "premium",
+    "validate_profile": "premium",
+    "global_shap_values": "premium",
+    "global_shap_summary": "premium",
+    "global_shap_dependence": "premium",
+    "GLOBAL_SHAP_MODE": "premium",
+    "cache_stats": "premium",
+    "load_model": "premium",
+    "loaded_model_version": "premium",
+    "model_manager": "premium",
+    "explanation_payload": "rendering",
+    "render_waterfall": "rendering",
+    "global_plot": "rendering",
+    "prerender_global_plots": "rendering",
+    "image_cache_stats": "rendering",
+    "IMAGE_FORMATS": "rendering",
+    "forecast_premium_from_input": "forecast",
+    "load_claims": "forecast",
+    "segment_index": "forecast",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+def loaded(module):
+    """Whether ml_models.<module> has been imported yet (never imports it)."""
+    return f"{__name__}.{module}" in sys.modules
@@ -0,0 +1,155 @@
+# ml_models/batch_forecast.py
+"""
+Offline 36-month premium forecasts for the whole member base.
+
+Reads the claims CSV, resamples every member to monthly mean
+monthly_premium_cad and forecasts each series the same way the interactive
+forecaster does (Holt–Winters, or the low-history growth curve driven by the
+member's own mean risk score), spread across a process pool.
+
+Output (Parquet, one part file per completed chunk of members):
+
+    <out>/forecasts/part-00000.parquet   member_id, step, date, premium, model
+    <out>/summaries/part-00000.parquet   member_id, year, Avg, Low, High, Range
+    <out>/_run.json                      claims snapshot + chunking of this run
+
+Members are chunked deterministically, so re-running the same command after
+an interruption only processes chunks whose part files are missing.
+
+    python -m ml_models.batch_forecast --out forecasts_out [--workers N] [--chunk-size 200]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from .forecast import CLAIMS_PATH, FORECAST_STEPS, claims_snapshot, load_claims, yearly_summary
+from .forecast_cache import fit_state, iter_member_series, roll_forward
+
+RUN_FILE = "_run.json"
+
+
+def _part_path(out_dir, kind, chunk_id):
+    return os.path.join(out_dir, kind, f"part-{chunk_id:05d}.parquet")
+
+
+def _write_parquet_atomic(frame, path):
+    tmp_path = f"{path}.tmp"
+    frame.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def forecast_chunk(chunk_id, members, out_dir, steps=FORECAST_STEPS):
+    """Worker: forecast a list of (member_id, monthly series, risk score) and write its part files."""
+    forecast_frames = []
+    summary_frames = []
+    for member_id, member_monthly, risk_score in members:
+        state = fit_state(member_monthly)
+        values = roll_forward(state, steps, risk_score)
+        dates = pd.date_range(
+            start=member_monthly.index[-1] + pd.DateOffset(months=1), periods=steps, freq="ME",
+        )
+        forecast_frames.append(pd.DataFrame({
+            "member_id": member_id,
+            "step": range(1, steps + 1),
+            "date": dates,
+            "premium": values.astype("float32"),
+            "model": state["kind"],
+        }))
+        summary = yearly_summary(pd.Series(values, index=dates)).reset_index()
+        summary.insert(0, "member_id", member_id)
+        summary_frames.append(summary.rename(columns={"Year": "year"}))
+
+    forecasts = pd.concat(forecast_frames, ignore_index=True)
+    forecasts["model"] = forecasts["model"].astype("category")
+    # Summaries first: a chunk only counts as done once its forecasts part exists
+    _write_parquet_atomic(pd.concat(summary_frames, ignore_index=True), _part_path(out_dir, "summaries", chunk_id))
+    _write_parquet_atomic(forecasts, _part_path(out_dir, "forecasts", chunk_id))
+    return chunk_id, len(members)
+
+
+def _prepare_run(out_dir, snapshot, chunk_size, limit, overwrite):
+    os.makedirs(os.path.join(out_dir, "forecasts"), exist_ok=True)
+    os.makedirs(os.path.join(out_dir, "summaries"), exist_ok=True)
+    run_path = os.path.join(out_dir, RUN_FILE)
+    run = {"claims_snapshot": snapshot, "chunk_size": chunk_size, "limit": limit, "steps": FORECAST_STEPS}
+    if os.path.exists(run_path) and not overwrite:
+        with open(run_path) as f:
+            previous = json.load(f)
+        if previous != run:
+            raise SystemExit(
+                f"{out_dir} holds a run for {previous}; pass --overwrite to start over for {run}."
+            )
+    else:
+        for kind in ("forecasts", "summaries"):
+            for name in os.listdir(os.path.join(out_dir, kind)):
+                os.remove(os.path.join(out_dir, kind, name))
+        with open(run_path, "w") as f:
+            json.dump(run, f, indent=2)
+
+
+def run_batch(out_dir, workers=None, chunk_size=200, overwrite=False, limit=None):
+    started = time.perf_counter()
+    df = load_claims()
+    snapshot = claims_snapshot()
+    _prepare_run(out_dir, snapshot, chunk_size, limit, overwrite)
+
+    risk_scores = df.groupby("member_id", observed=True)["risk_score"].mean()
+    members = sorted(iter_member_series(df), key=lambda item: item[0])
+    if limit:
+        members = members[:limit]
+    chunks = [members[i:i + chunk_size] for i in range(0, len(members), chunk_size)]
+    pending = [
+        chunk_id for chunk_id in range(len(chunks))
+        if not os.path.exists(_part_path(out_dir, "forecasts", chunk_id))
+    ]
+    print(f"{len(members)} members in {len(chunks)} chunks; "
+          f"{len(chunks) - len(pending)} already done, {len(pending)} to run "
+          f"(prepared in {time.perf_counter() - started:.1f}s)")
+
+    done_series = 0
+    total_series = sum(len(chunks[c]) for c in pending)
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(
+                forecast_chunk, chunk_id,
+                [(member_id, series, float(risk_scores[member_id])) for member_id, series in chunks[chunk_id]],
+                out_dir,
+            )
+            for chunk_id in pending
+        ]
+        for future in as_completed(futures):
+            _, n = future.result()
+            done_series += n
+            elapsed = time.perf_counter() - started
+            print(f"  {done_series}/{total_series} series  {done_series / elapsed:.1f} series/s", flush=True)
+
+    elapsed = time.perf_counter() - started
+    if total_series:
+        print(f"Forecast {total_series} series in {elapsed:.1f}s ({total_series / elapsed:.1f} series/s) -> {out_dir}")
+    return total_series
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ml_models.batch_forecast", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--out", required=True, help="output directory")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=200, help="members per part file")
+    parser.add_argument("--overwrite", action="store_true", help="discard a previous run in --out")
+    parser.add_argument("--limit", type=int, help="only the first N members (smoke runs)")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(CLAIMS_PATH):
+        sys.exit(f"Claims dataset not found at {CLAIMS_PATH}")
+    run_batch(args.out, workers=args.workers, chunk_size=args.chunk_size,
+              overwrite=args.overwrite, limit=args.limit)
+
+
+if __name__ == "__main__":
+    main()
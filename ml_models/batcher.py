@@ -0,0 +1,119 @@
+# ml_models/batcher.py
+"""
+Request coalescing for single-profile predictions and explanations.
+
+Concurrent /api/predict requests each score one row, and a one-row XGBoost
+or TreeSHAP call is mostly fixed overhead. A MicroBatcher queues callers'
+items and lets one worker thread run them together: a batch closes when
+its first item has waited `window_ms` or when `max_size` items are queued,
+then every caller gets its own result (or its own exception; a batch that
+fails is retried item by item so one bad profile does not fail the rest).
+
+The window is added latency for a lone request, so coalescing is off by
+default; it pays off with threaded workers under concurrent load. The
+medins_batch_queue_wait_seconds and medins_batch_size histograms show
+whether batches actually form.
+
+Configuration (environment):
+    PREMIUM_BATCH_WINDOW_MS   max wait for more requests (default 0 = off; 2-5 is typical)
+    PREMIUM_BATCH_MAX_SIZE    close a batch early at this many items (default 32)
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from . import metrics
+
+DEFAULT_WINDOW_MS = float(os.environ.get("PREMIUM_BATCH_WINDOW_MS", "0"))
+DEFAULT_MAX_SIZE = int(os.environ.get("PREMIUM_BATCH_MAX_SIZE", "32"))
+
+
+class MicroBatcher:
+    """run_batch(items) -> results (same order) is called from one worker thread."""
+
+    def __init__(self, name, run_batch, window_ms=DEFAULT_WINDOW_MS, max_size=DEFAULT_MAX_SIZE):
+        self.name = name
+        self.run_batch = run_batch
+        self.window = window_ms / 1000.0
+        self.max_size = max(1, max_size)
+        self._cond = threading.Condition()
+        self._queue = []
+        self._worker = None
+        self._pid = None
+
+    @property
+    def enabled(self):
+        return self.window > 0
+
+    def submit(self, item):
+        """Queue `item` and block until its batch has run; returns its result or raises its error."""
+        future = Future()
+        with self._cond:
+            self._ensure_worker()
+            self._queue.append((item, future, time.perf_counter()))
+            if len(self._queue) == 1 or len(self._queue) >= self.max_size:
+                self._cond.notify()
+        return future.result()
+
+    def _ensure_worker(self):
+        # Threads do not survive a fork (gunicorn preload), so start one per process
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._queue = []
+            self._worker = None
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._loop, name=f"batcher-{self.name}", daemon=True)
+            self._worker.start()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                deadline = self._queue[0][2] + self.window
+                while len(self._queue) < self.max_size:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._queue[:self.max_size]
+                del self._queue[:self.max_size]
+            self._run(batch)
+
+    def _run(self, batch):
+        started = time.perf_counter()
+        for _, _, queued_at in batch:
+            metrics.observe("medins_batch_queue_wait_seconds", started - queued_at, batcher=self.name)
+        metrics.observe("medins_batch_size", len(batch), batcher=self.name)
+
+        items = [item for item, _, _ in batch]
+        try:
+            results = self.run_batch(items)
+        except Exception:
+            results = None
+        if results is not None:
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+            return
+        for item, future, _ in batch:
+            try:
+                future.set_result(self.run_batch([item])[0])
+            except Exception as e:
+                future.set_exception(e)
+
+
+def run_grouped(items, key, run_group):
+    """
+    Call run_group(group items) once per distinct key(item) (first-seen
+    order) and return the results in the original item order.
+    """
+    groups = {}
+    for position, item in enumerate(items):
+        groups.setdefault(key(item), []).append(position)
+    results = [None] * len(items)
+    for positions in groups.values():
+        for position, result in zip(positions, run_group([items[p] for p in positions])):
+            results[position] = result
+    return results
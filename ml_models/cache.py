@@ -0,0 +1,113 @@
+# ml_models/cache.py
+"""
+Bounded LRU + TTL memoization for premium predictions and explanations.
+
+The /api/predict input space is small and users re-submit near-identical
+profiles, so results are cached on the normalized profile and the model
+version that produced them. Entries of different versions live side by side
+(requests still in flight on the old version during a swap, or a rollback,
+do not wipe the new version's entries); when ModelManager stops keeping a
+version loaded, release_versions() drops its entries from every cache.
+
+Configuration (environment):
+    PREMIUM_CACHE_SIZE   max entries per cache (default 10000, 0 disables)
+    PREMIUM_CACHE_TTL    seconds an entry stays valid (default 3600, 0 = forever)
+"""
+
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+DEFAULT_MAXSIZE = int(os.environ.get("PREMIUM_CACHE_SIZE", "10000"))
+DEFAULT_TTL = float(os.environ.get("PREMIUM_CACHE_TTL", "3600"))
+
+_caches = weakref.WeakSet()
+
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry expiry and hit/miss counters, keyed per model version."""
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0  # entries dropped by release_versions()
+        _caches.add(self)
+
+    def get(self, key, version):
+        """Return (True, value) on a live hit, else (False, None)."""
+        key = (version, key)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > self._clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._data[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value, version):
+        if self.maxsize <= 0:
+            return
+        key = (version, key)
+        expires_at = self._clock() + self.ttl if self.ttl > 0 else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def release_versions(self, keep_versions):
+        """Drop the entries of model versions not in `keep_versions`."""
+        with self._lock:
+            stale = [key for key in self._data if key[0] not in keep_versions]
+            for key in stale:
+                del self._data[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+def release_versions(keep_versions):
+    """Drop cached results of model versions that are no longer served, from every cache."""
+    for cache in list(_caches):
+        cache.release_versions(keep_versions)
+
+
+def profile_key(ui_input):
+    """Canonical, hashable form of a /api/predict profile."""
+    return (
+        int(ui_input["age"]),
+        str(ui_input["sex"]).strip().lower(),
+        float(ui_input["bmi"]),
+        int(ui_input["children"]),
+        str(ui_input["smoker"]).strip().lower(),
+        str(ui_input["region"]).strip().lower(),
+    )
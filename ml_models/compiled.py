@@ -0,0 +1,156 @@
+# ml_models/compiled.py
+"""
+The premium booster compiled to flat NumPy arrays for small-batch inference.
+
+For one quote, XGBRegressor.predict() builds a DMatrix from a DataFrame and
+crosses into the native library; with 6 features and ~100 shallow trees that
+overhead is most of the call. CompiledForest stores every node of every tree
+in flat arrays (feature index, threshold, left/right child, default
+direction, leaf value) and walks all trees for all rows at once, one
+vectorized step per tree level, on a plain float32 matrix.
+
+Results match XGBoost bit for bit: features and thresholds are compared as
+float32 (x < threshold goes left, NaN follows the default direction), and
+the leaf values are accumulated in float32 onto the base score in tree
+order, as XGBoost's CPU predictor does. compile_verified() checks this on
+the artifact's training rows and refuses the compiled forest otherwise.
+
+    python -m ml_models.compiled          # verify + time against the served model
+"""
+
+import json
+import time
+
+import numpy as np
+
+
+class CompiledForest:
+    def __init__(self, feature, threshold, left, right, default_left, value, roots, base_score, depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots
+        self.base_score = np.float32(base_score)
+        self.depth = depth
+        for array in (feature, threshold, left, right, default_left, value, roots):
+            array.setflags(write=False)
+
+    @classmethod
+    def from_booster(cls, booster):
+        """Compile an xgboost.Booster (gbtree, single target, numeric splits only)."""
+        learner = json.loads(booster.save_raw("json"))["learner"]
+        if learner["gradient_booster"]["name"] != "gbtree":
+            raise ValueError("Only gbtree boosters can be compiled.")
+        if learner["objective"]["name"] != "reg:squarederror":
+            raise ValueError(f"Unsupported objective {learner['objective']['name']}.")
+        if learner["learner_model_param"]["num_target"] not in ("0", "1"):
+            raise ValueError("Multi-target boosters are not supported.")
+        trees = learner["gradient_booster"]["model"]["trees"]
+        base_score = float(learner["learner_model_param"]["base_score"].strip("[]"))
+
+        features, thresholds, lefts, rights, defaults, values, roots = [], [], [], [], [], [], []
+        depth = 0
+        offset = 0
+        for tree in trees:
+            if any(tree["split_type"]):
+                raise ValueError("Categorical splits are not supported.")
+            left = np.asarray(tree["left_children"], dtype=np.int64)
+            right = np.asarray(tree["right_children"], dtype=np.int64)
+            conditions = np.asarray(tree["split_conditions"], dtype=np.float32)
+            is_leaf = left == -1
+            node_ids = np.arange(len(left))
+
+            # Leaves point at themselves, so extra traversal steps are no-ops
+            features.append(np.where(is_leaf, 0, tree["split_indices"]).astype(np.intp))
+            thresholds.append(np.where(is_leaf, np.float32(0), conditions))
+            lefts.append(np.where(is_leaf, node_ids, left) + offset)
+            rights.append(np.where(is_leaf, node_ids, right) + offset)
+            defaults.append(np.asarray(tree["default_left"], dtype=bool))
+            values.append(np.where(is_leaf, conditions, np.float32(0)))
+            roots.append(offset)
+            depth = max(depth, _tree_depth(left, right))
+            offset += len(left)
+
+        return cls(
+            np.concatenate(features), np.concatenate(thresholds).astype(np.float32),
+            np.concatenate(lefts).astype(np.intp), np.concatenate(rights).astype(np.intp),
+            np.concatenate(defaults), np.concatenate(values).astype(np.float32),
+            np.asarray(roots, dtype=np.intp), base_score, depth,
+        )
+
+    def predict(self, X):
+        """Predictions (float32) for a (rows x features) matrix in training column order."""
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], len(self.roots)))
+        has_missing = np.isnan(X).any()
+        for _ in range(self.depth):
+            x = X[rows, self.feature[nodes]]
+            go_left = x < self.threshold[nodes]
+            if has_missing:
+                go_left = np.where(np.isnan(x), self.default_left[nodes], go_left)
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        # Sequential float32 sum (cumsum, not pairwise reduce) in tree order, like XGBoost
+        leaves = np.empty((X.shape[0], len(self.roots) + 1), dtype=np.float32)
+        leaves[:, 0] = self.base_score
+        leaves[:, 1:] = self.value[nodes]
+        return np.cumsum(leaves, axis=1, dtype=np.float32)[:, -1]
+
+
+def _tree_depth(left, right):
+    depth = 0
+    level = [0]
+    while level:
+        level = [child for node in level if left[node] != -1 for child in (left[node], right[node])]
+        if level:
+            depth += 1
+    return depth
+
+
+def compile_verified(model, X):
+    """
+    Compile `model` (XGBRegressor) and check it reproduces model.predict(X)
+    exactly. Returns the CompiledForest, or None (with a message) if the
+    booster cannot be compiled or any prediction differs in any bit.
+    """
+    try:
+        forest = CompiledForest.from_booster(model.get_booster())
+    except (ValueError, KeyError) as e:
+        print(f"[compiled] booster not compiled: {e}")
+        return None
+    expected = np.asarray(model.predict(X), dtype=np.float32)
+    actual = forest.predict(np.asarray(X, dtype=np.float32))
+    if not np.array_equal(expected.view(np.uint32), actual.view(np.uint32)):
+        mismatches = int((expected != actual).sum())
+        print(f"[compiled] self-check failed on {mismatches}/{len(expected)} rows; using XGBoost")
+        return None
+    return forest
+
+
+def main():
+    from .registry import load_artifact
+
+    artifact = load_artifact()
+    X = artifact.X_train
+    forest = compile_verified(artifact.model, X)
+    if forest is None:
+        raise SystemExit(1)
+    print(f"{artifact.version}: {len(forest.roots)} trees, {len(forest.value)} nodes, depth {forest.depth}; "
+          f"bit-identical on {len(X)} training rows")
+
+    row_frame = X.iloc[:1]
+    row = X.to_numpy(dtype=np.float32)[:1]
+    for name, call in (("xgboost", lambda: artifact.model.predict(row_frame)),
+                       ("compiled", lambda: forest.predict(row))):
+        started = time.perf_counter()
+        for _ in range(1000):
+            call()
+        print(f"  single row  {name:<9} {(time.perf_counter() - started) * 1000:.1f} us/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# ml_models/explainers.py
+"""
+SHAP explanation engine with selectable speed / fidelity trade-off.
+
+Modes:
+- "tree_path_dependent": exact path-dependent TreeSHAP computed natively by
+  XGBoost (pred_contribs). No background data, cost ~ O(trees x depth^2) per
+  row; the default for /api/predict.
+- "interventional": shap.TreeExplainer against a small random sample of the
+  training data (background_size rows). Cost grows with the sample size.
+- "full": the artifact's shap.Explainer over the whole training set, i.e.
+  what Medstream shows. Reference for fidelity; its cost grows with the
+  training set.
+
+All modes explain a whole batch in one call and can return only the top-k
+contributions per row.
+
+Benchmark the modes against each other:
+    python -m ml_models.explainers [--rows 200] [--repeat 30] [--background-size 100]
+"""
+
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+
+EXPLAIN_MODES = ("tree_path_dependent", "interventional", "full")
+DEFAULT_MODE = os.environ.get("PREMIUM_EXPLAIN_MODE", "tree_path_dependent")
+DEFAULT_BACKGROUND_SIZE = int(os.environ.get("PREMIUM_EXPLAIN_BACKGROUND", "100"))
+
+_engines_lock = threading.Lock()
+_engines = {}
+
+
+class ExplanationEngine:
+    def __init__(self, artifact, mode=DEFAULT_MODE, background_size=DEFAULT_BACKGROUND_SIZE, random_state=42):
+        if mode not in EXPLAIN_MODES:
+            raise ValueError(f"Unknown explanation mode '{mode}'; expected one of {EXPLAIN_MODES}.")
+        self.artifact = artifact
+        self.mode = mode
+        self.background_size = background_size
+
+        if mode == "interventional":
+            import shap
+            X_train = artifact.X_train
+            background = X_train.sample(n=min(background_size, len(X_train)), random_state=random_state)
+            self._explainer = shap.TreeExplainer(
+                artifact.model, data=background, feature_perturbation="interventional"
+            )
+        elif mode == "full":
+            self._explainer = artifact.explainer
+
+    def shap_values(self, X):
+        """Return (values rows x features, base_values rows) for an encoded feature frame."""
+        if self.mode == "tree_path_dependent":
+            import xgboost as xgb
+            contribs = self.artifact.model.get_booster().predict(xgb.DMatrix(X), pred_contribs=True)
+            return contribs[:, :-1], contribs[:, -1]
+        if self.mode == "interventional":
+            values = self._explainer.shap_values(X)
+            base = np.full(len(X), float(np.atleast_1d(self._explainer.expected_value)[0]))
+            return values, base
+        explanation = self._explainer(X)
+        return explanation.values, np.broadcast_to(explanation.base_values, (len(X),))
+
+    def top_k(self, X, k):
+        """Return (indices, values, base_values) of the k largest |SHAP| per row, largest first."""
+        values, base = self.shap_values(X)
+        k = min(k, values.shape[1])
+        abs_values = np.abs(values)
+        idx = np.argpartition(-abs_values, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(abs_values, idx, axis=1), axis=1, kind="stable")
+        idx = np.take_along_axis(idx, order, axis=1)
+        return idx, np.take_along_axis(values, idx, axis=1), base
+
+
+def get_engine(artifact, mode=None, background_size=None):
+    """Shared engine per (model version, mode, background size)."""
+    mode = mode or DEFAULT_MODE
+    background_size = background_size or DEFAULT_BACKGROUND_SIZE
+    key = (artifact.version, mode, background_size)
+    engine = _engines.get(key)
+    if engine is None:
+        with _engines_lock:
+            engine = _engines.get(key)
+            if engine is None:
+                engine = ExplanationEngine(artifact, mode=mode, background_size=background_size)
+                _engines[key] = engine
+    return engine
+
+
+def release_engines(keep_versions):
+    """Drop cached engines of model versions that are no longer served."""
+    with _engines_lock:
+        for key in [key for key in _engines if key[0] not in keep_versions]:
+            del _engines[key]
+
+
+# ---------- Benchmark ----------
+
+def _percentiles_ms(samples):
+    p50, p95, p99 = np.percentile(np.asarray(samples) * 1000, [50, 95, 99])
+    return p50, p95, p99
+
+
+def benchmark_modes(artifact, rows=200, repeat=30, background_size=DEFAULT_BACKGROUND_SIZE, top_k=5, random_state=0):
+    """
+    Latency (single row and batch) and fidelity against the "full" reference
+    for every mode. Returns one result dict per mode.
+    """
+    X = artifact.X_train.sample(n=min(rows, len(artifact.X_train)), random_state=random_state)
+    reference = ExplanationEngine(artifact, mode="full")
+    ref_values, _ = reference.shap_values(X)
+    ref_top = reference.top_k(X, top_k)[0]
+    prediction = artifact.model.predict(X)
+
+    results = []
+    for mode in EXPLAIN_MODES:
+        started = time.perf_counter()
+        engine = ExplanationEngine(artifact, mode=mode, background_size=background_size)
+        setup = time.perf_counter() - started
+
+        single = []
+        for i in range(repeat):
+            row = X.iloc[[i % len(X)]]
+            started = time.perf_counter()
+            engine.top_k(row, top_k)
+            single.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        idx, _, _ = engine.top_k(X, top_k)
+        batch = time.perf_counter() - started
+
+        values, base = engine.shap_values(X)
+        overlap = [len(set(a) & set(b)) / idx.shape[1] for a, b in zip(idx, ref_top)]
+        results.append({
+            "mode": mode,
+            "setup_ms": setup * 1000,
+            "single_p50_ms": _percentiles_ms(single)[0],
+            "single_p95_ms": _percentiles_ms(single)[1],
+            "single_p99_ms": _percentiles_ms(single)[2],
+            "batch_ms_per_row": batch * 1000 / len(X),
+            "mean_abs_diff_vs_full": float(np.mean(np.abs(values - ref_values))),
+            "topk_set_agreement": float(np.mean(overlap)),
+            "max_additivity_error": float(np.max(np.abs(values.sum(axis=1) + base - prediction))),
+        })
+    return results
+
+
+def main(argv=None):
+    from .premium import load_model
+
+    parser = argparse.ArgumentParser(prog="python -m ml_models.explainers", description="Benchmark SHAP explanation modes.")
+    parser.add_argument("--rows", type=int, default=200, help="batch size / fidelity sample")
+    parser.add_argument("--repeat", type=int, default=30, help="single-row timings per mode")
+    parser.add_argument("--background-size", type=int, default=DEFAULT_BACKGROUND_SIZE)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    results = benchmark_modes(load_model(), rows=args.rows, repeat=args.repeat,
+                              background_size=args.background_size, top_k=args.top_k)
+    print(f"{'mode':<20} {'setup ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'batch ms/row':>13} {'|dSHAP|':>9} {'top-k agree':>12} {'additivity':>11}")
+    for r in results:
+        print(f"{r['mode']:<20} {r['setup_ms']:>9.1f} {r['single_p50_ms']:>8.2f} {r['single_p95_ms']:>8.2f} "
+              f"{r['single_p99_ms']:>8.2f} {r['batch_ms_per_row']:>13.3f} {r['mean_abs_diff_vs_full']:>9.1f} "
+              f"{r['topk_set_agreement']:>12.2%} {r['max_additivity_error']:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+# ml_models/forecast.py
+"""
+Holt–Winters premium forecaster for the Flask API.
+
+Mirrors ``ML Model/FAPP.py``: find the best-covered member with a similar
+profile in the Canadian claims dataset, resample their premiums to monthly
+and forecast 36 months with additive-trend / additive-seasonal exponential
+smoothing (or a simple growth curve when there is less than a year of data).
+
+Profile -> member matching goes through a segment index built once at data
+load (see ml_models/segments.py), and fitted smoothing states are cached per
+claims snapshot and member (see ml_models/forecast_cache.py), so a repeated
+forecast is two dict lookups and a state roll-forward.
+
+Forecasts carry prediction intervals: quantiles of FORECAST_INTERVAL_REPETITIONS
+simulated error paths from the same fitted state (vectorized, a few ms for
+2000 paths), seeded per member so a repeated request returns the same band.
+"""
+
+import os
+import threading
+import warnings
+import zlib
+
+import pandas as pd
+
+from . import metrics
+from .forecast_cache import forecast_cache, forecast_quantiles, roll_forward
+from .segments import SegmentIndex
+from .snapshots import load_table
+
+warnings.filterwarnings("ignore")
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLAIMS_PATH = os.environ.get(
+    "CLAIMS_DATA_PATH", os.path.join(BASE_DIR, "data", "canada_medical_insurance_forecast_detailed.csv")
+)
+
+FORECAST_STEPS = 36
+FORECAST_INTERVAL_QUANTILES = tuple(
+    float(q) for q in os.environ.get("FORECAST_INTERVAL_QUANTILES", "0.025,0.975").split(",")
+)
+FORECAST_INTERVAL_REPETITIONS = int(os.environ.get("FORECAST_INTERVAL_REPETITIONS", "2000"))
+# Keeps an interactive request within ~50 ms of simulation
+FORECAST_INTERVAL_MAX_REPETITIONS = 20000
+
+_data_lock = threading.Lock()
+_claims_df = None
+_claims_snapshot = None
+_segment_index = None
+_claims_summary = None
+
+SUMMARY_OPTION_COLS = ["sex", "province", "employer_size", "plan_type", "chronic_condition"]
+SUMMARY_COUNT_COLS = ["province", "employer_size", "plan_type"]
+
+
+# ---------- Load data ----------
+
+def _summarize(df):
+    return {
+        "rows": len(df),
+        "members": int(df["member_id"].nunique()),
+        "avg_premium": float(df["monthly_premium_cad"].mean()),
+        "avg_risk_score": float(df["risk_score"].mean()),
+        # First-appearance order, like drop_duplicates(); tuples so sessions cannot edit them
+        "options": {col: tuple(df[col].dropna().drop_duplicates().astype(str)) for col in SUMMARY_OPTION_COLS},
+        "distinct": {col: int(df[col].nunique()) for col in SUMMARY_COUNT_COLS},
+    }
+
+
+def load_claims():
+    """
+    Load the claims (typed snapshot, see ml_models/snapshots.py) and index its
+    segments once per process. The frame is shared by every caller (API
+    threads, all FAPP sessions): treat it as read-only.
+    """
+    global _claims_df, _claims_snapshot, _segment_index, _claims_summary
+    if _claims_df is None:
+        with _data_lock:
+            if _claims_df is None:
+                df, sha256 = load_table(CLAIMS_PATH, "claims")
+                _claims_snapshot = sha256[:16]
+                _segment_index = SegmentIndex(df)
+                _claims_summary = _summarize(df)
+                _claims_df = df
+    return _claims_df
+
+
+def segment_index():
+    """Profile -> best-covered member index shared by FAPP and /api/forecast."""
+    load_claims()
+    return _segment_index
+
+
+def claims_summary():
+    """Option lists and headline numbers for the forecaster UI, computed once per load."""
+    load_claims()
+    return _claims_summary
+
+
+def claims_snapshot():
+    """Content hash of the loaded claims file; keys every cached forecast state."""
+    load_claims()
+    return _claims_snapshot
+
+
+def age_group_for(age):
+    return "18-34" if age <= 34 else "35-49" if age <= 49 else "50-64"
+
+
+# ---------- Forecasting ----------
+
+def forecast_member_series(member_id, member_monthly, risk_score, steps=FORECAST_STEPS):
+    """Forecast `steps` months after the end of a member's monthly premium series."""
+    state = forecast_cache.get_state(claims_snapshot(), str(member_id), member_monthly)
+    values = roll_forward(state, steps, risk_score)
+
+    forecast_dates = pd.date_range(
+        start=member_monthly.index[-1] + pd.DateOffset(months=1),
+        periods=steps, freq="ME",
+    )
+    return pd.Series(values, index=forecast_dates)
+
+
+def forecast_member_intervals(member_id, member_monthly, risk_score, steps=FORECAST_STEPS,
+                              quantiles=FORECAST_INTERVAL_QUANTILES, repetitions=FORECAST_INTERVAL_REPETITIONS):
+    """Simulated forecast quantiles: DataFrame indexed like forecast_member_series(), one column per quantile."""
+    quantiles = sorted(float(q) for q in quantiles)
+    if not quantiles or not all(0 < q < 1 for q in quantiles):
+        raise ValueError("Interval quantiles must be between 0 and 1.")
+    if not 1 <= repetitions <= FORECAST_INTERVAL_MAX_REPETITIONS:
+        raise ValueError(f"Interval repetitions must be between 1 and {FORECAST_INTERVAL_MAX_REPETITIONS}.")
+
+    state = forecast_cache.get_state(claims_snapshot(), str(member_id), member_monthly)
+    values = forecast_quantiles(state, steps, risk_score, quantiles, repetitions,
+                                seed=zlib.crc32(str(member_id).encode()))
+    forecast_dates = pd.date_range(
+        start=member_monthly.index[-1] + pd.DateOffset(months=1),
+        periods=steps, freq="ME",
+    )
+    return pd.DataFrame(values.T, index=forecast_dates, columns=quantiles)
+
+
+def yearly_summary(forecast_series):
+    forecast_df = pd.DataFrame({"Date": forecast_series.index, "Premium": forecast_series.values})
+    forecast_df["Year"] = forecast_df["Date"].dt.year
+    summary = forecast_df.groupby("Year")["Premium"].agg(["mean", "min", "max"]).round(0)
+    summary.columns = ["Avg", "Low", "High"]
+    summary["Range"] = summary["High"] - summary["Low"]
+    return summary
+
+
+def forecast_premium_from_input(ui_input, quantiles=FORECAST_INTERVAL_QUANTILES,
+                                repetitions=FORECAST_INTERVAL_REPETITIONS):
+    """
+    Forecast endpoint backend.
+
+    Returns a JSON-serialisable dict, or {"error": ...} when no similar
+    member can be found. Each forecast point has "lower" / "upper" (outermost
+    requested quantiles) and all requested quantiles under "quantiles".
+    """
+    try:
+        index = segment_index()
+    except FileNotFoundError:
+        return {"error": f"Claims dataset not found at {CLAIMS_PATH}"}
+
+    with metrics.timed("medins_model_seconds", call="segment_lookup"):
+        match = index.lookup(
+            age_group_for(ui_input["age"]),
+            ui_input["sex"],
+            ui_input["province"],
+            ui_input["employer_size"],
+            ui_input["plan_type"],
+        )
+    if match is None:
+        return {"error": "No matching profiles found"}
+
+    selected_member = match["member_id"]
+    member_monthly = match["monthly"]
+
+    with metrics.timed("medins_model_seconds", call="forecast"):
+        forecast_series = forecast_member_series(selected_member, member_monthly, ui_input["risk_score"])
+    with metrics.timed("medins_model_seconds", call="forecast_intervals"):
+        intervals = forecast_member_intervals(selected_member, member_monthly, ui_input["risk_score"],
+                                              quantiles=quantiles, repetitions=repetitions)
+    summary = yearly_summary(forecast_series)
+
+    return {
+        "member_id": str(selected_member),
+        "current_premium": round(float(member_monthly.iloc[-1]), 2),
+        "avg_risk_score": round(match["avg_risk_score"], 2),
+        "history": [
+            {"date": d.strftime("%Y-%m-%d"), "premium": round(float(v), 2)}
+            for d, v in member_monthly.tail(12).items()
+        ],
+        "forecast": [
+            {
+                "date": d.strftime("%Y-%m-%d"),
+                "premium": round(float(v), 2),
+                "lower": round(float(bounds.iloc[0]), 2),
+                "upper": round(float(bounds.iloc[-1]), 2),
+                "quantiles": {f"{q:g}": round(float(b), 2) for q, b in bounds.items()},
+            }
+            for (d, v), (_, bounds) in zip(forecast_series.items(), intervals.iterrows())
+        ],
+        "interval": {"quantiles": list(intervals.columns), "repetitions": repetitions},
+        "yearly_summary": [
+            {"year": int(year), **{k: float(v) for k, v in row.items()}}
+            for year, row in summary.iterrows()
+        ],
+        "model_input": ui_input,
+    }
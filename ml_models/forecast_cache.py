@@ -0,0 +1,257 @@
+# ml_models/forecast_cache.py
+"""
+Cache of fitted Holt–Winters states for the premium forecaster.
+
+A member's history only changes when the claims file does, so instead of
+refitting ExponentialSmoothing(trend="add", seasonal="add") on every request
+we keep, per (data snapshot, member_id), the fitted smoothing parameters and
+the final level / trend / seasonal state. A 36-month forecast is then a
+roll-forward of that state:
+
+    yhat[T + h] = level + h * trend + season[(h - 1) % m]
+
+which is exactly what statsmodels' forecast() computes for this model.
+
+Prediction intervals come from simulate_paths(): thousands of additive-error
+paths from the same state, generated with one matrix product instead of a
+Python loop per path or per step (see simulate_paths).
+
+States are fitted on first use and kept in memory. The cache can be warmed
+ahead of time and persisted per snapshot:
+
+    python -m ml_models.forecast_cache warm [--limit N]
+
+which writes models/forecast_cache/<snapshot>.v<STATE_FORMAT>.json; serving
+processes load that file for the snapshot they are running against. Bumping
+STATE_FORMAT makes them ignore (and refit) states of an older layout.
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from . import metrics
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FORECAST_CACHE_DIR = os.environ.get("FORECAST_CACHE_DIR", os.path.join(BASE_DIR, "models", "forecast_cache"))
+
+MIN_HOLT_WINTERS_MONTHS = 12
+STATE_FORMAT = 2  # 2: states carry the residual sigma used for intervals
+
+
+# ---------- Fitting / roll-forward ----------
+
+def fit_state(member_monthly):
+    """
+    Fit a member's monthly premium series once and return its forecast state.
+
+    Series too short for Holt–Winters get a "growth" state; the growth rate
+    depends on the request's risk score so it is applied at forecast time.
+    """
+    state = {
+        "last_date": member_monthly.index[-1].strftime("%Y-%m-%d"),
+        "last_value": float(member_monthly.iloc[-1]),
+        "n_obs": int(len(member_monthly)),
+    }
+    if len(member_monthly) >= MIN_HOLT_WINTERS_MONTHS:
+        # statsmodels takes ~1.5 s to import; a process serving cached states never needs it
+        from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
+        m = min(12, len(member_monthly))
+        try:
+            fit = ExponentialSmoothing(
+                member_monthly, trend="add", seasonal="add", seasonal_periods=m,
+            ).fit()
+        except ValueError:
+            # statsmodels needs two full seasonal cycles to initialise; use the growth curve below
+            fit = None
+        if fit is not None:
+            params = fit.params
+            # Residual scale as in statsmodels' HoltWintersResults.simulate()
+            resid = member_monthly.to_numpy() - np.asarray(fit.fittedvalues)
+            n_params = 2 + 2 + (m + 1)
+            state.update({
+                "kind": "holt_winters",
+                "alpha": float(params["smoothing_level"]),
+                "beta": float(params["smoothing_trend"]),
+                "gamma": float(params["smoothing_seasonal"]),
+                "level": float(fit.level.iloc[-1]),
+                "trend": float(fit.trend.iloc[-1]),
+                "season": [float(v) for v in np.asarray(fit.season)[-m:]],
+                "sigma": float(np.sqrt(np.sum(resid ** 2) / max(1, len(resid) - n_params))),
+            })
+            return state
+    state["kind"] = "growth"
+    # Month-over-month log-change volatility around the growth curve
+    values = member_monthly.to_numpy(dtype=np.float64)
+    if len(values) >= 3 and (values > 0).all():
+        state["sigma"] = float(np.std(np.diff(np.log(values)), ddof=1))
+    else:
+        state["sigma"] = 0.0
+    return state
+
+
+def roll_forward(state, steps, risk_score):
+    """Forecast `steps` months from a fitted state in O(steps)."""
+    h = np.arange(1, steps + 1)
+    if state["kind"] == "holt_winters":
+        season = np.asarray(state["season"])
+        return state["level"] + h * state["trend"] + season[(h - 1) % len(season)]
+    # Trend forecast for limited data: higher risk = higher growth
+    growth_rate = 0.002 + (risk_score * 0.001)
+    return state["last_value"] * (1 + growth_rate) ** (h - 1)
+
+
+def simulate_paths(state, steps, risk_score, repetitions, rng):
+    """
+    `repetitions` simulated future paths (repetitions x steps) around roll_forward().
+
+    Holt–Winters states use the additive-error state space model of
+    statsmodels' simulate(): an error e_j at step j moves step t > j by
+    alpha + beta * (t - j) (level and trend) plus gamma when t - j is a
+    multiple of the season length. Those weights form a lower-triangular
+    steps x steps matrix, so all paths are point + errors @ weights.T.
+    Growth states get log-normal noise with the series' monthly volatility.
+    """
+    point = roll_forward(state, steps, risk_score)
+    errors = rng.standard_normal((repetitions, steps)) * state.get("sigma", 0.0)
+    if state["kind"] == "holt_winters":
+        lag = np.subtract.outer(np.arange(steps), np.arange(steps))
+        weights = np.where(
+            lag > 0,
+            state["alpha"] + state["beta"] * lag + state["gamma"] * (lag % len(state["season"]) == 0),
+            0.0,
+        ) + np.eye(steps)
+        return point + errors @ weights.T
+    return point * np.exp(np.cumsum(errors, axis=1))
+
+
+def forecast_quantiles(state, steps, risk_score, quantiles, repetitions, seed=0):
+    """Per-step quantiles (len(quantiles) x steps) of simulate_paths()."""
+    paths = simulate_paths(state, steps, risk_score, repetitions, np.random.default_rng(seed))
+    return np.quantile(paths, quantiles, axis=0)
+
+
+# ---------- Cache ----------
+
+class ForecastCache:
+    """Fitted states keyed by (data snapshot, member_id)."""
+
+    def __init__(self, cache_dir=FORECAST_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._states = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, snapshot):
+        return os.path.join(self.cache_dir, f"{snapshot}.v{STATE_FORMAT}.json")
+
+    def _use_snapshot(self, snapshot):
+        # Called with the lock held. A new data snapshot drops every old state.
+        if snapshot == self._snapshot:
+            return
+        self._snapshot = snapshot
+        self._states = {}
+        try:
+            with open(self._path(snapshot)) as f:
+                self._states = json.load(f)
+        except FileNotFoundError:
+            pass
+
+    def get_state(self, snapshot, member_id, member_monthly):
+        with self._lock:
+            self._use_snapshot(snapshot)
+            state = self._states.get(member_id)
+            if state is not None:
+                self.hits += 1
+                return state
+            self.misses += 1
+        with metrics.timed("medins_model_seconds", call="forecast_fit"):
+            state = fit_state(member_monthly)
+        with self._lock:
+            if snapshot == self._snapshot:
+                self._states[member_id] = state
+        return state
+
+    def warm(self, snapshot, member_series, progress_every=500):
+        """Fit every (member_id, monthly series) pair not cached yet."""
+        with self._lock:
+            self._use_snapshot(snapshot)
+        started = time.perf_counter()
+        fitted = 0
+        for member_id, member_monthly in member_series:
+            if member_id in self._states:
+                continue
+            state = fit_state(member_monthly)
+            with self._lock:
+                self._states[member_id] = state
+            fitted += 1
+            if progress_every and fitted % progress_every == 0:
+                print(f"  fitted {fitted} members ({fitted / (time.perf_counter() - started):.1f}/s)")
+        return fitted
+
+    def save(self):
+        """Persist the current snapshot's states for other processes."""
+        with self._lock:
+            if self._snapshot is None:
+                return None
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._path(self._snapshot)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self._states, f)
+            os.replace(tmp_path, path)
+            return path
+
+    def stats(self):
+        with self._lock:
+            return {"snapshot": self._snapshot, "size": len(self._states), "hits": self.hits, "misses": self.misses}
+
+
+forecast_cache = ForecastCache()
+
+
+# ---------- CLI ----------
+
+def iter_member_series(df):
+    """(member_id, monthly mean premium) for every member in the claims frame."""
+    monthly = (
+        df.set_index("date")
+        .groupby("member_id", observed=True)["monthly_premium_cad"]
+        .resample("ME")
+        .mean()
+        .dropna()
+    )
+    for member_id, series in monthly.groupby(level=0, observed=True):
+        yield str(member_id), series.droplevel(0)
+
+
+def main(argv=None):
+    from .forecast import claims_snapshot, load_claims
+
+    parser = argparse.ArgumentParser(prog="python -m ml_models.forecast_cache",
+                                     description="Pre-fit Holt–Winters states for every member.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    warm = sub.add_parser("warm", help="fit and persist states for the current claims snapshot")
+    warm.add_argument("--limit", type=int, help="only the first N members (smoke runs)")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    df = load_claims()
+    snapshot = claims_snapshot()
+    series = iter_member_series(df)
+    if args.limit:
+        series = (item for i, item in enumerate(series) if i < args.limit)
+    fitted = forecast_cache.warm(snapshot, series)
+    path = forecast_cache.save()
+    print(f"Fitted {fitted} new members in {time.perf_counter() - started:.1f}s -> {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+# ml_models/manager.py
+"""
+Hot-swappable serving model with incremental retraining.
+
+ModelManager owns the artifact that ml_models.premium serves. Requests grab
+the current artifact once and use it for the whole call, so a swap is a
+single reference assignment: in-flight requests finish on the version they
+started with and new requests see the new one. The previously served
+artifact stays loaded, so rollback is instant.
+
+Versions change in three ways:
+- retrain(): continue boosting the served model on newly labelled rows
+  (same columns as data/medical_insurance.csv) in a separate process (so
+  SHAP precomputation does not hold the serving process's GIL), validate
+  against a holdout of those rows, then register, promote and swap the
+  candidate if it is not worse than the served model;
+- rollback(): swap back to the previous version and promote it;
+- another process promotes a version (registry CLI, `python -m
+  ml_models.manager retrain`, or a retrain in another gunicorn worker):
+  every manager notices the LATEST change within PREMIUM_MODEL_RELOAD_SECONDS
+  and loads + warms the new version in the background before swapping.
+
+Pinning a version with PREMIUM_MODEL_VERSION disables following LATEST.
+
+    python -m ml_models.manager retrain --data data/new_quotes.csv [--rounds 20] [--tolerance 0.0]
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .cache import release_versions
+from .explainers import release_engines
+from .registry import (
+    BASE_DIR,
+    FEATURE_NAMES,
+    LATEST_FILE,
+    REGISTRY_DIR,
+    TARGET_COL,
+    ModelArtifact,
+    _file_sha256,
+    latest_version,
+    load_artifact,
+    promote_version,
+    write_artifact,
+)
+
+RELOAD_SECONDS = float(os.environ.get("PREMIUM_MODEL_RELOAD_SECONDS", "5"))
+DEFAULT_ROUNDS = 20
+MIN_NEW_ROWS = 20
+
+logger = logging.getLogger(__name__)
+
+
+# ---------- Incremental retraining ----------
+
+def encode_with(encodings, df):
+    """Encode labelled rows with an existing version's category encodings."""
+    missing = [col for col in FEATURE_NAMES + [TARGET_COL] if col not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    X = df[FEATURE_NAMES].copy()
+    for col, classes in encodings.items():
+        unknown = sorted(set(X[col]) - set(classes))
+        if unknown:
+            raise ValueError(f"Unknown {col} values {unknown}; expected one of {classes}.")
+        X[col] = X[col].map({value: code for code, value in enumerate(classes)})
+    return X.astype(np.float64), df[TARGET_COL].astype(np.float64)
+
+
+def _rmse(model, X, y):
+    return float(np.sqrt(np.mean((model.predict(X) - y.to_numpy()) ** 2)))
+
+
+def continue_training(artifact, new_data_path, rounds=DEFAULT_ROUNDS, holdout_fraction=0.2,
+                      tolerance=0.0, random_state=42, registry_dir=REGISTRY_DIR):
+    """
+    Add `rounds` boosting rounds to `artifact`'s model on its training rows plus
+    the new rows (minus a holdout of the new rows), and compare holdout RMSE.
+
+    Returns a report dict; "version" is set (registered, not promoted) only
+    when the candidate's RMSE is within `tolerance` of the served model's.
+    The holdout rows are stored with the new version's training data, so the
+    next increment trains on them.
+    """
+    import xgboost as xgb
+
+    started = time.perf_counter()
+    X_new, y_new = encode_with(artifact.encodings, pd.read_csv(new_data_path))
+    if len(X_new) < MIN_NEW_ROWS:
+        raise ValueError(f"Need at least {MIN_NEW_ROWS} new rows, got {len(X_new)}.")
+
+    holdout = np.random.default_rng(random_state).random(len(X_new)) < holdout_fraction
+    X_fit = pd.concat([artifact.X_train, X_new[~holdout]], ignore_index=True)
+    y_fit = pd.concat([artifact.y_train, y_new[~holdout]], ignore_index=True)
+
+    candidate = xgb.XGBRegressor(n_estimators=rounds, random_state=random_state)
+    candidate.fit(X_fit, y_fit, xgb_model=artifact.model.get_booster())
+
+    report = {
+        "parent_version": artifact.version,
+        "new_rows": int(len(X_new)),
+        "holdout_rows": int(holdout.sum()),
+        "rounds": rounds,
+        "holdout_rmse_current": round(_rmse(artifact.model, X_new[holdout], y_new[holdout]), 2),
+        "holdout_rmse_candidate": round(_rmse(candidate, X_new[holdout], y_new[holdout]), 2),
+        "training_seconds": round(time.perf_counter() - started, 3),
+        "version": None,
+    }
+    if report["holdout_rmse_candidate"] > report["holdout_rmse_current"] * (1 + tolerance):
+        return report
+
+    data_hash = _file_sha256(new_data_path)
+    report["version"] = write_artifact(
+        candidate,
+        pd.concat([X_fit, X_new[holdout]], ignore_index=True),
+        pd.concat([y_fit, y_new[holdout]], ignore_index=True),
+        artifact.encodings,
+        f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{data_hash[:8]}",
+        {
+            "data_path": os.path.relpath(new_data_path, BASE_DIR),
+            "data_sha256": data_hash,
+            "params": {"n_estimators": rounds, "random_state": random_state, "continued_from": artifact.version},
+            "training_seconds": report["training_seconds"],
+            "holdout_rmse": report["holdout_rmse_candidate"],
+            "parent_holdout_rmse": report["holdout_rmse_current"],
+        },
+        registry_dir=registry_dir,
+        promote=False,
+    )
+    return report
+
+
+def _continue_training_subprocess(version, new_data_path, rounds, tolerance, registry_dir):
+    artifact = ModelArtifact(os.path.join(registry_dir, version))
+    return continue_training(artifact, new_data_path, rounds=rounds, tolerance=tolerance, registry_dir=registry_dir)
+
+
+# ---------- Serving ----------
+
+class ModelManager:
+    def __init__(self, registry_dir=REGISTRY_DIR, warm=None, reload_seconds=RELOAD_SECONDS):
+        self.registry_dir = registry_dir
+        self.warm = warm
+        self.reload_seconds = reload_seconds
+        self.follow_latest = not os.environ.get("PREMIUM_MODEL_VERSION")
+        self._lock = threading.Lock()
+        self._current = None
+        self._previous = None
+        self._checked_at = 0.0
+        self._latest_mtime = None
+        self._loading = None
+        self.job = {"state": "idle"}
+
+    def current(self):
+        """The artifact to serve this request with (loads the first one on demand)."""
+        if self._current is None:
+            with self._lock:
+                if self._current is None:
+                    self._current = load_artifact(registry_dir=self.registry_dir)
+                    self._latest_mtime = self._mtime()
+        elif self.follow_latest and time.monotonic() - self._checked_at > self.reload_seconds:
+            self._check_latest()
+        return self._current
+
+    def status(self):
+        return {
+            "version": self._current.version if self._current else None,
+            "previous_version": self._previous.version if self._previous else None,
+            "follow_latest": self.follow_latest,
+            "retrain": dict(self.job),
+        }
+
+    def swap(self, artifact):
+        """Warm `artifact` in the caller's thread, then make it the served version."""
+        if self.warm is not None:
+            self.warm(artifact)
+        with self._lock:
+            if self._current is not None and self._current.version != artifact.version:
+                self._previous = self._current
+            self._current = artifact
+            keep = {a.version for a in (self._current, self._previous) if a is not None}
+        release_engines(keep)
+        release_versions(keep)
+        logger.info("serving premium model %s", artifact.version)
+
+    def rollback(self):
+        """Swap the previous version back in (no reload) and promote it. Returns its version."""
+        with self._lock:
+            if self._previous is None:
+                raise ValueError("No previous model version loaded in this process.")
+            self._current, self._previous = self._previous, self._current
+            version = self._current.version
+        promote_version(version, registry_dir=self.registry_dir)
+        with self._lock:
+            self._latest_mtime = self._mtime()
+        logger.info("rolled back to premium model %s", version)
+        return version
+
+    # ---------- Following LATEST ----------
+
+    def _mtime(self):
+        try:
+            return os.stat(os.path.join(self.registry_dir, LATEST_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _check_latest(self):
+        # One request thread checks at a time; the others keep serving the current model
+        with self._lock:
+            if time.monotonic() - self._checked_at <= self.reload_seconds:
+                return  # another thread checked while this one waited
+            self._checked_at = time.monotonic()
+            mtime = self._mtime()
+            if mtime == self._latest_mtime:
+                return
+            self._latest_mtime = mtime
+            version = latest_version(self.registry_dir)
+            if version is None or version == self._current.version:
+                return
+            if self._previous is not None and self._previous.version == version:
+                self._current, self._previous = self._previous, self._current
+                logger.info("serving premium model %s", version)
+                return
+            # Load + warm off the request path; requests keep using the current model meanwhile
+            if self._loading is None or not self._loading.is_alive():
+                self._loading = threading.Thread(
+                    target=self._load_and_swap, args=(version,), name="model-loader", daemon=True,
+                )
+                self._loading.start()
+
+    def _load_and_swap(self, version):
+        try:
+            self.swap(load_artifact(version, registry_dir=self.registry_dir))
+        except Exception:
+            logger.exception("could not load premium model %s", version)
+            with self._lock:
+                self._latest_mtime = None  # retry on the next check
+
+    # ---------- Retraining ----------
+
+    def retrain(self, new_data_path, rounds=DEFAULT_ROUNDS, tolerance=0.0, background=True):
+        """
+        Continue boosting the served model on `new_data_path` and swap the
+        result in if it validates. Training runs in a child process, watched
+        from a background thread unless `background` is False; progress and
+        outcome are in self.job.
+        """
+        with self._lock:
+            if self.job["state"] == "running":
+                raise RuntimeError("A retrain is already running.")
+            self.job = {"state": "running", "data_path": new_data_path, "started_at": datetime.now().isoformat(timespec="seconds")}
+        if not background:
+            self._retrain(new_data_path, rounds, tolerance)
+            return dict(self.job)
+        threading.Thread(
+            target=self._retrain, args=(new_data_path, rounds, tolerance), name="model-retrain", daemon=True,
+        ).start()
+        return dict(self.job)
+
+    def _retrain(self, new_data_path, rounds, tolerance):
+        try:
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                report = pool.submit(
+                    _continue_training_subprocess, self.current().version, new_data_path,
+                    rounds, tolerance, self.registry_dir,
+                ).result()
+            if report["version"] is not None:
+                self.swap(ModelArtifact(os.path.join(self.registry_dir, report["version"])))
+                promote_version(report["version"], registry_dir=self.registry_dir)
+                with self._lock:
+                    self._latest_mtime = self._mtime()
+            self.job = dict(self.job, state="promoted" if report["version"] else "rejected", report=report)
+        except Exception as e:
+            logger.exception("retrain failed")
+            self.job = dict(self.job, state="failed", error=str(e))
+
+
+# ---------- CLI ----------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ml_models.manager", description=__doc__.split("\n\n")[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    retrain = sub.add_parser("retrain", help="continue boosting LATEST on new rows; promote if it validates")
+    retrain.add_argument("--data", required=True, help="CSV of new labelled rows")
+    retrain.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS)
+    retrain.add_argument("--tolerance", type=float, default=0.0, help="allowed holdout RMSE increase (0.05 = +5%%)")
+    args = parser.parse_args(argv)
+
+    report = continue_training(load_artifact(), args.data, rounds=args.rounds, tolerance=args.tolerance)
+    for key, value in report.items():
+        print(f"  {key}: {value}")
+    if report["version"] is None:
+        raise SystemExit("Candidate rejected: holdout RMSE is worse than the served model's.")
+    promote_version(report["version"])
+    print(f"LATEST -> {report['version']} (serving processes pick it up within {RELOAD_SECONDS:g}s)")
+
+
+if __name__ == "__main__":
+    main()
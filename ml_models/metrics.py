@@ -0,0 +1,158 @@
+# ml_models/metrics.py
+"""
+In-process metrics with Prometheus text exposition.
+
+Hot paths record into plain dicts under one lock (a perf_counter pair plus a
+bisect per observation), and nothing is formatted until /metrics is
+scraped, so the cost when nobody scrapes is a few microseconds per request.
+METRICS_ENABLED=0 turns every recording call into a no-op.
+
+    with timed("medins_stage_seconds", endpoint="/api/predict", stage="predict"):
+        ...
+    inc("medins_requests_total", endpoint="/api/predict", status="200")
+    register_collector(lambda: [("medins_cache_size", {"cache": "predict"}, 42),
+                                ("medins_cache_hits_total", {"cache": "predict"}, 7)])
+    render()  # -> Prometheus text format
+
+Collected samples whose name ends in _total are cumulative and exposed as
+counters; the rest are gauges.
+"""
+
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+
+# Seconds; covers sub-millisecond cache hits up to multi-second batch calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Histograms that are not latencies
+BUCKETS = {
+    "medins_batch_size": (1, 2, 4, 8, 16, 32, 64, 128),
+}
+
+_HELP = {
+    "medins_stage_seconds": "Latency of each stage of a request.",
+    "medins_model_seconds": "Latency of ml_models calls (model, SHAP, forecast, rendering) by call.",
+    "medins_request_seconds": "End-to-end HTTP request latency.",
+    "medins_requests_total": "HTTP requests by endpoint and status code.",
+    "medins_errors_total": "Unhandled errors by endpoint.",
+    "medins_batch_queue_wait_seconds": "Time a coalesced request waited for its batch to start.",
+    "medins_batch_size": "Requests per coalesced model call.",
+}
+
+_lock = threading.Lock()
+_counters = {}     # (name, labels) -> value
+_histograms = {}   # (name, labels) -> [bucket counts..., +Inf count, sum]
+_collectors = []
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, value, **labels):
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    buckets = BUCKETS.get(name, DEFAULT_BUCKETS)
+    slot = bisect.bisect_left(buckets, value)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+        hist[slot] += 1
+        hist[-1] += value
+
+
+@contextmanager
+def timed(name, **labels):
+    if not ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def register_collector(collector):
+    """collector() -> iterable of (name, labels dict, value), called at scrape time."""
+    _collectors.append(collector)
+
+
+# ---------- Exposition ----------
+
+def _format_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    escaped = (
+        f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for k, v in items
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def render():
+    """Current metrics in the Prometheus text exposition format (0.0.4)."""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: list(values) for key, values in _histograms.items()}
+
+    lines = []
+    seen = set()
+
+    def header(name, kind):
+        if name not in seen:
+            seen.add(name)
+            if name in _HELP:
+                lines.append(f"# HELP {name} {_HELP[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), value in sorted(counters.items()):
+        header(name, "counter")
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+
+    for (name, labels), hist in sorted(histograms.items()):
+        header(name, "histogram")
+        cumulative = 0
+        for bound, count in zip(BUCKETS.get(name, DEFAULT_BUCKETS) + (float("inf"),), hist[:-1]):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', le)])} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {hist[-1]}")
+        lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+
+    # Samples of one family must be contiguous in the exposition
+    collected = {}
+    for collector in list(_collectors):
+        try:
+            samples = list(collector())
+        except Exception as e:  # a broken gauge must not break the scrape
+            lines.append(f"# collector error: {e}")
+            continue
+        for name, labels, value in samples:
+            collected.setdefault(name, []).append(f"{name}{_format_labels(sorted(labels.items()))} {value}")
+    for name, samples in collected.items():
+        header(name, "counter" if name.endswith("_total") else "gauge")
+        lines.extend(samples)
+
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
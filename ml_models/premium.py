@@ -0,0 +1,372 @@
+# ml_models/premium.py
+"""
+XGBoost premium model + SHAP explanations for the Flask API.
+
+The model is the one trained by ``ML Model/Medstream.py`` (label-encoded
+sex / smoker / region, 100-tree XGBRegressor), loaded from the versioned
+artifact registry (see ml_models/registry.py) on first use instead of being
+retrained in every process. The served version is owned by a ModelManager
+(ml_models/manager.py) and can be hot-swapped; each call resolves the
+artifact once and uses it throughout.
+
+Single-profile helpers (used by /api/predict) wrap the vectorized batch
+helpers (used by /api/predict/batch) behind an LRU/TTL cache keyed on the
+normalized profile and model version (see ml_models/cache.py). With
+PREMIUM_BATCH_WINDOW_MS set, concurrent cache misses are coalesced into one
+batch call (see ml_models/batcher.py).
+
+PREMIUM_INFERENCE_ENGINE=compiled predicts with the booster compiled to
+NumPy arrays (ml_models/compiled.py) instead of calling XGBoost; results
+are bit-identical, and the XGBoost path is used if the compiled forest
+fails its self-check.
+
+Model and SHAP calls are timed into medins_model_seconds (ml_models/metrics.py).
+"""
+
+import copy
+import os
+
+import numpy as np
+import pandas as pd
+
+from . import metrics
+from .batcher import MicroBatcher, run_grouped
+from .cache import TTLCache, profile_key
+from .explainers import get_engine
+from .manager import ModelManager
+from .registry import FEATURE_NAMES
+
+INFERENCE_ENGINES = ("xgboost", "compiled")
+INFERENCE_ENGINE = os.environ.get("PREMIUM_INFERENCE_ENGINE", "xgboost")
+if INFERENCE_ENGINE not in INFERENCE_ENGINES:
+    raise ValueError(f"Unknown PREMIUM_INFERENCE_ENGINE '{INFERENCE_ENGINE}'; expected one of {INFERENCE_ENGINES}.")
+
+
+# ---------- Model Setup ----------
+
+def _warm(artifact):
+    """Materialise everything a request touches before a version is swapped in."""
+    artifact.X_train
+    artifact.global_shap_values
+    if INFERENCE_ENGINE == "compiled":
+        artifact.compiled_model
+    get_engine(artifact).top_k(artifact.X_train.iloc[:1], 1)
+    from .rendering import prerender_global_plots
+    prerender_global_plots(artifact)
+
+
+model_manager = ModelManager(warm=_warm)
+
+
+def load_model():
+    """The currently served ModelArtifact (loaded on first use)."""
+    return model_manager.current()
+
+
+def loaded_model_version():
+    """Version of the served model, or None before the first load (never triggers one)."""
+    return model_manager.status()["version"]
+
+
+# ---------- Input encoding ----------
+
+def _encoded_rows(profiles, artifact=None):
+    """Profiles as lists of numeric feature values in FEATURE_NAMES order."""
+    encodings = (artifact or load_model()).encodings
+    rows = []
+    for profile in profiles:
+        row = []
+        for col in FEATURE_NAMES:
+            value = profile[col]
+            if col in encodings:
+                if value not in encodings[col]:
+                    raise ValueError(f"Unknown {col} '{value}'; expected one of {encodings[col]}.")
+                value = encodings[col].index(value)
+            row.append(value)
+        rows.append(row)
+    return rows
+
+
+def encode_profiles(profiles, artifact=None):
+    """
+    Turn UI-style profiles into the numeric feature frame the model was trained on.
+
+    Raises ValueError for unknown category values.
+    """
+    frame = pd.DataFrame(_encoded_rows(profiles, artifact), columns=FEATURE_NAMES)
+    return frame.astype({col: np.float64 if col == "bmi" else np.int64 for col in FEATURE_NAMES})
+
+
+def encode_matrix(profiles, artifact=None):
+    """Same encoding as encode_profiles(), as a float32 matrix (no DataFrame)."""
+    return np.asarray(_encoded_rows(profiles, artifact), dtype=np.float32).reshape(len(profiles), len(FEATURE_NAMES))
+
+
+def validate_profile(profile):
+    """Raise ValueError if a profile has a category value the model never saw."""
+    encodings = load_model().encodings
+    for col, classes in encodings.items():
+        if profile[col] not in classes:
+            raise ValueError(f"Unknown {col} '{profile[col]}'; expected one of {classes}.")
+
+
+# ---------- Batch (vectorized) helpers ----------
+
+def predict_premium_batch(profiles, artifact=None):
+    """Predict annual premiums for many profiles with one model call."""
+    if not profiles:
+        return []
+    artifact = artifact or load_model()
+    compiled = artifact.compiled_model if INFERENCE_ENGINE == "compiled" else None
+    with metrics.timed("medins_model_seconds", call="predict", engine="compiled" if compiled else "xgboost"):
+        if compiled is not None:
+            preds = compiled.predict(encode_matrix(profiles, artifact))
+        else:
+            preds = artifact.model.predict(encode_profiles(profiles, artifact))
+    return [round(float(p), 2) for p in preds]
+
+
+def explain_premium_batch(profiles, max_features=5, mode=None, artifact=None):
+    """
+    SHAP explanations for many profiles with one explainer call.
+
+    Returns one dict per profile with the base value and its `max_features`
+    largest contributions (by absolute impact). `mode` selects the
+    explanation engine (see ml_models/explainers.py); default is
+    $PREMIUM_EXPLAIN_MODE or path-dependent TreeSHAP.
+    """
+    if not profiles:
+        return []
+    artifact = artifact or load_model()
+    X = encode_profiles(profiles, artifact)
+    engine = get_engine(artifact, mode=mode)
+    with metrics.timed("medins_model_seconds", call="explain", mode=engine.mode):
+        top_idx, top_values, base_values = engine.top_k(X, max_features)
+
+    explanations = []
+    for i, profile in enumerate(profiles):
+        top = []
+        for idx, impact in zip(top_idx[i], top_values[i]):
+            feature = FEATURE_NAMES[idx]
+            top.append({
+                "feature": feature,
+                "value": profile[feature],
+                "impact": round(float(impact), 2),
+                "direction": "increases" if impact > 0 else "decreases",
+            })
+        explanations.append({
+            "base_value": round(float(base_values[i]), 2),
+            "mode": engine.mode,
+            "top_features": top,
+        })
+    return explanations
+
+
+# ---------- What-if sweeps ----------
+
+SWEEP_MAX_AXES = 2
+SWEEP_MAX_POINTS = 20000
+SWEEP_MAX_EXPLAIN_POINTS = 2000  # exact TreeSHAP costs ~1 ms per point
+INTEGER_FEATURES = ("age", "children")
+
+
+def _sweep_values(axis, encodings):
+    """Grid values of one sweep axis: {"field", "start", "stop", "step"} or {"field", "values"}."""
+    field = axis.get("field")
+    if field not in FEATURE_NAMES:
+        raise ValueError(f"Unknown sweep field '{field}'; expected one of {FEATURE_NAMES}.")
+    if "values" in axis:
+        values = list(axis["values"])
+        if field in encodings:
+            values = [str(value).strip().lower() for value in values]
+    elif field in encodings:
+        values = list(encodings[field])
+    else:
+        if "start" not in axis or "stop" not in axis:
+            raise ValueError(f"Sweep over {field} needs start and stop (or values).")
+        start, stop, step = float(axis["start"]), float(axis["stop"]), float(axis.get("step", 1))
+        if step <= 0 or stop < start:
+            raise ValueError(f"Sweep over {field} needs start <= stop and step > 0.")
+        count = int(np.floor((stop - start) / step + 1e-9)) + 1
+        if count > SWEEP_MAX_POINTS:
+            raise ValueError(f"Sweep over {field} has {count} points; at most {SWEEP_MAX_POINTS} allowed.")
+        values = np.round(start + step * np.arange(count), 6).tolist()
+    if not values:
+        raise ValueError(f"Sweep over {field} has no values.")
+    if field in encodings:
+        unknown = [value for value in values if value not in encodings[field]]
+        if unknown:
+            raise ValueError(f"Unknown {field} {unknown}; expected one of {encodings[field]}.")
+        return values, np.asarray([encodings[field].index(value) for value in values], dtype=np.float32)
+    if field in INTEGER_FEATURES:
+        values = sorted(set(int(round(value)) for value in values))
+    else:
+        values = [float(value) for value in values]
+    return values, np.asarray(values, dtype=np.float32)
+
+
+def sweep_premium(ui_input, axes, explain=False, mode=None):
+    """
+    Premiums over a grid of one or two fields around a base profile, scored
+    with a single model call (and a single SHAP call if `explain`).
+
+    `axes` items are {"field", "start", "stop", "step"} (stop inclusive) or
+    {"field", "values": [...]}; a categorical field without values sweeps all
+    its categories. Predictions are nested [i][j] over the first and second
+    axis. Nothing is cached or persisted.
+    """
+    if not 1 <= len(axes) <= SWEEP_MAX_AXES:
+        raise ValueError(f"Give 1 to {SWEEP_MAX_AXES} sweep axes.")
+    if len({axis.get("field") for axis in axes}) != len(axes):
+        raise ValueError("Sweep axes must use different fields.")
+    artifact = load_model()
+    _, profile = _normalized(ui_input)
+    grids = [_sweep_values(axis, artifact.encodings) for axis in axes]
+    shape = tuple(len(values) for values, _ in grids)
+    if int(np.prod(shape)) > SWEEP_MAX_POINTS:
+        raise ValueError(f"Sweep grid has {int(np.prod(shape))} points; at most {SWEEP_MAX_POINTS} allowed.")
+    if explain and int(np.prod(shape)) > SWEEP_MAX_EXPLAIN_POINTS:
+        raise ValueError(f"Explained sweeps are limited to {SWEEP_MAX_EXPLAIN_POINTS} points; "
+                         f"this grid has {int(np.prod(shape))}.")
+
+    # Base row repeated over the grid, swept columns overwritten from a meshgrid
+    X = np.repeat(encode_matrix([profile], artifact), int(np.prod(shape)), axis=0)
+    for axis, column in zip(axes, np.meshgrid(*[codes for _, codes in grids], indexing="ij")):
+        X[:, FEATURE_NAMES.index(axis["field"])] = column.ravel()
+
+    compiled = artifact.compiled_model if INFERENCE_ENGINE == "compiled" else None
+    frame = pd.DataFrame(X, columns=FEATURE_NAMES)
+    preds = compiled.predict(X) if compiled is not None else artifact.model.predict(frame)
+
+    result = {
+        "model_version": artifact.version,
+        "base_profile": profile,
+        "axes": [{"field": axis["field"], "values": values} for axis, (values, _) in zip(axes, grids)],
+        "predictions": np.round(preds.astype(np.float64), 2).reshape(shape).tolist(),
+    }
+    if explain:
+        engine = get_engine(artifact, mode=mode)
+        values, base = engine.shap_values(frame)
+        result["explainability"] = {
+            "mode": engine.mode,
+            "features": FEATURE_NAMES,
+            "base_value": round(float(base[0]), 2),
+            "shap_values": np.round(np.asarray(values, dtype=np.float64), 2).reshape(shape + (len(FEATURE_NAMES),)).tolist(),
+        }
+    return result
+
+
+# ---------- Global explanations (precomputed per model version) ----------
+
+# The matrix comes from the artifact's explainer (interventional, over the
+# training data), i.e. the "full" explanation mode. Per-profile explanations
+# default to "tree_path_dependent", whose base value differs slightly.
+GLOBAL_SHAP_MODE = "full"
+
+def global_shap_values():
+    """Read-only (rows x features) SHAP matrix over the training data."""
+    return load_model().global_shap_values
+
+
+def global_shap_summary():
+    """Mean |SHAP| per feature across the training data, largest first."""
+    artifact = load_model()
+    mean_abs = np.abs(artifact.global_shap_values).mean(axis=0)
+    order = np.argsort(-mean_abs)
+    return {
+        "model_version": artifact.version,
+        "mode": GLOBAL_SHAP_MODE,
+        "base_value": round(float(artifact.expected_value), 2),
+        "rows": int(artifact.global_shap_values.shape[0]),
+        "mean_abs_shap": [
+            {"feature": FEATURE_NAMES[i], "value": round(float(mean_abs[i]), 2)} for i in order
+        ],
+    }
+
+
+def global_shap_dependence(feature, color_by=None):
+    """Feature value vs. its SHAP value for every training row (dependence plot data)."""
+    if feature not in FEATURE_NAMES or (color_by is not None and color_by not in FEATURE_NAMES):
+        raise ValueError(f"Unknown feature; expected one of {FEATURE_NAMES}.")
+    artifact = load_model()
+    idx = FEATURE_NAMES.index(feature)
+    payload = {
+        "model_version": artifact.version,
+        "mode": GLOBAL_SHAP_MODE,
+        "feature": feature,
+        "feature_values": artifact.X_train[feature].tolist(),
+        "shap_values": np.round(artifact.global_shap_values[:, idx], 2).tolist(),
+    }
+    if color_by is not None:
+        payload["color_by"] = color_by
+        payload["color_values"] = artifact.X_train[color_by].tolist()
+    return payload
+
+
+# ---------- Single-profile helpers (used by /api/predict) ----------
+
+_predict_cache = TTLCache()
+_explain_cache = TTLCache()
+
+
+def _normalized(ui_input):
+    key = profile_key(ui_input)
+    return key, dict(zip(FEATURE_NAMES, key))
+
+
+def _predict_coalesced(items):
+    """items: (artifact, profile); one predict_premium_batch() call per model version."""
+    return run_grouped(
+        items, key=lambda item: item[0].version,
+        run_group=lambda group: predict_premium_batch([profile for _, profile in group], group[0][0]),
+    )
+
+
+def _explain_coalesced(items):
+    """items: (artifact, profile, max_features, mode); one explain_premium_batch() call per distinct setting."""
+    def explain_group(group):
+        artifact, _, max_features, mode = group[0]
+        return explain_premium_batch([item[1] for item in group], max_features=max_features,
+                                     mode=mode, artifact=artifact)
+    return run_grouped(items, key=lambda item: (item[0].version, item[2], item[3]), run_group=explain_group)
+
+
+_predict_batcher = MicroBatcher("predict", _predict_coalesced)
+_explain_batcher = MicroBatcher("explain", _explain_coalesced)
+
+
+def predict_premium_from_input(ui_input, artifact=None):
+    """
+    Annual premium for one profile. Pass the request's `artifact` so that the
+    prediction and its explanation come from the same model version.
+    """
+    key, profile = _normalized(ui_input)
+    artifact = artifact or load_model()
+    hit, value = _predict_cache.get(key, artifact.version)
+    if not hit:
+        if _predict_batcher.enabled:
+            value = _predict_batcher.submit((artifact, profile))
+        else:
+            value = predict_premium_batch([profile], artifact)[0]
+        _predict_cache.put(key, value, artifact.version)
+    return value
+
+
+def explain_premium_from_input(ui_input, max_features=5, mode=None, artifact=None):
+    """Cached explain_premium_batch() of one profile (see predict_premium_from_input for `artifact`)."""
+    key, profile = _normalized(ui_input)
+    key = (key, max_features, mode)
+    artifact = artifact or load_model()
+    hit, value = _explain_cache.get(key, artifact.version)
+    if not hit:
+        if _explain_batcher.enabled:
+            value = _explain_batcher.submit((artifact, profile, max_features, mode))
+        else:
+            value = explain_premium_batch([profile], max_features=max_features, mode=mode, artifact=artifact)[0]
+        _explain_cache.put(key, value, artifact.version)
+    return copy.deepcopy(value)
+
+
+def cache_stats():
+    """Hit/miss/eviction counters of the single-profile caches."""
+    return {"predict": _predict_cache.stats(), "explain": _explain_cache.stats()}
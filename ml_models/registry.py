@@ -0,0 +1,403 @@
+# ml_models/registry.py
+"""
+Versioned on-disk registry for the XGBoost premium model.
+
+Training happens once, offline, and writes an artifact directory:
+
+    models/premium/<version>/
+        model.json          XGBoost booster
+        background.npy      encoded training features (SHAP background / global plots)
+        target.npy          training target, for incremental retraining (ml_models/manager.py)
+        shap_values.npy     global SHAP matrix over background.npy (memory-mapped)
+        manifest.json       category encodings, feature order, SHAP expected
+                            value and training metadata
+        cold_starts.jsonl   one line per process that loaded this version
+
+    models/premium/LATEST   name of the version served by default
+
+Serving processes (Flask via ml_models.premium, the Medstream Streamlit app)
+only read the manifest on load; the booster, background and SHAP explainer
+are materialised on first use. The global SHAP matrix is computed once per
+version (at train time, or by the first process that needs it) and then
+shared read-only between processes through the page cache.
+
+CLI:
+    python -m ml_models.registry train [--data CSV] [--n-estimators N] [--no-promote]
+    python -m ml_models.registry list
+    python -m ml_models.registry promote <version>
+    python -m ml_models.registry coldstart [<version> ...]
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .snapshots import load_table
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_PATH = os.path.join(BASE_DIR, "data", "medical_insurance.csv")
+REGISTRY_DIR = os.environ.get("PREMIUM_MODEL_REGISTRY", os.path.join(BASE_DIR, "models", "premium"))
+LATEST_FILE = "LATEST"
+GLOBAL_SHAP_FILE = "shap_values.npy"
+SERVE_STAGE = "manifest+booster"
+
+FEATURE_NAMES = ["age", "sex", "bmi", "children", "smoker", "region"]
+CATEGORICAL_COLS = ["sex", "smoker", "region"]
+TARGET_COL = "charges"
+
+logger = logging.getLogger(__name__)
+
+
+# ---------- Training ----------
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_npy_atomic(path, array):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def _write_json_atomic(path, payload):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def encode_training_frame(df):
+    """Label-encode the categorical columns (sorted classes, like LabelEncoder)."""
+    df = df.copy()
+    encodings = {}
+    for col in CATEGORICAL_COLS:
+        classes = sorted(df[col].unique().tolist())
+        encodings[col] = classes
+        df[col] = df[col].map({value: code for code, value in enumerate(classes)}).astype(np.int64)
+    return df[FEATURE_NAMES], df[TARGET_COL], encodings
+
+
+def train_artifact(data_path=DATA_PATH, n_estimators=100, random_state=42,
+                   registry_dir=REGISTRY_DIR, version=None, promote=True):
+    """Fit the premium model and write it to a new version directory. Returns the version."""
+    import xgboost as xgb
+
+    started = time.perf_counter()
+    df, data_hash = load_table(data_path, "insurance")
+    X, y, encodings = encode_training_frame(df)
+
+    model = xgb.XGBRegressor(random_state=random_state, n_estimators=n_estimators)
+    model.fit(X, y)
+    training_seconds = time.perf_counter() - started
+
+    if version is None:
+        version = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{data_hash[:8]}"
+
+    return write_artifact(model, X, y, encodings, version, {
+        "data_path": os.path.relpath(data_path, BASE_DIR),
+        "data_sha256": data_hash,
+        "params": {"n_estimators": n_estimators, "random_state": random_state},
+        "training_seconds": round(training_seconds, 3),
+    }, registry_dir=registry_dir, promote=promote)
+
+
+def write_artifact(model, X, y, encodings, version, metadata, registry_dir=REGISTRY_DIR, promote=True):
+    """Compute the SHAP artifacts for a fitted model and write a new version directory."""
+    import shap
+    import xgboost as xgb
+
+    explainer = shap.Explainer(model, X)
+    expected_value = float(np.atleast_1d(explainer.expected_value)[0])
+    global_shap = explainer(X).values
+
+    version_dir = os.path.join(registry_dir, version)
+    os.makedirs(version_dir, exist_ok=False)
+
+    model.save_model(os.path.join(version_dir, "model.json"))
+    np.save(os.path.join(version_dir, "background.npy"), X.to_numpy(dtype=np.float64))
+    np.save(os.path.join(version_dir, "target.npy"), np.asarray(y, dtype=np.float64))
+    _write_npy_atomic(os.path.join(version_dir, GLOBAL_SHAP_FILE), global_shap)
+
+    train_pred = model.predict(X)
+    _write_json_atomic(os.path.join(version_dir, "manifest.json"), {
+        "version": version,
+        "feature_names": FEATURE_NAMES,
+        "encodings": encodings,
+        "shap_expected_value": expected_value,
+        "metadata": dict(
+            {"trained_at": datetime.now().isoformat(timespec="seconds")},
+            **metadata,
+            rows=int(len(X)),
+            xgboost_version=xgb.__version__,
+            train_rmse=round(float(np.sqrt(np.mean((train_pred - np.asarray(y)) ** 2))), 2),
+        ),
+    })
+
+    if promote:
+        promote_version(version, registry_dir=registry_dir)
+    return version
+
+
+def promote_version(version, registry_dir=REGISTRY_DIR):
+    if not os.path.isfile(os.path.join(registry_dir, version, "manifest.json")):
+        raise FileNotFoundError(f"No artifact '{version}' in {registry_dir}")
+    tmp_path = os.path.join(registry_dir, f"{LATEST_FILE}.tmp")
+    with open(tmp_path, "w") as f:
+        f.write(version + "\n")
+    os.replace(tmp_path, os.path.join(registry_dir, LATEST_FILE))
+
+
+def list_versions(registry_dir=REGISTRY_DIR):
+    if not os.path.isdir(registry_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(registry_dir)
+        if os.path.isfile(os.path.join(registry_dir, name, "manifest.json"))
+    )
+
+
+def latest_version(registry_dir=REGISTRY_DIR):
+    try:
+        with open(os.path.join(registry_dir, LATEST_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        versions = list_versions(registry_dir)
+        return versions[-1] if versions else None
+
+
+# ---------- Loading ----------
+
+class ModelArtifact:
+    """
+    A loaded artifact version. Only the manifest is read up front; the
+    booster, background matrix and SHAP explainer load on first access.
+    """
+
+    def __init__(self, version_dir):
+        self.path = version_dir
+        with open(os.path.join(version_dir, "manifest.json")) as f:
+            manifest = json.load(f)
+        self.version = manifest["version"]
+        self.feature_names = manifest["feature_names"]
+        self.encodings = manifest["encodings"]
+        self.expected_value = manifest["shap_expected_value"]
+        self.metadata = manifest["metadata"]
+        self._lock = threading.Lock()
+        self._model = None
+        self._X_train = None
+        self._explainer = None
+        self._global_shap = None
+        self._compiled = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    import xgboost as xgb
+                    model = xgb.XGBRegressor()
+                    model.load_model(os.path.join(self.path, "model.json"))
+                    self._model = model
+        return self._model
+
+    @property
+    def X_train(self):
+        """
+        Training features, shared by every caller in the process and read-only:
+        the frame wraps a read-only memory map of background.npy (no copy), so
+        processes serving the same version share its pages.
+        """
+        if self._X_train is None:
+            background = np.load(os.path.join(self.path, "background.npy"), mmap_mode="r")
+            self._X_train = pd.DataFrame(background, columns=self.feature_names, copy=False)
+        return self._X_train
+
+    @property
+    def y_train(self):
+        """Training target aligned with X_train (re-read from the training CSV for older versions)."""
+        path = os.path.join(self.path, "target.npy")
+        if os.path.exists(path):
+            return pd.Series(np.load(path, mmap_mode="r"), name=TARGET_COL, copy=False)
+        df, _ = load_table(os.path.join(BASE_DIR, self.metadata["data_path"]), "insurance")
+        return df[TARGET_COL].astype(np.float64)
+
+    @property
+    def explainer(self):
+        if self._explainer is None:
+            import shap
+            model, X_train = self.model, self.X_train
+            with self._lock:
+                if self._explainer is None:
+                    self._explainer = shap.Explainer(model, X_train)
+        return self._explainer
+
+    @property
+    def global_shap_values(self):
+        """
+        SHAP values of every background row (rows x features), read-only.
+
+        Identical for every request against this version, so it is computed
+        at most once and memory-mapped from shap_values.npy afterwards.
+        """
+        if self._global_shap is None:
+            path = os.path.join(self.path, GLOBAL_SHAP_FILE)
+            if os.path.exists(path):
+                self._global_shap = np.load(path, mmap_mode="r")
+            else:
+                explainer = self.explainer
+                with self._lock:
+                    if self._global_shap is None:
+                        values = explainer(self.X_train).values
+                        try:
+                            _write_npy_atomic(path, values)
+                            values = np.load(path, mmap_mode="r")
+                        except OSError:
+                            values.setflags(write=False)  # read-only registry: keep it in memory
+                        self._global_shap = values
+        return self._global_shap
+
+    @property
+    def compiled_model(self):
+        """
+        The booster compiled to flat NumPy arrays (ml_models/compiled.py), or
+        None if it cannot be compiled or fails its bit-for-bit self-check.
+        """
+        if self._compiled is None:
+            from .compiled import compile_verified
+            model, X_train = self.model, self.X_train
+            with self._lock:
+                if self._compiled is None:
+                    self._compiled = compile_verified(model, X_train) or False
+        return self._compiled or None
+
+    def record_cold_start(self, seconds, stage):
+        entry = {
+            "at": datetime.now().isoformat(timespec="seconds"),
+            "pid": os.getpid(),
+            "stage": stage,
+            "seconds": round(seconds, 4),
+        }
+        try:
+            with open(os.path.join(self.path, "cold_starts.jsonl"), "a") as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError:
+            pass  # read-only deployments still serve; they just don't keep the history
+        logger.info("premium model %s: %s in %.1f ms", self.version, stage, seconds * 1000)
+
+    def cold_starts(self):
+        try:
+            with open(os.path.join(self.path, "cold_starts.jsonl")) as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+
+def load_artifact(version=None, registry_dir=REGISTRY_DIR):
+    """
+    Load an artifact (default: $PREMIUM_MODEL_VERSION, else LATEST) and
+    time how long it takes until the booster is ready to predict.
+
+    Serving never trains: an empty registry is an error, fixed by running
+    `python -m ml_models.registry train` once (the Docker build does).
+    """
+    started = time.perf_counter()
+    version = version or os.environ.get("PREMIUM_MODEL_VERSION") or latest_version(registry_dir)
+    if version is None:
+        raise FileNotFoundError(
+            f"No premium model artifacts in {registry_dir}; run `python -m ml_models.registry train` first"
+        )
+
+    artifact = ModelArtifact(os.path.join(registry_dir, version))
+    artifact.model  # noqa: B018 - warm the booster so the timing covers it
+    artifact.record_cold_start(time.perf_counter() - started, stage=SERVE_STAGE)
+    return artifact
+
+
+# ---------- CLI ----------
+
+def _cmd_train(args):
+    version = train_artifact(
+        data_path=args.data, n_estimators=args.n_estimators,
+        version=args.version, promote=not args.no_promote,
+    )
+    print(f"Trained premium model {version}" + ("" if args.no_promote else " (promoted to LATEST)"))
+
+
+def _cmd_list(args):
+    latest = latest_version()
+    versions = list_versions()
+    if not versions:
+        print(f"No artifacts in {REGISTRY_DIR}")
+        return
+    print(f"{'version':<28} {'rows':>6} {'train s':>8} {'rmse':>10} {'serve loads':>11} {'median ms':>10}")
+    for version in versions:
+        artifact = ModelArtifact(os.path.join(REGISTRY_DIR, version))
+        starts = [entry["seconds"] for entry in artifact.cold_starts() if entry["stage"] == SERVE_STAGE]
+        median_ms = f"{statistics.median(starts) * 1000:.1f}" if starts else "-"
+        marker = " *" if version == latest else ""
+        meta = artifact.metadata
+        print(f"{version:<28} {meta['rows']:>6} {meta['training_seconds']:>8} "
+              f"{meta['train_rmse']:>10} {len(starts):>11} {median_ms:>10}{marker}")
+
+
+def _cmd_promote(args):
+    promote_version(args.version)
+    print(f"LATEST -> {args.version}")
+
+
+def _cmd_coldstart(args):
+    versions = args.versions or list_versions()
+    for version in versions:
+        started = time.perf_counter()
+        artifact = ModelArtifact(os.path.join(REGISTRY_DIR, version))
+        artifact.model.predict(artifact.X_train.iloc[:1])
+        ready = time.perf_counter() - started
+        artifact.record_cold_start(ready, stage="manifest+booster+first_predict")
+        artifact.explainer(artifact.X_train.iloc[:1])
+        explained = time.perf_counter() - started
+        artifact.record_cold_start(explained, stage="manifest+booster+explainer")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ml_models.registry", description=__doc__.split("\n\n")[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    train = sub.add_parser("train", help="train and register a new model version")
+    train.add_argument("--data", default=DATA_PATH)
+    train.add_argument("--n-estimators", type=int, default=100)
+    train.add_argument("--version", help="explicit version name (default: timestamp + data hash)")
+    train.add_argument("--no-promote", action="store_true", help="do not point LATEST at the new version")
+    train.set_defaults(func=_cmd_train)
+
+    sub.add_parser("list", help="list versions with training and cold-start stats").set_defaults(func=_cmd_list)
+
+    promote = sub.add_parser("promote", help="serve a version by default")
+    promote.add_argument("version")
+    promote.set_defaults(func=_cmd_promote)
+
+    coldstart = sub.add_parser("coldstart", help="measure load time of one or more versions")
+    coldstart.add_argument("versions", nargs="*")
+    coldstart.set_defaults(func=_cmd_coldstart)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
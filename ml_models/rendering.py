@@ -0,0 +1,237 @@
+# ml_models/rendering.py
+"""
+Explanation payloads for clients to draw, and cached explanation images.
+
+explanation_payload() is everything a waterfall or force plot needs: the
+base value, the prediction and every feature's contribution ordered by
+absolute impact -- a few hundred bytes of JSON instead of matplotlib
+figures or shap's force-plot JavaScript bundle. It is built on
+explain_premium_from_input(), so it shares that LRU cache and batching.
+
+For clients that cannot draw, render_waterfall() returns an SVG or PNG
+waterfall of the same payload, cached per (model version, normalized
+profile, format) with LRU eviction. The summary and dependence plots do not
+depend on the input, so global_plot() renders them once per model version
+and keeps them in the version directory (in memory if the registry is
+read-only); ModelManager warms them before a version is swapped in.
+
+Figures are drawn on matplotlib.figure.Figure, never pyplot, so rendering
+is safe from request threads.
+
+    python -m ml_models.rendering prerender      # render the served version's global plots
+
+Configuration (environment):
+    EXPLAIN_IMAGE_CACHE_SIZE   max per-profile images kept (default 256, 0 disables)
+"""
+
+import argparse
+import io
+import os
+import threading
+
+import numpy as np
+
+from . import metrics, premium
+from .cache import TTLCache, profile_key
+from .registry import FEATURE_NAMES
+
+IMAGE_FORMATS = {"svg": "image/svg+xml", "png": "image/png"}
+GLOBAL_PLOTS = ("summary", "dependence")
+PLOTS_DIR = "plots"
+DEPENDENCE_FEATURE = "bmi"
+DEPENDENCE_COLOR_BY = "smoker"
+INCREASE_COLOR = "#ff0051"  # shap's red / blue
+DECREASE_COLOR = "#008bfb"
+
+_image_cache = TTLCache(maxsize=int(os.environ.get("EXPLAIN_IMAGE_CACHE_SIZE", "256")), ttl=0)
+_global_plots = {}  # (version, name, format) -> bytes
+_global_lock = threading.Lock()
+_save_lock = threading.Lock()
+
+
+def _check_format(fmt):
+    if fmt not in IMAGE_FORMATS:
+        raise ValueError(f"Unknown image format '{fmt}'; expected one of {list(IMAGE_FORMATS)}.")
+
+
+# ---------- Payload ----------
+
+def explanation_payload(ui_input, mode=None, artifact=None):
+    """
+    Base value, prediction and all contributions (largest |impact| first) for
+    one profile, all from one model version (`artifact`, default the served one).
+    """
+    artifact = artifact or premium.load_model()
+    prediction = premium.predict_premium_from_input(ui_input, artifact)
+    explanation = premium.explain_premium_from_input(ui_input, max_features=len(FEATURE_NAMES), mode=mode,
+                                                     artifact=artifact)
+    contributions = [
+        {"feature": item["feature"], "value": item["value"], "impact": item["impact"]}
+        for item in explanation["top_features"]
+    ]
+    return {
+        "model_version": artifact.version,
+        "mode": explanation["mode"],
+        "base_value": explanation["base_value"],
+        "prediction": prediction,
+        "contributions": contributions,
+    }
+
+
+# ---------- Drawing ----------
+
+def _save(fig, fmt):
+    import matplotlib
+
+    buffer = io.BytesIO()
+    # Text stays text in SVGs (a fraction of the size of glyph paths); rc_context is process-global
+    with _save_lock, matplotlib.rc_context({"svg.fonttype": "none", "svg.hashsalt": "medins"}):
+        fig.savefig(buffer, format=fmt, bbox_inches="tight", dpi=100,
+                    metadata={"Date": None} if fmt == "svg" else None)
+    return buffer.getvalue()
+
+
+def _waterfall_figure(payload):
+    """Bars from the base value (bottom) to the prediction (top), largest contribution on top."""
+    from matplotlib.figure import Figure
+
+    items = payload["contributions"][::-1]
+    fig = Figure(figsize=(8, 0.45 * len(items) + 1.2))
+    ax = fig.subplots()
+    running = payload["base_value"]
+    for row, item in enumerate(items):
+        color = INCREASE_COLOR if item["impact"] > 0 else DECREASE_COLOR
+        ax.barh(row, item["impact"], left=running, color=color, height=0.6)
+        ax.text(max(running, running + item["impact"]), row, f" {item['impact']:+,.0f}", va="center", fontsize=9)
+        running += item["impact"]
+    ax.set_yticks(range(len(items)), [f"{item['feature']} = {item['value']}" for item in items])
+    for value, label in ((payload["base_value"], "E[f(x)]"), (payload["prediction"], "f(x)")):
+        ax.axvline(value, color="#999999", linestyle="--", linewidth=0.8)
+        ax.text(value, len(items) - 0.4, f"{label} = {value:,.0f}", ha="center", fontsize=9)
+    ax.margins(x=0.08)
+    ax.set_xlabel("Annual premium")
+    ax.spines[["top", "right"]].set_visible(False)
+    return fig
+
+
+def _summary_figure(artifact):
+    from matplotlib.figure import Figure
+
+    mean_abs = np.abs(artifact.global_shap_values).mean(axis=0)
+    order = np.argsort(mean_abs)
+    fig = Figure(figsize=(8, 4.5))
+    ax = fig.subplots()
+    ax.barh([FEATURE_NAMES[i] for i in order], mean_abs[order], color=DECREASE_COLOR)
+    ax.set_xlabel("mean(|SHAP value|) (average impact on premium)")
+    ax.spines[["top", "right"]].set_visible(False)
+    return fig
+
+
+def _dependence_figure(artifact):
+    from matplotlib.figure import Figure
+
+    idx = FEATURE_NAMES.index(DEPENDENCE_FEATURE)
+    color_codes = np.asarray(artifact.X_train[DEPENDENCE_COLOR_BY])
+    fig = Figure(figsize=(8, 4.5))
+    ax = fig.subplots()
+    for code, label in enumerate(artifact.encodings[DEPENDENCE_COLOR_BY]):
+        rows = color_codes == code
+        ax.scatter(artifact.X_train[DEPENDENCE_FEATURE][rows], artifact.global_shap_values[rows, idx], s=6,
+                   alpha=0.6, color=INCREASE_COLOR if label == "yes" else DECREASE_COLOR,
+                   label=f"{DEPENDENCE_COLOR_BY} = {label}", rasterized=True)  # points as one bitmap in SVGs
+    ax.set_xlabel(DEPENDENCE_FEATURE)
+    ax.set_ylabel(f"SHAP value for {DEPENDENCE_FEATURE}")
+    ax.legend(frameon=False)
+    ax.spines[["top", "right"]].set_visible(False)
+    return fig
+
+
+_GLOBAL_FIGURES = {"summary": _summary_figure, "dependence": _dependence_figure}
+
+
+# ---------- Cached images ----------
+
+def render_waterfall(ui_input, fmt="svg", mode=None, artifact=None):
+    """Waterfall image (bytes) of explanation_payload(), cached per (model version, profile, format)."""
+    _check_format(fmt)
+    artifact = artifact or premium.load_model()
+    key = (profile_key(ui_input), fmt, mode)
+    hit, image = _image_cache.get(key, artifact.version)
+    if not hit:
+        payload = explanation_payload(ui_input, mode=mode, artifact=artifact)
+        with metrics.timed("medins_model_seconds", call="render_waterfall"):
+            image = _save(_waterfall_figure(payload), fmt)
+        _image_cache.put(key, image, artifact.version)
+    return image
+
+
+def _load_or_render(artifact, name, fmt):
+    path = os.path.join(artifact.path, PLOTS_DIR, f"{name}.{fmt}")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+    with metrics.timed("medins_model_seconds", call="render_global"):
+        image = _save(_GLOBAL_FIGURES[name](artifact), fmt)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            f.write(image)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass  # read-only registry: keep it in memory
+    return image
+
+
+def global_plot(name, fmt="png", artifact=None):
+    """Model-wide summary or dependence plot (bytes), rendered once per model version."""
+    if name not in GLOBAL_PLOTS:
+        raise ValueError(f"Unknown plot '{name}'; expected one of {list(GLOBAL_PLOTS)}.")
+    _check_format(fmt)
+    artifact = artifact or premium.load_model()
+    key = (artifact.version, name, fmt)
+    image = _global_plots.get(key)
+    if image is None:
+        with _global_lock:
+            image = _global_plots.get(key)
+            if image is None:
+                image = _load_or_render(artifact, name, fmt)
+                _global_plots[key] = image
+    return image
+
+
+def prerender_global_plots(artifact=None):
+    """Render (or load) every global plot of `artifact` and drop other versions' plots from memory."""
+    artifact = artifact or premium.load_model()
+    for name in GLOBAL_PLOTS:
+        for fmt in IMAGE_FORMATS:
+            global_plot(name, fmt, artifact)
+    with _global_lock:
+        current = premium.loaded_model_version()
+        for key in [key for key in _global_plots if key[0] not in (artifact.version, current)]:
+            del _global_plots[key]
+
+
+def image_cache_stats():
+    """Hit/miss/eviction counters of the per-profile image cache."""
+    return _image_cache.stats()
+
+
+# ---------- CLI ----------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ml_models.rendering", description=__doc__.split("\n\n")[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("prerender", help="render the served version's global plots into its version directory")
+    parser.parse_args(argv)
+
+    artifact = premium.load_model()
+    prerender_global_plots(artifact)
+    for name in GLOBAL_PLOTS:
+        for fmt in IMAGE_FORMATS:
+            print(f"{artifact.version}: {os.path.join(artifact.path, PLOTS_DIR, f'{name}.{fmt}')} "
+                  f"({len(global_plot(name, fmt, artifact)) / 1024:.1f} KB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# ml_models/segments.py
+"""
+Precomputed profile -> member index for the premium forecaster.
+
+The forecaster picks "the member with the most claims rows" among rows
+matching the user's (age_group, sex, province, employer_size, plan_type),
+falling back to (age_group, sex, province) when nothing matches. Rather than
+masking the whole claims frame on every request, both mappings are built
+once when the data loads, together with each chosen member's monthly
+premium series, so a lookup is a dict access regardless of data size.
+
+Ties are broken the way the original value_counts() selection did: equal
+row counts go to the member that appears first in the data.
+"""
+
+import numpy as np
+
+SEGMENT_KEYS = ["age_group", "sex", "province", "employer_size", "plan_type"]
+BROAD_SEGMENT_KEYS = ["age_group", "sex", "province"]
+
+
+def _monthly_premiums(member_rows):
+    return (
+        member_rows
+        .set_index("date")
+        .resample("ME")["monthly_premium_cad"]
+        .mean()
+        .dropna()
+    )
+
+
+def _build(df, keys):
+    """{segment tuple: entry} with the best-covered member of every segment."""
+    positions = df.assign(_pos=np.arange(len(df)))
+    coverage = (
+        positions.groupby(keys + ["member_id"], sort=False, observed=True)
+        .agg(rows=("_pos", "size"), first_row=("_pos", "min"))
+        .reset_index()
+        .sort_values(["rows", "first_row"], ascending=[False, True], kind="stable")
+        .drop_duplicates(keys)
+    )
+
+    row_groups = positions.groupby(keys + ["member_id"], sort=False, observed=True).indices
+    index = {}
+    for record in coverage.itertuples(index=False):
+        segment = tuple(getattr(record, key) for key in keys)
+        member_rows = df.iloc[row_groups[segment + (record.member_id,)]]
+        index[segment] = {
+            "member_id": record.member_id,
+            "rows": int(record.rows),
+            "avg_risk_score": float(member_rows["risk_score"].mean()),
+            "monthly": _monthly_premiums(member_rows),
+        }
+    return index
+
+
+class SegmentIndex:
+    def __init__(self, df):
+        self.exact = _build(df, SEGMENT_KEYS)
+        self.broad = _build(df, BROAD_SEGMENT_KEYS)
+
+    def lookup(self, age_group, sex, province, employer_size, plan_type):
+        """Best member for a profile (exact segment first, then the broad one), or None."""
+        entry = self.exact.get((age_group, sex, province, employer_size, plan_type))
+        if entry is None:
+            entry = self.broad.get((age_group, sex, province))
+        return entry
+
+    def __len__(self):
+        return len(self.exact) + len(self.broad)
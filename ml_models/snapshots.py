@@ -0,0 +1,309 @@
+# ml_models/snapshots.py
+"""
+Typed columnar snapshots of the CSV datasets.
+
+Parsing the claims CSV is most of a forecaster process's startup, and the
+resulting frame holds every string as a Python object and every number as
+float64. The first load of a CSV writes an uncompressed Arrow IPC file next
+to a small meta JSON (source size, mtime, sha256); later loads memory-map
+that file, so startup is a few milliseconds and the column buffers are page
+cache shared by every process on the host (API workers, FAPP, Medstream).
+
+Column types come from SCHEMAS: low-cardinality strings become categoricals,
+small integers int8/int16, dates are parsed once. Floats that feed a model
+or a forecast (premiums, risk scores, bmi, charges) stay float64 so results
+are identical to reading the CSV; the rest are float32.
+
+A snapshot is reused while the source's size and mtime match the meta. If
+they differ but the content hash does not (a copy, a touch), only the meta
+is refreshed; otherwise the snapshot is rebuilt. DATA_SNAPSHOTS=0 reads the
+CSVs directly; an unwritable DATA_SNAPSHOT_DIR falls back to parsing in
+memory with the same types.
+
+    python -m ml_models.snapshots build            # (re)build every dataset's snapshot
+    python -m ml_models.snapshots report           # CSV vs snapshot load time and memory
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SNAPSHOT_DIR = os.environ.get("DATA_SNAPSHOT_DIR", os.path.join(BASE_DIR, "models", "snapshots"))
+ENABLED = os.environ.get("DATA_SNAPSHOTS", "1") != "0"
+FORMAT_VERSION = 1
+
+# Columns not listed keep read_csv's type, except strings repeating enough to be worth a categorical
+SCHEMAS = {
+    "claims": {
+        "date": "datetime",
+        "year": np.int16,
+        "month": np.int8,
+        "quarter": np.int8,
+        "member_id": "category",
+        "first_name": "category",
+        "last_name": "category",
+        "age": np.int8,
+        "sex": "category",
+        "province": "category",
+        "employer_size": "category",
+        "plan_type": "category",
+        "chronic_condition": "category",
+        "claim_amount_cad": np.float32,
+        "is_high_cost_claim": np.int8,
+        "is_forecast": np.int8,
+        "forecast_lower_bound_cad": np.float32,
+        "forecast_upper_bound_cad": np.float32,
+        "loss_ratio": np.float32,
+        "age_group": "category",
+    },
+    "insurance": {
+        "age": np.int8,
+        "sex": "category",
+        "children": np.int8,
+        "smoker": "category",
+        "region": "category",
+    },
+}
+
+DATASETS = {
+    "claims": os.environ.get(
+        "CLAIMS_DATA_PATH", os.path.join(BASE_DIR, "data", "canada_medical_insurance_forecast_detailed.csv")
+    ),
+    "insurance": os.path.join(BASE_DIR, "data", "medical_insurance.csv"),
+}
+
+
+# ---------- Typing ----------
+
+def apply_schema(df, schema):
+    """Cast `df`'s columns in place per `schema`; a column that does not fit keeps its type."""
+    for col in df.columns:
+        target = schema.get(col)
+        if target is None:
+            is_text = not pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col])
+            if is_text and df[col].nunique() < len(df) // 2:
+                target = "category"
+            else:
+                continue
+        if target == "datetime":
+            df[col] = pd.to_datetime(df[col])
+        elif target == "category":
+            df[col] = df[col].astype("category")
+        elif np.issubdtype(target, np.integer):
+            values = df[col]
+            info = np.iinfo(target)
+            if values.isna().any() or values.min() < info.min or values.max() > info.max:
+                continue
+            df[col] = values.astype(target)
+        else:
+            df[col] = df[col].astype(target)
+    return df
+
+
+def read_csv_typed(path, kind):
+    return apply_schema(pd.read_csv(path), SCHEMAS.get(kind, {}))
+
+
+# ---------- Snapshots ----------
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _name(csv_path):
+    return os.path.splitext(os.path.basename(csv_path))[0]
+
+
+def _meta_path(csv_path, snapshot_dir):
+    return os.path.join(snapshot_dir, f"{_name(csv_path)}.json")
+
+
+def _read_meta(csv_path, snapshot_dir):
+    try:
+        with open(_meta_path(csv_path, snapshot_dir)) as f:
+            meta = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if meta.get("format") != FORMAT_VERSION or not os.path.exists(os.path.join(snapshot_dir, meta["file"])):
+        return None
+    return meta
+
+
+def _write_meta(csv_path, snapshot_dir, meta):
+    path = _meta_path(csv_path, snapshot_dir)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def build_snapshot(csv_path, kind, snapshot_dir=SNAPSHOT_DIR, sha256=None):
+    """Parse `csv_path` with its schema and write the Arrow snapshot + meta. Returns the meta."""
+    import pyarrow as pa
+
+    started = time.perf_counter()
+    stat = os.stat(csv_path)
+    sha256 = sha256 or _sha256(csv_path)
+    df = read_csv_typed(csv_path, kind)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    os.makedirs(snapshot_dir, exist_ok=True)
+    filename = f"{_name(csv_path)}-{sha256[:16]}.arrow"
+    path = os.path.join(snapshot_dir, filename)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+    previous = _read_meta(csv_path, snapshot_dir)
+    meta = {
+        "format": FORMAT_VERSION,
+        "kind": kind,
+        "source": os.path.abspath(csv_path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": sha256,
+        "file": filename,
+        "rows": len(df),
+        "built_at": datetime.now().isoformat(timespec="seconds"),
+        "build_seconds": round(time.perf_counter() - started, 3),
+    }
+    _write_meta(csv_path, snapshot_dir, meta)
+    if previous is not None and previous["file"] != filename:
+        try:
+            os.remove(os.path.join(snapshot_dir, previous["file"]))
+        except FileNotFoundError:
+            pass
+    return meta
+
+
+def ensure_snapshot(csv_path, kind, snapshot_dir=SNAPSHOT_DIR):
+    """The meta of an up-to-date snapshot of `csv_path`, building it if needed."""
+    stat = os.stat(csv_path)
+    meta = _read_meta(csv_path, snapshot_dir)
+    if meta is not None and meta["kind"] == kind:
+        if meta["size"] == stat.st_size and meta["mtime_ns"] == stat.st_mtime_ns:
+            return meta
+        sha256 = _sha256(csv_path)
+        if meta["sha256"] == sha256:
+            meta = dict(meta, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+            _write_meta(csv_path, snapshot_dir, meta)
+            return meta
+        return build_snapshot(csv_path, kind, snapshot_dir, sha256=sha256)
+    return build_snapshot(csv_path, kind, snapshot_dir)
+
+
+def _map_snapshot(path):
+    import pyarrow as pa
+
+    # Numeric buffers without nulls are wrapped, not copied, so they stay backed by the mapping
+    source = pa.memory_map(path, "r")
+    table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+def load_table(csv_path, kind, snapshot_dir=SNAPSHOT_DIR):
+    """
+    `csv_path` as a typed DataFrame, plus the source's sha256 (from the
+    snapshot meta, so an unchanged CSV is not re-hashed).
+    """
+    if not ENABLED:
+        return read_csv_typed(csv_path, kind), _sha256(csv_path)
+    try:
+        meta = ensure_snapshot(csv_path, kind, snapshot_dir)
+    except OSError as e:
+        print(f"[snapshots] {_name(csv_path)}: snapshot unavailable ({e}); parsing the CSV")
+        return read_csv_typed(csv_path, kind), _sha256(csv_path)
+    return _map_snapshot(os.path.join(snapshot_dir, meta["file"])), meta["sha256"]
+
+
+# ---------- CLI ----------
+
+def _measure(csv_path, kind, mode):
+    """Runs in a fresh interpreter so RSS and import costs are not shared."""
+    import resource
+
+    def rss_kb():
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+
+    import pyarrow  # noqa: F401  (import cost is not part of the load)
+    before = rss_kb()
+    started = time.perf_counter()
+    if mode == "csv":
+        # What the loaders did before snapshots: read_csv, dates parsed, nothing else typed
+        df = pd.read_csv(csv_path)
+        if "date" in df.columns:
+            df["date"] = pd.to_datetime(df["date"])
+    else:
+        df, _ = load_table(csv_path, kind)
+    seconds = time.perf_counter() - started
+    print(json.dumps({
+        "seconds": seconds,
+        "frame_mb": df.memory_usage(deep=True).sum() / 1e6,
+        "rss_mb": (rss_kb() - before) / 1e3,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3,
+    }))
+
+
+def _report(datasets, repeats):
+    rows = []
+    for kind, csv_path in datasets.items():
+        ensure_snapshot(csv_path, kind)
+        for mode in ("csv", "snapshot"):
+            runs = []
+            for _ in range(repeats):
+                out = subprocess.run(
+                    [sys.executable, "-m", "ml_models.snapshots", "_measure", kind, csv_path, mode],
+                    cwd=BASE_DIR, capture_output=True, text=True, check=True,
+                )
+                runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+            best = min(runs, key=lambda run: run["seconds"])
+            rows.append((kind, mode, best))
+
+    print(f"{'dataset':<10} {'load':<9} {'seconds':>8} {'frame MB':>9} {'+RSS MB':>8} {'peak RSS MB':>12}")
+    for kind, mode, run in rows:
+        print(f"{kind:<10} {mode:<9} {run['seconds']:>8.3f} {run['frame_mb']:>9.1f} "
+              f"{run['rss_mb']:>8.1f} {run['peak_rss_mb']:>12.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ml_models.snapshots", description=__doc__.split("\n\n")[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help="rebuild the snapshot of every dataset")
+    report = sub.add_parser("report", help="compare CSV and snapshot load time and memory")
+    report.add_argument("--repeats", type=int, default=3, help="fresh-process runs per measurement (best is shown)")
+    measure = sub.add_parser("_measure")
+    measure.add_argument("kind")
+    measure.add_argument("csv_path")
+    measure.add_argument("mode", choices=["csv", "snapshot"])
+    args = parser.parse_args(argv)
+
+    datasets = {kind: path for kind, path in DATASETS.items() if os.path.exists(path)}
+    if args.command == "build":
+        for kind, csv_path in datasets.items():
+            meta = build_snapshot(csv_path, kind)
+            print(f"{kind}: {meta['rows']} rows -> {os.path.join(SNAPSHOT_DIR, meta['file'])} "
+                  f"({meta['build_seconds']}s)")
+    elif args.command == "report":
+        _report(datasets, args.repeats)
+    else:
+        _measure(args.csv_path, args.kind, args.mode)
+
+
+if __name__ == "__main__":
+    main()
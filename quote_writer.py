@@ -0,0 +1,280 @@
+# quote_writer.py
+"""
+Write-behind persistence for Quote rows.
+
+/api/predict used to add + commit one Quote per request, i.e. one SQLite
+fsync and one exclusive write lock per quote. QuoteWriter instead puts rows
+on a bounded in-memory queue that a background thread drains, inserting
+each batch with a single executemany + commit.
+
+Durability modes (QUOTE_DURABILITY):
+- "sync":     the request writes its own row before responding (old behaviour,
+              but with WAL so readers never block it)
+- "batched":  write-behind, batches committed with PRAGMA synchronous=FULL
+              (default; a committed batch survives power loss)
+- "relaxed":  write-behind with synchronous=NORMAL (WAL-safe against process
+              crashes; the last batches may be lost on power loss)
+
+When the queue is full the caller writes its rows itself (back-pressure, no
+drops). A write on the caller's thread (sync mode, queue-full fallback)
+raises on failure, so the request fails instead of reporting a quote that
+was never stored. A failed background batch is retried with backoff until
+it commits; rows are only given up (counted in rows_dropped) if the
+database is still failing when the writer is stopped. Queued rows are
+flushed on interpreter shutdown.
+
+Each batch also upserts per-user and per-day aggregates (count, sum, min,
+max of predicted_amount) in the same transaction, so the stats tables are
+always consistent with the quotes table without ever scanning it.
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+DURABILITY_MODES = ("sync", "batched", "relaxed")
+MAX_RETRY_DELAY = 5.0
+
+
+def set_sqlite_pragmas(durability):
+    """Return a SQLAlchemy "connect" listener enabling WAL for the given mode."""
+    synchronous = "NORMAL" if durability == "relaxed" else "FULL"
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={synchronous}")
+        cursor.close()
+
+    return on_connect
+
+
+def aggregate_rows(rows, key):
+    """Pre-aggregate a batch: key value -> stats row (skips rows whose key is None)."""
+    groups = {}
+    for row in rows:
+        value = key(row)
+        if value is None:
+            continue
+        amount = row["predicted_amount"]
+        group = groups.get(value)
+        if group is None:
+            groups[value] = {
+                "quote_count": 1, "amount_sum": amount, "amount_min": amount, "amount_max": amount,
+                "last_quote_at": row["created_at"],
+            }
+        else:
+            group["quote_count"] += 1
+            group["amount_sum"] += amount
+            group["amount_min"] = min(group["amount_min"], amount)
+            group["amount_max"] = max(group["amount_max"], amount)
+            group["last_quote_at"] = max(group["last_quote_at"], row["created_at"])
+    return groups
+
+
+def upsert_stats(session, stats_model, key_column, groups):
+    """Fold pre-aggregated groups into a stats table with one INSERT .. ON CONFLICT."""
+    if not groups:
+        return
+    stmt = sqlite_insert(stats_model).values([dict(stats, **{key_column: key}) for key, stats in groups.items()])
+    table, new = stats_model.__table__.c, stmt.excluded
+    session.execute(stmt.on_conflict_do_update(
+        index_elements=[key_column],
+        set_={
+            "quote_count": table.quote_count + new.quote_count,
+            "amount_sum": table.amount_sum + new.amount_sum,
+            "amount_min": func.min(table.amount_min, new.amount_min),
+            "amount_max": func.max(table.amount_max, new.amount_max),
+            "last_quote_at": func.max(table.last_quote_at, new.last_quote_at),
+        },
+    ))
+
+
+class QuoteWriter:
+    def __init__(self, app, db, model, durability="batched", max_queue=10000,
+                 batch_size=500, flush_interval=0.2, user_stats=None, daily_stats=None,
+                 retry_delay=0.1, stop_retries=3):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability '{durability}'; expected one of {DURABILITY_MODES}.")
+        self.app = app
+        self.db = db
+        self.model = model
+        self.user_stats = user_stats
+        self.daily_stats = daily_stats
+        self.durability = durability
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_delay = retry_delay
+        self.stop_retries = stop_retries
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+
+        self.rows_written = 0
+        self.batches_written = 0
+        self.sync_fallbacks = 0
+        self.errors = 0
+        self.retries = 0
+        self.rows_dropped = 0
+
+        atexit.register(self.stop)
+
+    # ---------- Producer side ----------
+
+    def submit(self, row):
+        self.submit_many([row])
+
+    def submit_many(self, rows):
+        """Queue Quote column dicts for insertion; never blocks on the database unless the queue is full."""
+        if not rows:
+            return
+        now = datetime.utcnow()
+        for row in rows:
+            row.setdefault("created_at", now)
+
+        if self.durability == "sync":
+            self._write(rows)
+            return
+
+        self._ensure_started()
+        for i, row in enumerate(rows):
+            try:
+                self._queue.put_nowait(row)
+            except queue.Full:
+                self.sync_fallbacks += 1
+                self._write(rows[i:])
+                return
+
+    # ---------- Background writer ----------
+
+    def _ensure_started(self):
+        # Threads do not survive fork(), so a forked worker starts its own writer.
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._stopping.clear()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="quote-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                if self._stopping.is_set():
+                    return
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write_with_retry(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write_with_retry(self, rows):
+        """Background path: retry a failed batch with backoff; give up only once the writer is stopping."""
+        delay = self.retry_delay
+        failures = 0
+        while True:
+            try:
+                self._write(rows)
+                return
+            except Exception:
+                failures += 1
+                if self._stopping.is_set() and failures > self.stop_retries:
+                    self.rows_dropped += len(rows)
+                    self.app.logger.error("Quote writer stopping: dropped %d rows after %d failed attempts",
+                                          len(rows), failures)
+                    return
+                self.retries += 1
+                time.sleep(delay)
+                delay = min(delay * 2, MAX_RETRY_DELAY)
+
+    def _write(self, rows):
+        """Insert `rows` and their aggregates in one transaction; raises (after rolling back) on failure."""
+        with self.app.app_context():
+            try:
+                self.db.session.execute(insert(self.model), rows)
+                self._update_stats(rows)
+                self.db.session.commit()
+                self.rows_written += len(rows)
+                self.batches_written += 1
+            except Exception:
+                self.db.session.rollback()
+                self.errors += 1
+                self.app.logger.exception("Quote writer error (%d rows)", len(rows))
+                raise
+
+    # ---------- Aggregates ----------
+
+    def _update_stats(self, rows):
+        if self.user_stats is not None:
+            upsert_stats(self.db.session, self.user_stats, "user_email",
+                         aggregate_rows(rows, lambda row: row.get("user_email")))
+        if self.daily_stats is not None:
+            upsert_stats(self.db.session, self.daily_stats, "day",
+                         aggregate_rows(rows, lambda row: row["created_at"].date()))
+
+    def rebuild_stats(self):
+        """Recompute both stats tables from the quotes table (one full scan; for backfills)."""
+        quote = self.model
+        aggregates = (
+            func.count(quote.id), func.sum(quote.predicted_amount), func.min(quote.predicted_amount),
+            func.max(quote.predicted_amount), func.max(quote.created_at),
+        )
+        columns = ["quote_count", "amount_sum", "amount_min", "amount_max", "last_quote_at"]
+        with self.app.app_context():
+            session = self.db.session
+            if self.user_stats is not None:
+                session.execute(delete(self.user_stats))
+                session.execute(insert(self.user_stats).from_select(
+                    ["user_email"] + columns,
+                    select(quote.user_email, *aggregates).where(quote.user_email.isnot(None)).group_by(quote.user_email),
+                ))
+            if self.daily_stats is not None:
+                day = func.date(quote.created_at)
+                session.execute(delete(self.daily_stats))
+                session.execute(insert(self.daily_stats).from_select(
+                    ["day"] + columns,
+                    select(day, *aggregates).where(quote.created_at.isnot(None)).group_by(day),
+                ))
+            session.commit()
+
+    # ---------- Shutdown ----------
+
+    def flush(self):
+        """Block until every queued row has been written."""
+        if self._thread is not None and self._pid == os.getpid():
+            self._queue.join()
+
+    def stop(self, timeout=10.0):
+        """Write queued rows and stop the background thread (waits at most `timeout` seconds)."""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        # The thread drains the queue before it exits; a batch that keeps failing is retried stop_retries times
+        self._stopping.set()
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "durability": self.durability,
+            "queued": self._queue.qsize(),
+            "rows_written": self.rows_written,
+            "batches_written": self.batches_written,
+            "sync_fallbacks": self.sync_fallbacks,
+            "errors": self.errors,
+            "retries": self.retries,
+            "rows_dropped": self.rows_dropped,
+        }
@@ -0,0 +1,81 @@
+# serve.py
+"""
+Production entry point for the Flask API: gunicorn with N forked workers.
+
+The app, the premium model artifact (booster, training frame, global SHAP
+matrix), the explanation engine and the claims segment index are loaded and
+warmed once in the gunicorn master (app.warm_up()). Workers are forked
+afterwards and share those pages copy-on-write instead of each process
+loading its own copy, and every worker is ready as soon as it starts.
+
+    python serve.py                                  # $WEB_CONCURRENCY workers (default: CPU count) on :5000
+    python serve.py --workers 4 --threads 2 --bind 0.0.0.0:8000
+
+XGBoost runs with $OMP_NUM_THREADS threads per worker (default 1): the
+workers already occupy the cores, and GNU OpenMP is not safe to use in a
+child forked after the parent ran a parallel region. /metrics is per worker.
+Coalescing concurrent predictions (PREMIUM_BATCH_WINDOW_MS, see
+ml_models/batcher.py) needs --threads > 1 to have requests to coalesce.
+"""
+
+import argparse
+import os
+
+
+def post_fork(server, worker):
+    """Drop SQLite connections inherited from the master; each worker opens its own."""
+    import app as backend
+
+    with backend.app.app_context():
+        backend.db.engine.dispose(close=False)
+
+
+def build_options(args):
+    return {
+        "bind": args.bind,
+        "workers": args.workers,
+        "threads": args.threads,
+        "timeout": args.timeout,
+        "graceful_timeout": args.timeout,
+        "preload_app": True,
+        "post_fork": post_fork,
+        "accesslog": "-" if args.access_log else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python serve.py", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--bind", default=os.environ.get("BIND", "0.0.0.0:5000"))
+    parser.add_argument("--workers", type=int,
+                        default=int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)))
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("GUNICORN_THREADS", 1)),
+                        help="threads per worker (>1 uses the gthread worker)")
+    parser.add_argument("--timeout", type=int, default=120, help="worker timeout in seconds")
+    parser.add_argument("--access-log", action="store_true", help="log every request to stdout")
+    args = parser.parse_args(argv)
+
+    # Must be set before xgboost is imported (by backend.warm_up() below)
+    os.environ.setdefault("OMP_NUM_THREADS", "1")
+
+    from gunicorn.app.base import BaseApplication
+
+    import app as backend
+
+    backend.warm_up()
+    print(f"[serve] model {backend.ml_models.loaded_model_version()} warmed; "
+          f"starting {args.workers} worker(s) x {args.threads} thread(s) on {args.bind}")
+
+    class Server(BaseApplication):
+        def load_config(self):
+            for key, value in build_options(args).items():
+                if value is not None:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            return backend.app
+
+    Server().run()
+
+
+if __name__ == "__main__":
+    main()
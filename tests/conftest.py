@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import ml_models from the repository root, like the Streamlit apps do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,54 @@
+# tests/test_cache.py
+"""TTLCache: LRU / TTL behaviour and entries kept per model version."""
+
+from ml_models.cache import TTLCache, release_versions
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_alternating_versions_keep_their_entries():
+    cache = TTLCache(maxsize=10, ttl=0)
+    cache.put("profile", 100.0, "v1")
+    cache.put("profile", 200.0, "v2")
+
+    for _ in range(3):
+        assert cache.get("profile", "v1") == (True, 100.0)
+        assert cache.get("profile", "v2") == (True, 200.0)
+    stats = cache.stats()
+    assert stats["hits"] == 6 and stats["misses"] == 0 and stats["invalidations"] == 0
+
+
+def test_release_versions_drops_unserved_versions_from_every_cache():
+    first, second = TTLCache(maxsize=10, ttl=0), TTLCache(maxsize=10, ttl=0)
+    for cache in (first, second):
+        cache.put("a", 1, "old")
+        cache.put("b", 2, "old")
+        cache.put("a", 3, "new")
+
+    release_versions({"new"})
+
+    for cache in (first, second):
+        assert cache.get("a", "old") == (False, None)
+        assert cache.get("a", "new") == (True, 3)
+        assert cache.stats()["size"] == 1
+        assert cache.stats()["invalidations"] == 2
+
+
+def test_lru_eviction_and_expiry():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=2, ttl=10, clock=clock)
+    cache.put("a", 1, "v1")
+    cache.put("b", 2, "v1")
+    cache.get("a", "v1")
+    cache.put("c", 3, "v1")  # evicts "b", the least recently used
+
+    assert cache.get("b", "v1") == (False, None)
+    assert cache.stats()["evictions"] == 1
+    clock.now = 11
+    assert cache.get("a", "v1") == (False, None)
@@ -0,0 +1,108 @@
+# tests/test_compiled.py
+"""
+CompiledForest must reproduce XGBRegressor.predict() bit for bit.
+
+The premium model is refit here the way ml_models.registry trains it (same
+data, encoding and parameters), plus a variant fitted with missing values
+so that learned default directions are exercised too.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+xgb = pytest.importorskip("xgboost")
+
+from ml_models.compiled import CompiledForest, compile_verified
+from ml_models.registry import DATA_PATH, FEATURE_NAMES, encode_training_frame
+
+
+def assert_bit_identical(model, forest, X):
+    frame = pd.DataFrame(X, columns=FEATURE_NAMES)
+    expected = np.asarray(model.predict(frame), dtype=np.float32)
+    actual = forest.predict(np.asarray(X, dtype=np.float32))
+    assert actual.dtype == np.float32
+    assert actual.shape == expected.shape
+    assert np.array_equal(expected.view(np.uint32), actual.view(np.uint32))
+
+
+@pytest.fixture(scope="module")
+def training_frame():
+    X, y, _ = encode_training_frame(pd.read_csv(DATA_PATH))
+    return X, y
+
+
+@pytest.fixture(scope="module", params=["complete", "with_missing"])
+def fitted(request, training_frame):
+    X, y = training_frame
+    if request.param == "with_missing":
+        # Knock out ~10% of the bmi / age / children values so splits learn default directions
+        rng = np.random.default_rng(1)
+        X = X.astype(np.float64)
+        for col in ("bmi", "age", "children"):
+            X.loc[rng.random(len(X)) < 0.1, col] = np.nan
+    model = xgb.XGBRegressor(random_state=42, n_estimators=100)
+    model.fit(X, y)
+    return model, CompiledForest.from_booster(model.get_booster()), X
+
+
+def random_rows(X, count, seed):
+    """Uniform rows over (and a little beyond) each feature's training range."""
+    rng = np.random.default_rng(seed)
+    low, high = np.nanmin(X.to_numpy(), axis=0), np.nanmax(X.to_numpy(), axis=0)
+    span = high - low
+    return rng.uniform(low - 0.1 * span, high + 0.1 * span, size=(count, len(FEATURE_NAMES)))
+
+
+def threshold_rows(forest, X):
+    """For every split: a base row with the split feature exactly at, just below and just above the threshold."""
+    base = np.nanmedian(X.to_numpy(dtype=np.float32), axis=0)
+    rows = []
+    internal = forest.left != np.arange(len(forest.left))  # compiled leaves point to themselves
+    assert 0 < internal.sum() < len(internal)
+    for feature, threshold in zip(forest.feature[internal], forest.threshold[internal]):
+        for value in (threshold, np.nextafter(threshold, np.float32(-np.inf)),
+                      np.nextafter(threshold, np.float32(np.inf))):
+            row = base.copy()
+            row[feature] = value
+            rows.append(row)
+    return np.asarray(rows, dtype=np.float32)
+
+
+def test_training_rows(fitted):
+    model, forest, X = fitted
+    assert_bit_identical(model, forest, X.to_numpy())
+
+
+def test_random_rows(fitted):
+    model, forest, X = fitted
+    assert_bit_identical(model, forest, random_rows(X, 5000, seed=0))
+
+
+def test_threshold_edges(fitted):
+    model, forest, X = fitted
+    assert_bit_identical(model, forest, threshold_rows(forest, X))
+
+
+def test_missing_values(fitted):
+    model, forest, X = fitted
+    rows = random_rows(X, 2000, seed=2)
+    rng = np.random.default_rng(3)
+    rows[rng.random(rows.shape) < 0.3] = np.nan
+    rows[0, :] = np.nan  # every feature missing: pure default-direction walk
+    assert_bit_identical(model, forest, rows)
+
+
+def test_single_row_and_batch_agree(fitted):
+    model, forest, X = fitted
+    rows = random_rows(X, 50, seed=4)
+    batch = forest.predict(rows.astype(np.float32))
+    for i, row in enumerate(rows):
+        assert_bit_identical(model, forest, row[None, :])
+        assert forest.predict(row[None, :].astype(np.float32)).view(np.uint32)[0] == batch.view(np.uint32)[i]
+
+
+def test_compile_verified_accepts_model(fitted):
+    model, _, X = fitted
+    assert compile_verified(model, X) is not None
+
@@ -0,0 +1,169 @@
+# tests/test_quote_writer.py
+"""
+QuoteWriter against a throwaway SQLite database: batching, retries and
+drops on database errors, sync durability and the flush on shutdown.
+"""
+
+import time
+
+import pytest
+
+flask = pytest.importorskip("flask")
+flask_sqlalchemy = pytest.importorskip("flask_sqlalchemy")
+
+import quote_writer
+from quote_writer import QuoteWriter
+
+db = flask_sqlalchemy.SQLAlchemy()
+
+
+class Quote(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    predicted_amount = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime)
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = flask.Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'quotes.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def failures(app, monkeypatch):
+    """Make the next `failures["remaining"]` session.execute() calls raise."""
+    failures = {"remaining": 0}
+    execute = db.session.execute
+
+    def flaky(*args, **kwargs):
+        if failures["remaining"] > 0:
+            failures["remaining"] -= 1
+            raise RuntimeError("database is down")
+        return execute(*args, **kwargs)
+
+    monkeypatch.setattr(db.session, "execute", flaky)
+    return failures
+
+
+@pytest.fixture
+def make_writer(app):
+    writers = []
+
+    def make(**kwargs):
+        kwargs.setdefault("retry_delay", 0.01)
+        writer = QuoteWriter(app, db, Quote, **kwargs)
+        writers.append(writer)
+        return writer
+
+    yield make
+    for writer in writers:
+        writer.stop(timeout=5)
+
+
+def rows(count):
+    return [{"predicted_amount": float(i)} for i in range(count)]
+
+
+def stored(app):
+    with app.app_context():
+        return sorted(amount for (amount,) in db.session.query(Quote.predicted_amount))
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_batches_never_exceed_batch_size(app, make_writer, monkeypatch):
+    writer = make_writer(batch_size=3)
+    sizes = []
+    write = writer._write
+    monkeypatch.setattr(writer, "_write", lambda batch: (sizes.append(len(batch)), write(batch)))
+
+    writer.submit_many(rows(7))
+    writer.flush()
+
+    assert stored(app) == [float(i) for i in range(7)]
+    assert sum(sizes) == 7 and max(sizes) <= 3
+    assert writer.stats()["batches_written"] == len(sizes) >= 3
+
+
+def test_partial_batch_is_written_without_flush(app, make_writer):
+    writer = make_writer(batch_size=500, flush_interval=0.05)
+    writer.submit({"predicted_amount": 42.0})
+
+    assert wait_for(lambda: writer.rows_written == 1)
+    assert stored(app) == [42.0]
+
+
+def test_failed_batch_is_retried_until_it_commits(app, make_writer, failures):
+    writer = make_writer()
+    failures["remaining"] = 3
+    writer.submit_many(rows(5))
+    writer.flush()
+
+    stats = writer.stats()
+    assert stored(app) == [float(i) for i in range(5)]
+    assert stats["errors"] == 3 and stats["retries"] == 3
+    assert stats["rows_dropped"] == 0
+
+
+def test_batch_is_dropped_when_stopping_while_database_fails(app, make_writer, failures):
+    writer = make_writer(stop_retries=2)
+    failures["remaining"] = 10 ** 9
+    writer.submit_many(rows(4))
+    assert wait_for(lambda: writer.errors >= 1)
+
+    writer.stop(timeout=5)
+
+    assert not writer._thread.is_alive()
+    assert writer.stats()["rows_dropped"] == 4
+    failures["remaining"] = 0
+    assert stored(app) == []
+
+
+def test_sync_writes_before_returning(app, make_writer):
+    writer = make_writer(durability="sync")
+    writer.submit_many(rows(2))
+
+    assert writer._thread is None
+    assert stored(app) == [0.0, 1.0]
+
+
+def test_sync_write_failure_raises(app, make_writer, failures):
+    writer = make_writer(durability="sync")
+    failures["remaining"] = 1
+
+    with pytest.raises(RuntimeError):
+        writer.submit({"predicted_amount": 1.0})
+    assert stored(app) == []
+    assert writer.stats()["errors"] == 1
+
+
+def test_unknown_durability_is_rejected(app):
+    with pytest.raises(ValueError):
+        QuoteWriter(app, db, Quote, durability="eventual")
+
+
+def test_atexit_hook_flushes_queued_rows(app, monkeypatch):
+    hooks = []
+    monkeypatch.setattr(quote_writer.atexit, "register", hooks.append)
+    writer = QuoteWriter(app, db, Quote, flush_interval=0.05)
+    assert hooks == [writer.stop]
+
+    writer.submit_many(rows(3))
+    for hook in hooks:
+        hook()
+
+    assert not writer._thread.is_alive()
+    assert stored(app) == [0.0, 1.0, 2.0]
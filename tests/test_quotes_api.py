@@ -0,0 +1,152 @@
+# tests/test_quotes_api.py
+"""
+/api/quotes and the quote stats endpoints against a scratch database that
+starts out in the pre-stats schema, so the startup backfill runs on import.
+"""
+
+import importlib
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("flask_sqlalchemy")
+pytest.importorskip("flask_cors")
+
+ADMIN_TOKEN = "test-admin-token"
+ADMIN = {"X-Admin-Token": ADMIN_TOKEN}
+PROFILE = {"age": 40, "sex": "female", "bmi": 27.5, "children": 1, "smoker": "no", "region": "northeast"}
+
+# Quotes table as it was before model_version and the stats tables existed
+LEGACY_SCHEMA = """
+CREATE TABLE quotes (
+    id INTEGER PRIMARY KEY,
+    user_email VARCHAR(120),
+    age INTEGER NOT NULL,
+    sex VARCHAR(20) NOT NULL,
+    bmi FLOAT NOT NULL,
+    children INTEGER NOT NULL,
+    smoker VARCHAR(10) NOT NULL,
+    region VARCHAR(50) NOT NULL,
+    predicted_amount FLOAT NOT NULL,
+    created_at DATETIME
+)
+"""
+LEGACY_QUOTES = [
+    ("legacy@example.com", 1000.0, "2025-01-01 09:00:00.000000"),
+    ("legacy@example.com", 3000.0, "2025-01-01 17:30:00.000000"),
+    ("legacy@example.com", 2000.0, "2025-01-02 08:15:00.000000"),
+    ("other@example.com", 5000.0, "2025-01-02 12:00:00.000000"),
+]
+
+
+@pytest.fixture(scope="module")
+def backend(tmp_path_factory):
+    db_path = tmp_path_factory.mktemp("backend") / "backend.db"
+    with sqlite3.connect(db_path) as connection:
+        connection.execute(LEGACY_SCHEMA)
+        connection.executemany(
+            "INSERT INTO quotes (user_email, age, sex, bmi, children, smoker, region, predicted_amount, created_at) "
+            "VALUES (?, 40, 'female', 27.5, 1, 'no', 'northeast', ?, ?)",
+            LEGACY_QUOTES,
+        )
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("BACKEND_DB_PATH", str(db_path))
+        mp.setenv("MODEL_ADMIN_TOKEN", ADMIN_TOKEN)
+        mp.setenv("QUOTE_DURABILITY", "sync")
+        sys.modules.pop("app", None)
+        backend = importlib.import_module("app")
+        yield backend
+        sys.modules.pop("app", None)
+
+
+@pytest.fixture(scope="module")
+def client(backend):
+    return backend.app.test_client()
+
+
+def add_quotes(backend, user_email, created_ats):
+    """Store quotes through the (sync) writer; returns their ids in insertion order."""
+    backend.quote_writer.submit_many([
+        dict(PROFILE, user_email=user_email, predicted_amount=1000.0 + i, created_at=created_at)
+        for i, created_at in enumerate(created_ats)
+    ])
+    with backend.app.app_context():
+        rows = backend.Quote.query.filter_by(user_email=user_email).order_by(backend.Quote.id).all()
+        return [row.id for row in rows]
+
+
+def fetch_all(client, user_email, limit):
+    pages, cursor = [], None
+    while True:
+        params = {"userEmail": user_email, "limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/quotes", query_string=params, headers=ADMIN)
+        assert response.status_code == 200
+        body = response.get_json()
+        pages.append(body["quotes"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("path", ["/api/quotes", "/api/quotes/stats", "/api/quotes/stats/daily"])
+@pytest.mark.parametrize("headers", [{}, {"X-Admin-Token": "wrong"}])
+def test_quote_endpoints_require_admin_token(client, path, headers):
+    response = client.get(path, query_string={"userEmail": "legacy@example.com"}, headers=headers)
+    assert response.status_code == 401
+
+
+def test_stats_are_backfilled_from_existing_quotes(client):
+    response = client.get("/api/quotes/stats", query_string={"userEmail": "legacy@example.com"}, headers=ADMIN)
+    assert response.status_code == 200
+    assert response.get_json() == {
+        "user_email": "legacy@example.com",
+        "quote_count": 3,
+        "mean_amount": 2000.0,
+        "min_amount": 1000.0,
+        "max_amount": 3000.0,
+        "last_quote_at": "2025-01-02T08:15:00",
+    }
+
+    response = client.get("/api/quotes/stats/daily", query_string={"start": "2025-01-01", "end": "2025-01-02"},
+                          headers=ADMIN)
+    days = {day["day"]: (day["quote_count"], day["min_amount"], day["max_amount"])
+            for day in response.get_json()["days"]}
+    assert days == {"2025-01-01": (2, 1000.0, 3000.0), "2025-01-02": (2, 2000.0, 5000.0)}
+
+
+def test_legacy_quotes_get_a_null_model_version(client):
+    response = client.get("/api/quotes", query_string={"userEmail": "legacy@example.com"}, headers=ADMIN)
+    assert [quote["model_version"] for quote in response.get_json()["quotes"]] == [None] * 3
+
+
+def test_pages_break_created_at_ties_by_id(backend, client):
+    tied = datetime(2025, 2, 1, 12, 0, 0)
+    ids = add_quotes(backend, "pager@example.com", [tied - timedelta(hours=1), tied, tied, tied, tied])
+
+    pages = fetch_all(client, "pager@example.com", limit=2)
+
+    # Newest first; the four tied quotes by descending id, split across page boundaries
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [quote["id"] for page in pages for quote in page] == [ids[4], ids[3], ids[2], ids[1], ids[0]]
+
+
+def test_exactly_full_last_page_has_no_cursor(backend, client):
+    ids = add_quotes(backend, "full@example.com", [datetime(2025, 3, 1, hour) for hour in range(4)])
+
+    pages = fetch_all(client, "full@example.com", limit=4)
+
+    assert len(pages) == 1
+    assert [quote["id"] for quote in pages[0]] == ids[::-1]
+
+
+def test_bad_cursor_is_rejected(client):
+    for cursor in ("not-a-cursor", "bm8tc2VwYXJhdG9y"):  # garbage, and valid base64 without "|"
+        response = client.get("/api/quotes", query_string={"userEmail": "legacy@example.com", "cursor": cursor},
+                              headers=ADMIN)
+        assert response.status_code == 400
+        assert response.get_json() == {"error": "Invalid cursor."}